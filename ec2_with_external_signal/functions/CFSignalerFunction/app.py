@@ -2,16 +2,19 @@ import logging
 import os
 import json
 import datetime
-import boto3
-from botocore.config import Config
-import re
 import sys
 import types
 import time
-from botocore.exceptions import ClientError
+import copy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from . import cfnresponse
-from functools import wraps
+from . import waiter
+from . import client_cache
+from . import tracing
+from .clients import LazyClient
+from . import state_store
+from .state_store import CounterState
 
 ###################### LOGGING 1/2 #####################
 logger = logging.getLogger()
@@ -20,20 +23,26 @@ json.JSONEncoder.default = lambda self, obj: (
     obj.isoformat() if isinstance(obj, datetime.date) else None)
 
 
+# span timings for every decorated function. Arguments are only formatted when the invocation is
+# sampled (TraceSampleRate) and the logger is enabled for TraceLevel; one summary record per invocation.
+TRACER = tracing.Tracer(
+    logger,
+    level=logging.getLevelName(os.environ.get('TraceLevel', 'INFO')),
+    sample_rate=float(os.environ.get('TraceSampleRate', '1')),
+    max_length=int(os.environ.get('TraceMaxArgLength', '200'))
+)
+
+
 def log_function_call(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        logger.info(f"Calling function: {func.__name__} with args: {args} and kwargs: {kwargs}")
-        result = func(*args, **kwargs)
-        logger.info(f"{func.__name__} returned {result}")
-        return result
-    return wrapper
+    return TRACER.span(func)
 
 
 def decorate_all_functions(module):
     for attr_name in dir(module):
         attr = getattr(module, attr_name)
-        if isinstance(attr, types.FunctionType):
+        # only functions defined here, and not the attach point itself
+        if isinstance(attr, types.FunctionType) and attr.__module__ == module.__name__ \
+                and attr_name not in ('log_function_call', 'decorate_all_functions'):
             setattr(module, attr_name, log_function_call(attr))
 
 # decorate functions unitarily with wrapper: @log_function_call
@@ -44,26 +53,49 @@ current_module = sys.modules[__name__]
 decorate_all_functions(current_module)
 """
 #####################################################
-config = Config(
-    retries={
+config = {
+    'retries': {
         'max_attempts': 10,
         'mode': 'standard'
     }
-)
+}
 
 EC2_INIT_WAIT = 300
 
-CFN_CLIENT = boto3.client('cloudformation', config=config)
-SSM_CLIENT = boto3.client('ssm', config=config)
-EC2_CLIENT = boto3.client('ec2', config=config)
-EVENT_CLIENT = boto3.client('events', config=config)
+# clients are built on first use; request scoped read-through caches, reset at every invocation
+CFN_CLIENT = client_cache.CachedClient(LazyClient('cloudformation', config))
+SSM_CLIENT = client_cache.CachedClient(LazyClient('ssm', config))
+EC2_CLIENT = client_cache.CachedClient(LazyClient('ec2', config))
+EVENT_CLIENT = client_cache.CachedClient(LazyClient('events', config))
+STS_CLIENT = LazyClient('sts', config)
+CALLER_IDENTITY = None  # memoized across warm invocations
+CACHED_CLIENTS = [CFN_CLIENT, SSM_CLIENT, EC2_CLIENT, EVENT_CLIENT]
 
-COUNTER_PARAMETER_INIT_VALUE = "enabled_increment_0"
 LOGICAL_RESOURCE_ID = os.environ['LogicalResourceId']
 SCHEDULER_NAME = os.environ['SchedulerName']
 THRESHOLD = int(os.environ['Threshold'])
 SCHEDULER_SSM_PARAMETER = os.environ['SchedulerSSMParameter']
 STACKNAME = os.environ['StackName']
+SIGNAL_MODE = os.environ.get('SignalMode', 'single')  # 'single' | 'batch'
+MAX_WORKERS = int(os.environ.get('MaxWorkers', '10'))  # batch mode: instances checked concurrently
+CONVERGENCE_MODE = os.environ.get('ConvergenceMode', 'scheduler')  # 'scheduler' | 'waiter'
+WAITER_BASE_DELAY = 2  # seconds
+WAITER_MAX_DELAY = 30  # seconds
+WAITER_SAFETY_MARGIN_MS = 15000  # kept to enable the scheduler when the waiter runs out of time
+EVENT_DRIVEN_START = os.environ.get('EventDrivenStart', 'false').lower() == 'true'  # no busy wait on stopped instances
+INSTANCE_STATE_RULE = os.environ.get('InstanceStateRuleName', '')  # enabled only while a start is pending
+INSTANCE_STATE_CHANGE = "EC2 Instance State-change Notification"
+
+INSTANCE_DONE_OUTCOMES = ('SUCCEEDED', 'INCIDENT_RAISED', 'DONE')
+
+# 'dynamodb' | 'ssm' | 'memory'. dynamodb: compare-and-set writes, ssm: conflicts detected, not prevented
+STATE_STORE_BACKEND = os.environ.get('StateStoreBackend', 'dynamodb' if os.environ.get('StateTableName') else 'ssm')
+if STATE_STORE_BACKEND == 'dynamodb':
+    STATE_STORE = state_store.DynamoDBStateStore(LazyClient('dynamodb', config), os.environ['StateTableName'])
+elif STATE_STORE_BACKEND == 'memory':
+    STATE_STORE = state_store.InMemoryStateStore()
+else:
+    STATE_STORE = state_store.SSMStateStore(SSM_CLIENT)
 
 def event_from_monitored_ec2_instance(event):
     expected_tags = {
@@ -161,52 +193,56 @@ def check_resource_status(event, cf_ec2_dict, context=None):
     return resource_status
 
 
-def initialize_counter(event):
-    counter_parameter_name = SCHEDULER_SSM_PARAMETER
+def counter_key(parameter_name=None):
+    counter_parameter_name = parameter_name or SCHEDULER_SSM_PARAMETER
     if counter_parameter_name is None:
         raise Exception('NoCounter')
+    return counter_parameter_name
 
-    try:
-        # Set the parameter value
-        response = SSM_CLIENT.put_parameter(
-            Name=counter_parameter_name,
-            Value=COUNTER_PARAMETER_INIT_VALUE,
-            Type='String',
-            Overwrite=True
-        )
 
-        print(f"Parameter {counter_parameter_name} set to {COUNTER_PARAMETER_INIT_VALUE}")
+def initialize_counter(event, parameter_name=None):
+    counter_parameter_name = counter_key(parameter_name)
+    instance_id = event.get('ResourceProperties', {}).get('ec2_resource_id')
+    try:
+        # single unconditional write, the written state is returned as is
+        state = STATE_STORE.put(counter_parameter_name, CounterState(instance_id=instance_id))
+        print(f"Counter {counter_parameter_name} set to {state}")
     except Exception as e:
-        print(f"Failed to set parameter value: {e}")
+        print(f"Failed to set counter value: {e}")
         raise Exception('ParamInitFailed')
-    return load_counter_value(event)
+    return state
 
 
 # @log_function_call
-def load_counter_value(event):
-    counter_parameter_name = SCHEDULER_SSM_PARAMETER
-    if counter_parameter_name is None:
-        raise Exception('NoCounter')
-    response = SSM_CLIENT.get_parameter(
-        Name=counter_parameter_name,
-        # WithDecryption=True  # Use WithDecryption=True if the parameter is encrypted
-    )
-
-    return response['Parameter']['Value']
+def load_counter_value(event, parameter_name=None):
+    """
+    :return: CounterState, or None if the counter was never initialized.
+    """
+    return STATE_STORE.get(counter_key(parameter_name))
 
 
 def is_success(value):
-    if 'success' in value:
-        return True
-    else:
-        return False
+    return value.status == state_store.SUCCESS
+
+
+def is_disabled(value):
+    return value.status == state_store.DISABLED
 
 
 def is_increment_below_threshold(value, threshold):
-    if int(value.split('_')[2]) < threshold:
-        return True
-    else:
-        return False
+    return value.attempts < threshold
+
+
+def write_counter_transition(parameter_name, previous_value, error_code, **changes):
+    # compare-and-set against the version previous_value was read at
+    counter_parameter_name = counter_key(parameter_name)
+    try:
+        state = STATE_STORE.put(counter_parameter_name, previous_value.transition(**changes), expected_version=previous_value.version)
+        print(f"Counter {counter_parameter_name} set to {state}")
+    except Exception as e:
+        print(f"Failed to set counter value: {e}")
+        raise Exception(error_code)
+    return state
 
 # change check or add additional checks here
 
@@ -231,59 +267,18 @@ def run_checks(event):
             EC2_CLIENT.stop_instances(InstanceIds=[instance_id])
         except Exception as e:
             print('Error shutting down VM. Passing', e)
+        if EVENT_DRIVEN_START:
+            clear_instance_readiness(instance_id)
 
     return success
 
 
-def add_success_suffix(event, previous_value):
-    counter_parameter_name = SCHEDULER_SSM_PARAMETER
-    if counter_parameter_name is None:
-        raise Exception('NoCounter')
-
-    try:
-        # Set the parameter value
-        response = SSM_CLIENT.put_parameter(
-            Name=counter_parameter_name,
-            Value=f"{previous_value}_success",
-            Type='String',
-            Overwrite=True
-        )
-
-        print(f"Parameter {counter_parameter_name} set to {previous_value}_success")
-    except Exception as e:
-        print(f"Failed to set parameter value: {e}")
-        raise Exception('ParamSuccessSetFailed')
+def add_success_suffix(event, previous_value, parameter_name=None):
+    return write_counter_transition(parameter_name, previous_value, 'ParamSuccessSetFailed', status=state_store.SUCCESS)
 
-    return load_counter_value(event)
 
-
-def increment_counter(event, value):
-    numbers = re.findall(r'\d+', value)
-    if not numbers:
-        raise ValueError("No number found in the string")
-
-    last_number = numbers[-1]
-    new_number = str(int(last_number) + 1)
-    incremented_value = re.sub(r'\d+$', new_number, value)
-
-    counter_parameter_name = SCHEDULER_SSM_PARAMETER
-    if counter_parameter_name is None:
-        raise Exception('NoCounter')
-
-    try:
-        # Set the parameter value
-        response = SSM_CLIENT.put_parameter(
-            Name=counter_parameter_name,
-            Value=incremented_value,
-            Type='String',
-            Overwrite=True
-        )
-
-        print(f"Parameter {counter_parameter_name} set to {incremented_value}")
-    except Exception as e:
-        print(f"Failed to set parameter value: {e}")
-        raise Exception('ParamIncrementFailed')
-    return load_counter_value(event)
+def increment_counter(event, value, parameter_name=None):
+    return write_counter_transition(parameter_name, value, 'ParamIncrementFailed', attempts=value.attempts + 1)
 
 
 def start_instance(instance_id, max_wait=EC2_INIT_WAIT):
@@ -326,9 +321,128 @@ def start_instance(instance_id, max_wait=EC2_INIT_WAIT):
             print(f"Waiting for instance {instance_id} to be 'running' and 'initialized'...")
             time.sleep(10)
                 
-    except ClientError as e:
+    except EC2_CLIENT.exceptions.ClientError as e:
+        print(f"Could not start instance {instance_id}. Error: {e}")
+        return False
+
+def readiness_parameter(instance_id):
+    return f"/{SCHEDULER_SSM_PARAMETER.strip('/')}/readiness/{instance_id}"
+
+
+def load_instance_readiness(instance_id):
+    try:
+        response = SSM_CLIENT.get_parameter(Name=readiness_parameter(instance_id))
+    except SSM_CLIENT.exceptions.ParameterNotFound:
+        return {}
+    return json.loads(response['Parameter']['Value'])
+
+
+def record_instance_readiness(instance_id, **fields):
+    readiness = load_instance_readiness(instance_id)
+    readiness.update(fields)
+    readiness['UpdatedAt'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    try:
+        SSM_CLIENT.put_parameter(
+            Name=readiness_parameter(instance_id),
+            Value=json.dumps(readiness),
+            Type='String',
+            Overwrite=True
+        )
+    except Exception as e:
+        print(f"Failed to set parameter value: {e}")
+        raise Exception('ParamReadinessSetFailed')
+    return readiness
+
+
+def clear_instance_readiness(instance_id):
+    try:
+        SSM_CLIENT.delete_parameter(Name=readiness_parameter(instance_id))
+    except SSM_CLIENT.exceptions.ParameterNotFound:
+        pass
+    if not pending_instance_starts():
+        set_instance_state_rule(enabled=False)
+
+
+def pending_instance_starts():
+    response = SSM_CLIENT.get_parameters_by_path(Path=f"/{SCHEDULER_SSM_PARAMETER.strip('/')}/readiness", MaxResults=1)
+    return bool(response['Parameters'])
+
+
+def set_instance_state_rule(enabled):
+    """
+    The state-change rule matches every instance of the account and region: it is only enabled while
+    an instance started by the signaler is pending, so unrelated starts and stops do not invoke the lambda.
+    """
+    if not INSTANCE_STATE_RULE:
+        return
+    try:
+        if enabled:
+            EVENT_CLIENT.enable_rule(Name=INSTANCE_STATE_RULE)
+        else:
+            EVENT_CLIENT.disable_rule(Name=INSTANCE_STATE_RULE)
+        print(f"Rule '{INSTANCE_STATE_RULE}' {'enabled' if enabled else 'disabled'}.")
+    except EVENT_CLIENT.exceptions.ResourceNotFoundException:
+        print(f"Rule '{INSTANCE_STATE_RULE}' not found.")
+        raise Exception('NoEventRuleFound')
+
+
+def request_instance_start(instance_id):
+    """
+    Event driven alternative to start_instance: start the instance and return right away.
+    Readiness is recorded so the 'running' state-change event can resume the checks.
+    """
+    # recorded and rule enabled first: the 'running' event can arrive before start_instances returns
+    record_instance_readiness(instance_id, State='pending', StartedBySignaler=True)
+    set_instance_state_rule(enabled=True)
+    try:
+        EC2_CLIENT.start_instances(InstanceIds=[instance_id])
+    except EC2_CLIENT.exceptions.ClientError as e:
         print(f"Could not start instance {instance_id}. Error: {e}")
+        clear_instance_readiness(instance_id)
+        return False
+    print(f"Start of instance {instance_id} requested. Checks resume on 'running' state-change event.")
+    return True
+
+
+def instance_status_ok(instance_id):
+    response = EC2_CLIENT.describe_instance_status(InstanceIds=[instance_id])
+    if not response['InstanceStatuses']:
         return False
+    instance_status = response['InstanceStatuses'][0]
+    return (instance_status['InstanceState']['Name'] == 'running'
+            and instance_status['SystemStatus']['Status'] == 'ok'
+            and instance_status['InstanceStatus']['Status'] == 'ok')
+
+
+def handle_instance_state_change(event, context):
+    """
+    Handle 'EC2 Instance State-change Notification' events for instances started by the signaler.
+    On 'running', status checks are read once: if ok the check pipeline resumes for that instance, otherwise
+    readiness is recorded and the next scheduler tick resumes it. No in-process wait.
+    """
+    instance_id = event['detail']['instance-id']
+    state = event['detail']['state']
+    if not load_instance_readiness(instance_id):
+        print(f"Instance {instance_id} not started by signaler. Pass")
+        return ["200", 'PASSED']
+
+    record_instance_readiness(instance_id, State=state)
+    if state != 'running':
+        return ["200", f"Readiness_recorded:{state}"]
+
+    if not instance_status_ok(instance_id):
+        # status checks still initializing (minutes): next scheduler tick picks the instance up
+        return ["200", 'Readiness_recorded:running']
+    record_instance_readiness(instance_id, State='ok')
+
+    tick_event = scheduler_event()
+    if SIGNAL_MODE == 'batch':
+        return ["200", f"Resumed:{process_instance(tick_event, instance_id)}"]
+    tick_event = enrich_event_with_ec2_resource_id(tick_event)
+    if tick_event['ResourceProperties'].get('ec2_resource_id') != instance_id:
+        return ["200", 'PASSED']
+    return scheduler_tick(tick_event)
+
 
 def check_ec2_instance(instance_id):
     stop_instance_flag = False
@@ -345,17 +459,24 @@ def check_ec2_instance(instance_id):
         else:
             instance_status = response['InstanceStatuses'][0]['InstanceState']['Name']
             system_status = response['InstanceStatuses'][0]['SystemStatus']['Status']
-            instance_status_ok = response['InstanceStatuses'][0]['InstanceStatus']['Status']
+            instance_check_status = response['InstanceStatuses'][0]['InstanceStatus']['Status']
 
             is_running = instance_status == 'running'
             is_stopped = instance_status == 'stopped'
-            is_initialized = system_status == 'ok' and instance_status_ok == 'ok'
+            is_initialized = system_status == 'ok' and instance_check_status == 'ok'
 
             if is_running and is_initialized:
                 status = "Running and Initialized"
                 initialized = True
+                if EVENT_DRIVEN_START:
+                    # started by an earlier tick: stop it again after checks
+                    stop_instance_flag = load_instance_readiness(instance_id).get('StartedBySignaler', False)
             else:
-                if is_stopped:
+                if is_stopped and EVENT_DRIVEN_START:
+                    request_instance_start(instance_id)  # resumed by the state-change event
+                    status = "Start requested"
+                    initialized = False
+                elif is_stopped:
                     cmd_state = start_instance(instance_id) # start and wait
                     if cmd_state:
                         stop_instance_flag = True
@@ -454,6 +575,219 @@ def enable_aws_scheduler(scheduler_name):
     return get_aws_scheduler_state(rule_name)
 
 
+def discover_monitored_instances(stack_name, logical_resource_id=None):
+    """
+    Batch mode: list every live instance launched by the stack for the monitored logical id.
+
+    :return: list of instance ids, oldest launch first.
+    """
+    filters = [
+        {'Name': 'tag:aws:cloudformation:stack-name', 'Values': [stack_name]},
+        {'Name': 'tag:aws:cloudformation:logical-id', 'Values': [logical_resource_id or LOGICAL_RESOURCE_ID]},
+        {'Name': 'instance-state-name', 'Values': ['pending', 'running', 'stopping', 'stopped']}
+    ]
+    instances = []
+    kwargs = {'Filters': filters}
+    while True:
+        # plain calls rather than a paginator so pages go through the client cache
+        page = EC2_CLIENT.describe_instances(**kwargs)
+        for reservation in page['Reservations']:
+            instances.extend(reservation['Instances'])
+        if not page.get('NextToken'):
+            break
+        kwargs['NextToken'] = page['NextToken']
+
+    return [instance['InstanceId'] for instance in sorted(instances, key=lambda x: x['LaunchTime'])]
+
+
+def instance_counter_prefix():
+    return f"/{SCHEDULER_SSM_PARAMETER.strip('/')}/"
+
+
+def instance_counter_parameter(instance_id):
+    # per-instance counters live under the stack counter: /<stack>/CFSignalerFunction/SchedulerFlag/<instance_id>
+    return f"{instance_counter_prefix()}{instance_id}"
+
+
+def delete_instance_counters(keep=()):
+    """
+    Batch mode: delete the per-instance counters, except those of the instance ids in keep.
+    A 'disabled' counter only means 'handled' within one temporal loop: it must not outlive it.
+    """
+    deleted = []
+    for key in STATE_STORE.keys(instance_counter_prefix()):
+        instance_id = key.rsplit('/', 1)[-1]
+        if instance_id.startswith('i-') and instance_id not in keep:
+            STATE_STORE.delete(key)
+            deleted.append(instance_id)
+    if deleted:
+        print(f"Instance counters deleted: {deleted}")
+    return deleted
+
+
+def close_instance_counter(event, value, parameter_name):
+    # disabled marks the instance as handled so later ticks never signal it twice
+    return write_counter_transition(parameter_name, value, 'ParamCloseFailed', status=state_store.DISABLED)
+
+
+def process_instance(event, instance_id):
+    """
+    Batch mode: run one temporal loop tick for a single instance, independently of the others.
+
+    :return: outcome string. 'SUCCEEDED', 'INCIDENT_RAISED' and 'DONE' are final, 'PENDING' waits for next tick.
+    """
+    instance_event = copy.deepcopy(event)
+    instance_event['ResourceProperties']['ec2_resource_id'] = instance_id
+    parameter_name = instance_counter_parameter(instance_id)
+
+    counter_value = load_counter_value(instance_event, parameter_name)
+    if counter_value is None:
+        counter_value = initialize_counter(instance_event, parameter_name)
+
+    if is_disabled(counter_value):
+        return 'DONE'
+    if is_success(counter_value):
+        tag_ec2_instance(instance_id=instance_id, tag_value="complete")
+        cfn_signal_resource(instance_event, "SUCCESS")
+        close_instance_counter(instance_event, counter_value, parameter_name)
+        return 'SUCCEEDED'
+    if not is_increment_below_threshold(counter_value, THRESHOLD):  # failure to converge
+        tag_ec2_instance(instance_id=instance_id, tag_value="compromised")
+        generate_incident()
+        close_instance_counter(instance_event, counter_value, parameter_name)
+        return 'INCIDENT_RAISED'
+
+    if run_checks(instance_event):
+        # signal right away rather than on next tick: other instances are not held up
+        tag_ec2_instance(instance_id=instance_id, tag_value="complete")
+        cfn_signal_resource(instance_event, "SUCCESS")
+        close_instance_counter(instance_event, counter_value, parameter_name)
+        return 'SUCCEEDED'
+    increment_counter(instance_event, counter_value, parameter_name)
+    return 'PENDING'
+
+
+def process_instances_batch(event, max_workers=None):
+    """
+    Batch mode: check and signal every monitored instance of the stack with a bounded thread pool.
+
+    :return: dict of instance id -> outcome.
+    """
+    instance_ids = discover_monitored_instances(event['ResourceProperties']['StackName'])
+    delete_instance_counters(keep=instance_ids)  # instances no longer monitored
+    if not instance_ids:
+        print("No instances found with the specified tags.")
+        return {}
+
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers or MAX_WORKERS, len(instance_ids))) as executor:
+        futures = {executor.submit(process_instance, event, instance_id): instance_id for instance_id in instance_ids}
+        for future in as_completed(futures):
+            instance_id = futures[future]
+            try:
+                outcomes[instance_id] = future.result()
+            except Exception as e:
+                # one failing instance must not fail the batch. retried on next tick
+                print(f"Instance {instance_id} tick failed: {e}")
+                outcomes[instance_id] = 'FAILED'
+    print(f"Batch outcomes: {outcomes}")
+    return outcomes
+
+
+def batch_tick(event):
+    counter_value = load_counter_value(event)
+    if counter_value is None or is_disabled(counter_value):
+        raise Exception('RuleDisabled')
+
+    outcomes = process_instances_batch(event)
+    if outcomes and all(outcome in INSTANCE_DONE_OUTCOMES for outcome in outcomes.values()):
+        print("All instances handled. Stopping temporal loop.")
+        initialize_counter(event)  # reset
+        delete_instance_counters()
+        disable_aws_scheduler(event)
+
+    summary = {}
+    for outcome in outcomes.values():
+        summary[outcome] = summary.get(outcome, 0) + 1
+    return ["200", "Batch:" + ",".join(f"{k}={v}" for k, v in sorted(summary.items()))]
+
+
+def start_temporal_loop(event):
+    # new loop: counters of a previous loop (instances kept across the update) start over
+    state = initialize_counter(event)
+    if SIGNAL_MODE == 'batch':
+        delete_instance_counters()
+    return state
+
+
+def scheduler_event():
+    # same payload as the EventBridgeRule target input
+    return {
+        "RequestId": "__Event__",
+        "ResourceProperties": {
+            "StackName": STACKNAME,
+            "Event": SCHEDULER_NAME
+        }
+    }
+
+
+def wait_for_convergence(event, context):
+    """
+    Waiter mode: poll the checks in-process with exponential backoff and jitter, within the lambda remaining time.
+    Signals as soon as checks pass. Falls back to the scheduler temporal loop when the time budget runs out.
+    """
+    event = enrich_event_with_ec2_resource_id(event)
+    if 'ec2_resource_id' not in event['ResourceProperties']:
+        enable_aws_scheduler(SCHEDULER_NAME)
+        return ["200", 'WAITER_FALLBACK_SCHEDULER']
+
+    converged, attempts = waiter.poll_until(
+        lambda: run_checks(event),
+        context,
+        base_delay=WAITER_BASE_DELAY,
+        max_delay=WAITER_MAX_DELAY,
+        safety_margin_ms=WAITER_SAFETY_MARGIN_MS
+    )
+    if not converged:
+        print(f"Not converged after {attempts} in-process attempts. Handing over to scheduler.")
+        enable_aws_scheduler(SCHEDULER_NAME)
+        return ["200", 'WAITER_FALLBACK_SCHEDULER']
+
+    initialize_counter(event)  # reset, scheduler never engaged
+    tag_ec2_instance(instance_id=event['ResourceProperties']['ec2_resource_id'], tag_value="complete")
+    cfn_signal_resource(event, "SUCCESS")
+    return ["200", f"SUCCEEDED_IN_PROCESS:{attempts}"]
+
+
+def scheduler_tick(event):
+    """
+    One temporal loop tick for the instance in event['ResourceProperties']['ec2_resource_id'].
+    """
+    counter_value = load_counter_value(event)
+    if counter_value is None or is_disabled(counter_value):
+        raise Exception('RuleDisabled')
+    if (is_success(counter_value)):
+        initialize_counter(event)  # reset
+        disable_aws_scheduler(event)
+        tag_ec2_instance(instance_id=event['ResourceProperties']['ec2_resource_id'], tag_value="complete")
+        cfn_signal_resource(event, "SUCCESS")
+        status = ["200", 'SUCCEEDED']
+    else:
+        if (not is_increment_below_threshold(counter_value, THRESHOLD)): # failure to converge
+            tag_ec2_instance(instance_id=event['ResourceProperties']['ec2_resource_id'], tag_value="compromised")
+            generate_incident()
+            initialize_counter(event)  # reset
+            disable_aws_scheduler(event)
+            status = ["200", 'INCIDENT_RAISED']
+        else:
+            if (run_checks(event)):
+                counter_value = add_success_suffix(event, counter_value)
+            else:
+                counter_value = increment_counter(event, counter_value)
+            status = ["200", f"Counter_incrementer:{counter_value}"]
+    return status
+
+
 def generate_incident():
     return handle_incident({"incident": "title", "message": "message"})
 
@@ -463,7 +797,26 @@ def handle_incident(incident_dict):
     # replace with handler code. or leave like this for demo
 
 
+def get_caller_identity():
+    # logging only: one sts call per container rather than per invocation
+    global CALLER_IDENTITY
+    if CALLER_IDENTITY is None:
+        CALLER_IDENTITY = STS_CLIENT.get_caller_identity()
+    return CALLER_IDENTITY
+
+
+def reset_client_caches():
+    for client in CACHED_CLIENTS:
+        client.reset()
+
+
+def log_client_cache_stats():
+    logger.info(json.dumps({'client_cache': [client.stats() for client in CACHED_CLIENTS]}))
+
+
 def lambda_handler(event, context):
+    TRACER.start_invocation()
+    reset_client_caches()
     logger.info('## EVENT')
     logger.info(json.dumps(event))
     logger.info('## ENVIRONMENT VARIABLES')
@@ -471,7 +824,7 @@ def lambda_handler(event, context):
     logger.info('## CONTEXT VARIABLES')
     logger.info(json.dumps(vars(context)))
     logger.info('## CALLER')
-    logger.info(json.dumps(boto3.client('sts').get_caller_identity()))
+    logger.info(json.dumps(get_caller_identity()))
 
     try:
         current_account_id = context.invoked_function_arn.split(":")[4]
@@ -487,7 +840,7 @@ def lambda_handler(event, context):
             else:
                 # Perform custom resource logic here
                 try:
-                    initialize_counter(event)
+                    start_temporal_loop(event)
                     enable_aws_scheduler(SCHEDULER_NAME)
                 except:
                     status = ["400", 'FAILED']
@@ -504,8 +857,11 @@ def lambda_handler(event, context):
                         print('Stack in update in progress')
                         print("Init steps starting ... ")
                         try:
-                            initialize_counter(event)
-                            enable_aws_scheduler(SCHEDULER_NAME)
+                            start_temporal_loop(event)
+                            if CONVERGENCE_MODE == 'waiter' and SIGNAL_MODE == 'single':
+                                status = wait_for_convergence(scheduler_event(), context)
+                            else:
+                                enable_aws_scheduler(SCHEDULER_NAME)
                         except:
                             status = ["400", 'FAILED']
                             responseData = {"status": ', '.join(status)}
@@ -515,35 +871,20 @@ def lambda_handler(event, context):
                 else:
                     print('RunInstances event not from monitored ec2 instance. Pass')
                     status = ["200", 'PASSED']
+            elif event.get('detail-type') == INSTANCE_STATE_CHANGE:
+                # instance started by a previous tick changed state
+                print("Lambda is being invoked from instance state-change rule.")
+                status = handle_instance_state_change(event, context)
+            elif SIGNAL_MODE == 'batch' and event.get('RequestId') == '__Event__':
+                # from scheduler, one tick for every instance of the stack
+                print("Lambda called from scheduler event bridge rule. batch temporal loop engaged ...")
+                status = batch_tick(event)
             else:
                 # from scheduler
                 event = enrich_event_with_ec2_resource_id(event)
                 if event['RequestId'] == '__Event__':
                     print("Lambda called from scheduler event bridge rule. temporal loop engaged ...")
-                    counter_value = load_counter_value(event)
-                    if 'disabled' in counter_value:
-                        raise Exception('RuleDisabled')
-                    if (is_success(counter_value)):
-                        initialize_counter(event)  # reset
-                        disable_aws_scheduler(event)
-                        tag_ec2_instance(instance_id=event['ResourceProperties']['ec2_resource_id'], tag_value="complete")
-                        cfn_signal_resource(event, "SUCCESS")
-                        status = ["200", 'SUCCEEDED']
-                    else:
-                        if (not is_increment_below_threshold(counter_value, THRESHOLD)): # failure to converge
-                            tag_ec2_instance(instance_id=event['ResourceProperties']['ec2_resource_id'], tag_value="compromised")
-                            generate_incident()
-                            initialize_counter(event)  # reset
-                            disable_aws_scheduler(event)
-                            status = ["200", 'INCIDENT_RAISED']
-                        else:
-                            if (run_checks(event)):
-                                add_success_suffix(event, counter_value)
-                                status = ["200", f"Success_suffix_appended_{counter_value}"]
-                            else:
-                                increment_counter(event, counter_value)
-                            counter_value = load_counter_value(event)
-                            status = ["200", f"Counter_incrementer:{counter_value}"]
+                    status = scheduler_tick(event)
                 # from else
                 else:
                     print("Lambda called manually or unhandled signal. Pass")
@@ -556,6 +897,8 @@ def lambda_handler(event, context):
             cfnresponse.send(event, context, cfnresponse.SUCCESS, responseData)
         else:
             pass
+    log_client_cache_stats()
+    TRACER.emit_summary()
     return {
         'statusCode': status[0],
         'body': status[1]
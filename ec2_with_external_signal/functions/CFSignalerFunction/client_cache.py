@@ -0,0 +1,145 @@
+import copy
+import json
+import threading
+import time
+
+# read operations served from cache, with max age in seconds (None: whole request)
+READ_OPERATIONS = {
+    'ec2': {'describe_instances': None, 'describe_instance_status': 2},  # status is polled, keep it short lived
+    'events': {'describe_rule': None},
+    'ssm': {'get_parameter': None},
+    'cloudformation': {'describe_stacks': None},
+}
+
+
+def _key(kwargs):
+    return json.dumps(kwargs, sort_keys=True, default=str)
+
+
+class CachedClient:
+    """
+    Request scoped read-through cache in front of a boto3 client.
+    Read operations listed in READ_OPERATIONS are deduplicated; known writes update the cached
+    responses in place (or invalidate them) instead of forcing a re-read. Any other attribute is
+    forwarded to the wrapped client. Call reset() at the start of every invocation.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # LazyClient knows its service without being built
+        self.service_name = getattr(client, 'service_name', None) or client.meta.service_model.service_name
+        self.read_operations = READ_OPERATIONS.get(self.service_name, {})
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}  # (operation, key) -> (stored_at, response)
+            self._instances = {}  # ec2 only: instance id -> instance dict shared with cached responses
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'service': self.service_name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def invalidate(self, operation=None):
+        with self._lock:
+            for entry in [entry for entry in self._entries if operation is None or entry[0] == operation]:
+                del self._entries[entry]
+            if operation in (None, 'describe_instances'):
+                self._instances = {}
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name in self.read_operations:
+            return lambda **kwargs: self._read(name, kwargs)
+        if hasattr(self, f"_after_{name}"):
+            def write(**kwargs):
+                response = attr(**kwargs)
+                with self._lock:
+                    getattr(self, f"_after_{name}")(kwargs, response)
+                return response
+            return write
+        return attr
+
+    ################# reads #################
+    def _read(self, operation, kwargs):
+        key = (operation, _key(kwargs))
+        max_age = self.read_operations[operation]
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and (max_age is None or time.monotonic() - cached[0] <= max_age):
+                self.hits += 1
+                return copy.deepcopy(cached[1])
+            indexed = self._from_instance_index(operation, kwargs)
+            if indexed is not None:
+                self.hits += 1
+                return copy.deepcopy(indexed)
+            self.misses += 1
+
+        response = getattr(self.client, operation)(**kwargs)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            if operation == 'describe_instances':
+                for reservation in response.get('Reservations', []):
+                    for instance in reservation.get('Instances', []):
+                        self._instances[instance['InstanceId']] = instance
+        return copy.deepcopy(response)
+
+    def _from_instance_index(self, operation, kwargs):
+        # describe_instances(InstanceIds=[...]) after a filtered describe that returned them
+        if operation != 'describe_instances' or set(kwargs) != {'InstanceIds'}:
+            return None
+        if not all(instance_id in self._instances for instance_id in kwargs['InstanceIds']):
+            return None
+        return {'Reservations': [{'Instances': [self._instances[i] for i in kwargs['InstanceIds']]}]}
+
+    ################# writes #################
+    def _after_put_parameter(self, kwargs, response):
+        self._entries[('get_parameter', _key({'Name': kwargs['Name']}))] = (time.monotonic(), {
+            'Parameter': {
+                'Name': kwargs['Name'],
+                'Type': kwargs.get('Type', 'String'),
+                'Value': kwargs['Value'],
+                'Version': response['Version']
+            }
+        })
+
+    def _after_delete_parameter(self, kwargs, response):
+        self._entries.pop(('get_parameter', _key({'Name': kwargs['Name']})), None)
+
+    def _set_rule_state(self, kwargs, state):
+        cached = self._entries.get(('describe_rule', _key({'Name': kwargs['Name']})))
+        if cached is not None:
+            cached[1]['State'] = state
+
+    def _after_enable_rule(self, kwargs, response):
+        self._set_rule_state(kwargs, 'ENABLED')
+
+    def _after_disable_rule(self, kwargs, response):
+        self._set_rule_state(kwargs, 'DISABLED')
+
+    def _after_create_tags(self, kwargs, response):
+        for instance_id in kwargs['Resources']:
+            instance = self._instances.get(instance_id)
+            if instance is None:
+                continue
+            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+            tags.update({tag['Key']: tag.get('Value', '') for tag in kwargs['Tags']})
+            instance['Tags'] = [{'Key': k, 'Value': v} for k, v in tags.items()]
+
+    def _after_start_instances(self, kwargs, response):
+        self.invalidate('describe_instance_status')
+        self.invalidate('describe_instances')
+
+    def _after_stop_instances(self, kwargs, response):
+        self._after_start_instances(kwargs, response)
+
+    def _after_signal_resource(self, kwargs, response):
+        self.invalidate('describe_stacks')
@@ -0,0 +1,33 @@
+import threading
+
+# boto3 and botocore are only imported when a client is first needed: ~0.2s each cold start saved
+# for code paths that never reach AWS (and for the clients a path does not use).
+_build_lock = threading.Lock()  # boto3 default session is not thread safe
+
+
+class LazyClient:
+    """
+    boto3 client built on first attribute access, then memoized.
+    Attribute access is forwarded to the built client: LazyClient('ec2').describe_instances(...)
+    """
+
+    def __init__(self, service_name, config=None):
+        self.service_name = service_name
+        self.config = config or {}
+        self._client = None
+
+    @property
+    def built(self):
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            with _build_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+                    self._client = boto3.client(self.service_name, config=Config(**self.config))
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
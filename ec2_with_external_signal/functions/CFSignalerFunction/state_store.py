@@ -0,0 +1,207 @@
+import datetime
+import json
+import re
+import threading
+from dataclasses import dataclass, asdict, replace, field
+
+PENDING = 'pending'  # temporal loop running, checks not passed yet
+SUCCESS = 'success'  # checks passed, signal on next tick
+DISABLED = 'disabled'  # loop stopped or instance already handled
+
+LEGACY_VALUE = re.compile(r'^(enabled|disabled)_increment_(\d+)(_success)?$')
+
+
+class StateConflict(Exception):
+    """ Raised when a compare-and-set write lost against a concurrent writer """
+    pass
+
+
+def _child_of(prefix, key):
+    return key.startswith(prefix) and '/' not in key[len(prefix):]
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+@dataclass
+class CounterState:
+    """
+    Temporal loop state of a stack (or of one instance in batch mode).
+    version is the store version the state was read at; it is not part of the stored record.
+    """
+    status: str = PENDING
+    attempts: int = 0
+    instance_id: str = None
+    created_at: str = field(default_factory=_now)
+    updated_at: str = field(default_factory=_now)
+    version: int = 0
+
+    def to_json(self):
+        record = asdict(self)
+        record.pop('version')
+        return json.dumps(record)
+
+    @classmethod
+    def from_value(cls, value, version=0):
+        """ Parse a stored record. Also accepts the legacy 'enabled_increment_N[_success]' strings. """
+        legacy = LEGACY_VALUE.match(value)
+        if legacy:
+            loop_state, attempts, success = legacy.groups()
+            status = DISABLED if loop_state == 'disabled' else (SUCCESS if success else PENDING)
+            return cls(status=status, attempts=int(attempts), version=version)
+        record = json.loads(value)
+        return cls(version=version, **record)
+
+    def transition(self, **changes):
+        return replace(self, updated_at=_now(), **changes)
+
+    def __str__(self):
+        return f"{self.status}_{self.attempts}"
+
+
+class InMemoryStateStore:
+    """ Process local store. For tests and local runs. """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._records:
+                return None
+            value, version = self._records[key]
+        return CounterState.from_value(value, version=version)
+
+    def put(self, key, state, expected_version=None):
+        """
+        Write state. expected_version=None overwrites unconditionally, otherwise the write only
+        succeeds if the stored version still is expected_version (0: key must not exist).
+        :return: the written state carrying its new version.
+        """
+        with self._lock:
+            current_version = self._records.get(key, (None, 0))[1]
+            if expected_version is not None and current_version != expected_version:
+                raise StateConflict(f"{key}: expected version {expected_version}, found {current_version}")
+            self._records[key] = (state.to_json(), current_version + 1)
+        return replace(state, version=current_version + 1)
+
+    def delete(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+
+    def keys(self, prefix):
+        """ Keys one level below prefix ('/a/' lists '/a/b', not '/a/b/c') """
+        with self._lock:
+            return sorted(key for key in self._records if _child_of(prefix, key))
+
+
+class SSMStateStore:
+    """
+    One String parameter per key, one put_parameter per write. SSM has no conditional overwrite: a versioned
+    write is a plain overwrite, and the Version SSM returns tells whether another write got in between
+    (expected_version + 1 otherwise). That conflict is detected, not prevented: the value written stays.
+    Creating a key (expected_version=0) is an Overwrite=False put, a real compare-and-set.
+    For compare-and-set on every write, use DynamoDBStateStore.
+    """
+
+    def __init__(self, ssm_client):
+        self.client = ssm_client
+
+    def get(self, key):
+        try:
+            response = self.client.get_parameter(Name=key)
+        except self.client.exceptions.ParameterNotFound:
+            return None
+        return CounterState.from_value(response['Parameter']['Value'], version=response['Parameter']['Version'])
+
+    def put(self, key, state, expected_version=None):
+        try:
+            response = self.client.put_parameter(Name=key, Value=state.to_json(), Type='String',
+                                                 Overwrite=expected_version != 0)
+        except self.client.exceptions.ParameterAlreadyExists:
+            raise StateConflict(f"{key}: expected no value, found one")
+        if expected_version and response['Version'] != expected_version + 1:
+            raise StateConflict(f"{key}: written over version {response['Version'] - 1}, expected {expected_version}")
+        return replace(state, version=response['Version'])
+
+    def delete(self, key):
+        try:
+            self.client.delete_parameter(Name=key)
+        except self.client.exceptions.ParameterNotFound:
+            pass
+
+    def keys(self, prefix):
+        keys = []
+        kwargs = {'Path': prefix.rstrip('/'), 'Recursive': False}
+        while True:
+            page = self.client.get_parameters_by_path(**kwargs)
+            keys.extend(parameter['Name'] for parameter in page['Parameters'])
+            if not page.get('NextToken'):
+                break
+            kwargs['NextToken'] = page['NextToken']
+        return sorted(key for key in keys if _child_of(prefix, key))
+
+
+class DynamoDBStateStore:
+    """
+    One item per key in a table with string hash key 'pk'. Writes are conditional on the stored
+    version, so concurrent ticks cannot overwrite each other.
+    """
+
+    def __init__(self, dynamodb_client, table_name):
+        self.client = dynamodb_client
+        self.table_name = table_name
+
+    def get(self, key):
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={'pk': {'S': key}},
+            ConsistentRead=True
+        )
+        if 'Item' not in response:
+            return None
+        item = response['Item']
+        return CounterState.from_value(item['state']['S'], version=int(item['version']['N']))
+
+    def put(self, key, state, expected_version=None):
+        kwargs = {}
+        values = {':state': {'S': state.to_json()}, ':one': {'N': '1'}}
+        if expected_version == 0:
+            kwargs['ConditionExpression'] = 'attribute_not_exists(pk)'
+        elif expected_version is not None:
+            kwargs['ConditionExpression'] = '#version = :expected'
+            values[':expected'] = {'N': str(expected_version)}
+        try:
+            response = self.client.update_item(
+                TableName=self.table_name,
+                Key={'pk': {'S': key}},
+                UpdateExpression='SET #state = :state ADD #version :one',
+                ExpressionAttributeNames={'#state': 'state', '#version': 'version'},
+                ExpressionAttributeValues=values,
+                ReturnValues='UPDATED_NEW',
+                **kwargs
+            )
+        except self.client.exceptions.ConditionalCheckFailedException:
+            raise StateConflict(f"{key}: version {expected_version} is stale")
+        return replace(state, version=int(response['Attributes']['version']['N']))
+
+    def delete(self, key):
+        self.client.delete_item(TableName=self.table_name, Key={'pk': {'S': key}})
+
+    def keys(self, prefix):
+        keys = []
+        kwargs = {
+            'TableName': self.table_name,
+            'FilterExpression': 'begins_with(pk, :prefix)',
+            'ExpressionAttributeValues': {':prefix': {'S': prefix}},
+            'ProjectionExpression': 'pk'
+        }
+        while True:
+            page = self.client.scan(**kwargs)
+            keys.extend(item['pk']['S'] for item in page['Items'])
+            if 'LastEvaluatedKey' not in page:
+                break
+            kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+        return sorted(key for key in keys if _child_of(prefix, key))
@@ -0,0 +1,105 @@
+import json
+import logging
+import random
+import threading
+import time
+from functools import wraps
+
+REDACTED = '***'
+DEFAULT_REDACT_KEYS = ('ResponseURL', 'SecretString', 'SessionToken', 'Credentials', 'Password')
+
+
+class Tracer:
+    """
+    Span timings for decorated functions.
+
+    - one log record per span (name, start, duration, outcome, args and result), only when the
+      invocation is sampled and the logger is enabled for the level: arguments are not formatted otherwise
+    - arguments and results are redacted (redact_keys) and truncated (max_length chars per value)
+    - timings are always aggregated per function and emitted as one summary record per invocation
+    """
+
+    def __init__(self, logger, level=logging.INFO, sample_rate=1.0, max_length=200, redact_keys=DEFAULT_REDACT_KEYS):
+        self.logger = logger
+        self.level = level
+        self.sample_rate = sample_rate
+        self.max_length = max_length
+        self.redact_keys = set(redact_keys)
+        self._lock = threading.Lock()
+        self.start_invocation()
+
+    def start_invocation(self):
+        with self._lock:
+            self.sampled = random.random() < self.sample_rate
+            self.started = time.perf_counter()
+            self.functions = {}  # name -> {'calls', 'errors', 'total_ms', 'max_ms'}
+
+    def span(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started_at = time.time()
+            started = time.perf_counter()
+            outcome = 'ok'
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception as e:
+                outcome = f"error:{type(e).__name__}"
+                raise
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                self._aggregate(func.__name__, duration_ms, outcome)
+                if self.sampled and self.logger.isEnabledFor(self.level):
+                    self.logger.log(self.level, json.dumps({
+                        'span': func.__name__,
+                        'start': started_at,
+                        'duration_ms': round(duration_ms, 3),
+                        'outcome': outcome,
+                        'args': [self.summarize(arg) for arg in args],
+                        'kwargs': {key: self.summarize(value, key) for key, value in kwargs.items()},
+                        'result': self.summarize(result)
+                    }, default=str))
+        return wrapper
+
+    def _aggregate(self, name, duration_ms, outcome):
+        with self._lock:
+            stats = self.functions.setdefault(name, {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += outcome != 'ok'
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+
+    def summarize(self, value, key=None, depth=0):
+        """ Redacted, truncated, json serializable view of value """
+        if key in self.redact_keys:
+            return REDACTED
+        if isinstance(value, dict) and depth < 3:
+            return {k: self.summarize(v, k, depth + 1) for k, v in value.items()}
+        if isinstance(value, (list, tuple)) and depth < 3:
+            items = [self.summarize(v, None, depth + 1) for v in value[:10]]
+            if len(value) > 10:
+                items.append(f"... {len(value) - 10} more")
+            return items
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        text = value if isinstance(value, str) else repr(value)
+        if len(text) > self.max_length:
+            return text[:self.max_length] + f"... ({len(text)} chars)"
+        return text
+
+    def summary(self):
+        with self._lock:
+            return {
+                'trace_summary': {
+                    'sampled': self.sampled,
+                    'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+                    'functions': {
+                        name: {**stats, 'total_ms': round(stats['total_ms'], 3), 'max_ms': round(stats['max_ms'], 3)}
+                        for name, stats in sorted(self.functions.items(), key=lambda item: -item[1]['total_ms'])
+                    }
+                }
+            }
+
+    def emit_summary(self):
+        self.logger.info(json.dumps(self.summary()))
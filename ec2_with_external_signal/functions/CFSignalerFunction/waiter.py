@@ -0,0 +1,36 @@
+import random
+import time
+
+
+def backoff_delays(base_delay, max_delay, factor=2):
+    """
+    Generate exponential backoff delays (seconds) with full jitter: uniform(0, min(max_delay, base_delay * factor**attempt)).
+    """
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(max_delay, base_delay * factor ** attempt))
+        attempt += 1
+
+
+def poll_until(check, context, base_delay=2, max_delay=30, safety_margin_ms=15000, sleep=time.sleep, clock=time.monotonic):
+    """
+    Call check() until it returns True, sleeping with exponential backoff and jitter in between.
+    Stops as soon as the lambda remaining time (context.get_remaining_time_in_millis) cannot fit
+    another sleep plus one more check, keeping safety_margin_ms for the caller to fall back.
+
+    :return: (converged, attempts). converged is False when the time budget ran out.
+    """
+    attempts = 0
+    for delay in backoff_delays(base_delay, max_delay):
+        started = clock()
+        attempts += 1
+        if check():
+            return True, attempts
+        check_duration = clock() - started
+
+        remaining = (context.get_remaining_time_in_millis() - safety_margin_ms) / 1000
+        if remaining < delay + check_duration:
+            print(f"Waiter budget exhausted after {attempts} attempts ({remaining:.1f}s left before safety margin)")
+            return False, attempts
+        print(f"Waiter attempt {attempts} not converged. Next attempt in {delay:.1f}s")
+        sleep(delay)
@@ -0,0 +1,112 @@
+"""
+Cold start benchmark for CFSignalerFunction, against moto stubbed AWS APIs (no network, no credentials).
+
+Each sample runs in fresh interpreters and measures:
+- import: time to import CFSignalerFunction.app (module level work done at every cold start)
+- first_call: first lambda_handler invocation (scheduler tick), including client construction
+- warm_call: second invocation in the same interpreter
+
+usage (from functions/ folder): python benchmarks/bench_cold_start.py [--samples 10] [--import-budget-ms 100]
+exits with 1 if the median import time exceeds the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SAMPLE = r'''
+import json, time
+t0 = time.perf_counter()
+import CFSignalerFunction.app
+t1 = time.perf_counter()
+print(json.dumps({'import': (t1 - t0) * 1000}))
+'''
+
+# moto must be active before any client is created, so first calls are measured in a separate interpreter
+CALL_SAMPLE = r'''
+import json, logging, os, time
+from moto import mock_aws
+import boto3
+with mock_aws():
+    boto3.client('ssm').put_parameter(Name=os.environ['SchedulerSSMParameter'], Value='enabled_increment_0', Type='String')
+    boto3.client('events').put_rule(Name=os.environ['SchedulerName'], ScheduleExpression='rate(5 minutes)', State='ENABLED')
+    boto3.client('ec2').run_instances(
+        ImageId='ami-12345678', MinCount=1, MaxCount=1,
+        TagSpecifications=[{'ResourceType': 'instance', 'Tags': [{'Key': 'aws:cloudformation:stack-name', 'Value': os.environ['StackName']}]}]
+    )
+    import CFSignalerFunction.app as app
+    logging.disable(logging.CRITICAL)
+
+    class Context:
+        function_name = 'CFSignalerFunction-bench'
+        invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:CFSignalerFunction-bench'
+        log_stream_name = 'bench'
+
+        def get_remaining_time_in_millis(self):
+            return 240000
+
+    event = {"RequestId": "__Event__", "ResourceProperties": {"StackName": os.environ['StackName'], "Event": os.environ['SchedulerName']}}
+    t0 = time.perf_counter()
+    app.lambda_handler(dict(event), Context())
+    t1 = time.perf_counter()
+    # same path again: reset the counter the first tick moved forward
+    boto3.client('ssm').put_parameter(Name=os.environ['SchedulerSSMParameter'], Value='enabled_increment_0', Type='String', Overwrite=True)
+    t2 = time.perf_counter()
+    app.lambda_handler(dict(event), Context())
+    t3 = time.perf_counter()
+
+print(json.dumps({'first_call': (t1 - t0) * 1000, 'warm_call': (t3 - t2) * 1000}))
+'''
+
+ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'test',
+    'AWS_SECRET_ACCESS_KEY': 'test',
+    'LogicalResourceId': 'EC2Instance',
+    'SchedulerName': 'CFSignalerRule-BenchStack',
+    'Threshold': '2',
+    'SchedulerSSMParameter': '/BenchStack/CFSignalerFunction/SchedulerFlag',
+    'StackName': 'BenchStack',
+}
+
+
+def run_sample(code):
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=FUNCTIONS_DIR,
+        env={**os.environ, **ENV},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--import-budget-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    samples = [{**run_sample(IMPORT_SAMPLE), **run_sample(CALL_SAMPLE)} for _ in range(args.samples)]
+    report = {}
+    for metric in ('import', 'first_call', 'warm_call'):
+        values = sorted(sample[metric] for sample in samples)
+        report[metric] = {
+            'median_ms': round(statistics.median(values), 1),
+            'max_ms': round(values[-1], 1)
+        }
+    report['import_budget_ms'] = args.import_budget_ms
+    print(json.dumps(report, indent=2))
+
+    if report['import']['median_ms'] > args.import_budget_ms:
+        print(f"Import time over budget: {report['import']['median_ms']}ms > {args.import_budget_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -102,3 +102,121 @@ def test_of_get_stack_status(mock_stdout):
 
     ### Second subtest
 
+
+@patch('CFSignalerFunction.app.THRESHOLD', 2)
+@patch('CFSignalerFunction.app.cfn_signal_resource')
+@patch('CFSignalerFunction.app.tag_ec2_instance')
+@patch('CFSignalerFunction.app.run_checks')
+@patch('CFSignalerFunction.app.discover_monitored_instances')
+def test_process_instances_batch(mock_discover, mock_run_checks, mock_tag, mock_signal, event_from_scheduler):
+    mock_discover.return_value = ['i-batch1', 'i-batch2', 'i-batch3']
+    # i-batch2 is slow to converge
+    mock_run_checks.side_effect = lambda event: event['ResourceProperties']['ec2_resource_id'] != 'i-batch2'
+
+    outcomes = svc.process_instances_batch(event_from_scheduler, max_workers=2)
+    assert outcomes == {'i-batch1': 'SUCCEEDED', 'i-batch2': 'PENDING', 'i-batch3': 'SUCCEEDED'}
+    signalled = sorted(call.args[0]['ResourceProperties']['ec2_resource_id'] for call in mock_signal.call_args_list)
+    assert signalled == ['i-batch1', 'i-batch3']
+    assert 'ec2_resource_id' not in event_from_scheduler['ResourceProperties']
+
+    # next tick: handled instances are not signalled twice, slow one hits the threshold
+    outcomes = svc.process_instances_batch(event_from_scheduler)
+    assert outcomes == {'i-batch1': 'DONE', 'i-batch2': 'PENDING', 'i-batch3': 'DONE'}
+    outcomes = svc.process_instances_batch(event_from_scheduler)
+    assert outcomes['i-batch2'] == 'INCIDENT_RAISED'
+    assert mock_signal.call_count == 2
+    counter_value = svc.load_counter_value(event_from_scheduler, svc.instance_counter_parameter('i-batch2'))
+    assert (counter_value.status, counter_value.attempts) == ('disabled', 2)
+
+    # i-batch3 is no longer monitored: its counter goes at the next tick
+    mock_discover.return_value = ['i-batch1', 'i-batch2']
+    svc.process_instances_batch(event_from_scheduler)
+    assert svc.load_counter_value(event_from_scheduler, svc.instance_counter_parameter('i-batch3')) is None
+
+    # new temporal loop: instances kept across the update are checked again, not reported DONE
+    with patch('CFSignalerFunction.app.SIGNAL_MODE', 'batch'):
+        svc.start_temporal_loop(event_from_scheduler)
+    assert svc.STATE_STORE.keys(svc.instance_counter_prefix()) == []
+    mock_signal.reset_mock()
+    outcomes = svc.process_instances_batch(event_from_scheduler)
+    assert outcomes == {'i-batch1': 'SUCCEEDED', 'i-batch2': 'PENDING'}
+
+
+
+@patch('CFSignalerFunction.app.waiter.poll_until')
+@patch('CFSignalerFunction.app.enable_aws_scheduler')
+@patch('CFSignalerFunction.app.cfn_signal_resource')
+@patch('CFSignalerFunction.app.tag_ec2_instance')
+@patch('CFSignalerFunction.app.initialize_counter')
+@patch('CFSignalerFunction.app.enrich_event_with_ec2_resource_id')
+def test_wait_for_convergence(mock_enrich, mock_init, mock_tag, mock_signal, mock_enable, mock_poll, event_from_scheduler):
+    event_from_scheduler['ResourceProperties']['ec2_resource_id'] = 'i-waiter'
+    mock_enrich.return_value = event_from_scheduler
+
+    # First subtest: converged in-process, scheduler never engaged
+    mock_poll.return_value = (True, 3)
+    assert svc.wait_for_convergence(event_from_scheduler, MagicMock()) == ["200", "SUCCEEDED_IN_PROCESS:3"]
+    mock_signal.assert_called_once_with(event_from_scheduler, "SUCCESS")
+    mock_enable.assert_not_called()
+
+    # Second subtest: budget exhausted, temporal loop takes over
+    mock_signal.reset_mock()
+    mock_poll.return_value = (False, 7)
+    assert svc.wait_for_convergence(event_from_scheduler, MagicMock()) == ["200", "WAITER_FALLBACK_SCHEDULER"]
+    mock_signal.assert_not_called()
+    mock_enable.assert_called_once_with(svc.SCHEDULER_NAME)
+
+
+@patch('CFSignalerFunction.app.scheduler_tick')
+@patch('CFSignalerFunction.app.enrich_event_with_ec2_resource_id')
+@patch('CFSignalerFunction.app.instance_status_ok')
+def test_handle_instance_state_change(mock_status_ok, mock_enrich, mock_tick):
+    def state_change(state):
+        return {
+            "detail-type": "EC2 Instance State-change Notification",
+            "source": "aws.ec2",
+            "detail": {"instance-id": "i-evented", "state": state}
+        }
+
+    # First subtest: instance not started by the signaler
+    assert svc.handle_instance_state_change(state_change('running'), MagicMock()) == ["200", 'PASSED']
+
+    # Second subtest: intermediate state is only recorded
+    svc.record_instance_readiness('i-evented', State='pending', StartedBySignaler=True)
+    assert svc.handle_instance_state_change(state_change('stopped'), MagicMock()) == ["200", 'Readiness_recorded:stopped']
+    assert svc.load_instance_readiness('i-evented')['State'] == 'stopped'
+    mock_tick.assert_not_called()
+
+    # Third subtest: running but status checks not ok yet, no in-process wait: the next tick resumes
+    mock_status_ok.return_value = False
+    assert svc.handle_instance_state_change(state_change('running'), MagicMock()) == ["200", 'Readiness_recorded:running']
+    assert mock_status_ok.call_count == 1
+    mock_tick.assert_not_called()
+
+    # Fourth subtest: running and status checks ok, pipeline resumes for the instance
+    mock_status_ok.return_value = True
+    mock_enrich.side_effect = lambda event: {**event, 'ResourceProperties': {**event['ResourceProperties'], 'ec2_resource_id': 'i-evented'}}
+    mock_tick.return_value = ["200", "Counter_incrementer:enabled_increment_0_success"]
+    assert svc.handle_instance_state_change(state_change('running'), MagicMock()) == mock_tick.return_value
+    assert svc.load_instance_readiness('i-evented')['State'] == 'ok'
+    assert mock_tick.call_args.args[0]['ResourceProperties']['ec2_resource_id'] == 'i-evented'
+
+    svc.clear_instance_readiness('i-evented')
+    assert svc.load_instance_readiness('i-evented') == {}
+
+
+def test_instance_state_rule_enabled_while_start_pending():
+    rule_name = 'CFSignalerRule-MyStack-InstanceState'
+    events = boto3.client('events')
+    events.put_rule(Name=rule_name, EventPattern='{"source": ["aws.ec2"]}', State='DISABLED')
+    ec2 = boto3.client('ec2')
+    instance_id = ec2.describe_instances()['Reservations'][0]['Instances'][0]['InstanceId']
+    ec2.stop_instances(InstanceIds=[instance_id])
+
+    with patch('CFSignalerFunction.app.INSTANCE_STATE_RULE', rule_name):
+        assert svc.request_instance_start(instance_id)
+        assert svc.load_instance_readiness(instance_id)['StartedBySignaler']
+        assert events.describe_rule(Name=rule_name)['State'] == 'ENABLED'
+
+        svc.clear_instance_readiness(instance_id)
+        assert events.describe_rule(Name=rule_name)['State'] == 'DISABLED'
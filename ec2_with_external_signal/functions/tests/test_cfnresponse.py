@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+
+from CFSignalerFunction import cfnresponse
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_PUT(self):
+        server = self.server
+        server.bodies.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+        server.connections.add(self.client_address)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setattr(cfnresponse, 'BASE_DELAY', 0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.bodies, server.connections, server.statuses = [], set(), []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def custom_resource_event(server, request_id='req-1'):
+    return {
+        'ResponseURL': f"http://127.0.0.1:{server.server_address[1]}/presigned?X-Amz-Signature=abc",
+        'StackId': 'arn:aws:cloudformation:eu-central-1:123456789012:stack/MyStack/guid',
+        'RequestId': request_id,
+        'LogicalResourceId': 'CFSignalerCustomResource'
+    }
+
+
+def test_send_retries_server_errors_on_one_connection(stub_server):
+    stub_server.statuses = [500, 503]
+    context = MagicMock(log_stream_name='stream')
+
+    assert cfnresponse.send(custom_resource_event(stub_server), context, cfnresponse.SUCCESS, {'status': '200, SUCCEEDED'})
+    assert len(stub_server.bodies) == 3
+    assert stub_server.bodies[-1]['Data'] == {'status': '200, SUCCEEDED'}
+    assert len(stub_server.connections) == 1  # keep-alive
+
+
+def test_send_gives_up_on_client_error(stub_server):
+    stub_server.statuses = [403]
+    assert not cfnresponse.send(custom_resource_event(stub_server), MagicMock(log_stream_name='stream'), cfnresponse.FAILED)
+    assert len(stub_server.bodies) == 1
+
+
+def test_oversized_data_is_dropped(stub_server):
+    context = MagicMock(log_stream_name='stream')
+    body = cfnresponse.build_body(custom_resource_event(stub_server), context, cfnresponse.SUCCESS, {'blob': 'x' * 5000})
+    assert len(body) <= cfnresponse.MAX_BODY_SIZE
+    assert json.loads(body)['Data'] == {}
+
+
+def test_send_batch(stub_server):
+    context = MagicMock(log_stream_name='stream')
+    responses = [
+        {'event': custom_resource_event(stub_server, f"req-{i}"), 'context': context, 'response_status': cfnresponse.SUCCESS}
+        for i in range(5)
+    ]
+    assert cfnresponse.send_batch(responses) == [True] * 5
+    assert sorted(body['RequestId'] for body in stub_server.bodies) == [f"req-{i}" for i in range(5)]
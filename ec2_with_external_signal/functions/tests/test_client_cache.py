@@ -0,0 +1,43 @@
+import boto3
+
+from CFSignalerFunction.client_cache import CachedClient
+
+
+def test_describe_instances_deduplicated_and_updated_by_create_tags():
+    ec2 = CachedClient(boto3.client('ec2'))
+    instance_id = boto3.client('ec2').run_instances(
+        ImageId='ami-12345678', MinCount=1, MaxCount=1,
+        TagSpecifications=[{'ResourceType': 'instance', 'Tags': [{'Key': 'cache-test', 'Value': 'yes'}]}]
+    )['Instances'][0]['InstanceId']
+
+    filtered = ec2.describe_instances(Filters=[{'Name': 'tag:cache-test', 'Values': ['yes']}])
+    assert filtered['Reservations'][0]['Instances'][0]['InstanceId'] == instance_id
+    # lookup by id is served from the instances returned by the filtered describe
+    ec2.describe_instances(InstanceIds=[instance_id])
+    assert (ec2.hits, ec2.misses) == (1, 1)
+
+    ec2.create_tags(Resources=[instance_id], Tags=[{'Key': 'transaction.health', 'Value': 'complete'}])
+    tags = ec2.describe_instances(InstanceIds=[instance_id])['Reservations'][0]['Instances'][0]['Tags']
+    assert {'Key': 'transaction.health', 'Value': 'complete'} in tags
+    assert ec2.stats()['hits'] == 2
+
+    ec2.stop_instances(InstanceIds=[instance_id])
+    ec2.describe_instances(InstanceIds=[instance_id])
+    assert ec2.misses == 2
+
+    ec2.reset()
+    assert (ec2.hits, ec2.misses) == (0, 0)
+
+
+def test_writes_update_cached_reads():
+    ssm = CachedClient(boto3.client('ssm'))
+    ssm.put_parameter(Name='/cache/test', Value='first', Type='String', Overwrite=True)
+    assert ssm.get_parameter(Name='/cache/test')['Parameter']['Value'] == 'first'
+    assert ssm.misses == 0  # put populated the cache
+
+    events = CachedClient(boto3.client('events'))
+    boto3.client('events').put_rule(Name='cache-rule', ScheduleExpression='rate(5 minutes)', State='DISABLED')
+    assert events.describe_rule(Name='cache-rule')['State'] == 'DISABLED'
+    events.enable_rule(Name='cache-rule')
+    assert events.describe_rule(Name='cache-rule')['State'] == 'ENABLED'
+    assert events.stats() == {'service': 'events', 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
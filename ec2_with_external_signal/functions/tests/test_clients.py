@@ -0,0 +1,12 @@
+from CFSignalerFunction.clients import LazyClient
+
+
+def test_lazy_client_built_on_first_use():
+    client = LazyClient('ssm', {'retries': {'max_attempts': 10, 'mode': 'standard'}})
+    assert not client.built
+    assert client.service_name == 'ssm'
+
+    client.put_parameter(Name='/lazy/test', Value='v', Type='String')
+    assert client.built
+    assert client.get() is client.get()
+    assert client.meta.config.retries['mode'] == 'standard'
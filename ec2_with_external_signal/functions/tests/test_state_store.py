@@ -0,0 +1,110 @@
+import boto3
+import pytest
+
+from CFSignalerFunction import state_store
+from CFSignalerFunction.state_store import CounterState, StateConflict
+
+
+@pytest.fixture(scope='module')
+def dynamodb_table():
+    client = boto3.client('dynamodb')
+    client.create_table(
+        TableName='cfsignaler-state',
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    return 'cfsignaler-state'
+
+
+def make_store(backend, request):
+    if backend == 'memory':
+        return state_store.InMemoryStateStore()
+    if backend == 'ssm':
+        return state_store.SSMStateStore(boto3.client('ssm'))
+    return state_store.DynamoDBStateStore(boto3.client('dynamodb'), request.getfixturevalue('dynamodb_table'))
+
+
+@pytest.fixture(params=['memory', 'ssm', 'dynamodb'])
+def store(request):
+    return make_store(request.param, request)
+
+
+def test_legacy_values_are_parsed():
+    assert CounterState.from_value('enabled_increment_0').status == state_store.PENDING
+    assert CounterState.from_value('enabled_increment_3_success').status == state_store.SUCCESS
+    legacy = CounterState.from_value('disabled_increment_2')
+    assert (legacy.status, legacy.attempts) == (state_store.DISABLED, 2)
+
+
+def test_transitions_round_trip(store, request):
+    key = f"/test/{request.node.callspec.id}/SchedulerFlag"
+    assert store.get(key) is None
+
+    state = store.put(key, CounterState(instance_id='i-123'))
+    state = store.put(key, state.transition(attempts=state.attempts + 1), expected_version=state.version)
+    state = store.put(key, state.transition(status=state_store.SUCCESS), expected_version=state.version)
+
+    loaded = store.get(key)
+    assert (loaded.status, loaded.attempts, loaded.instance_id) == (state_store.SUCCESS, 1, 'i-123')
+    assert loaded.version == state.version
+
+
+@pytest.mark.parametrize('backend', ['memory', 'dynamodb'])
+def test_compare_and_set_rejects_stale_writer(backend, request):
+    store = make_store(backend, request)
+    key = f"/test/{backend}/cas"
+    first = store.put(key, CounterState())
+
+    store.put(key, first.transition(attempts=1), expected_version=first.version)
+    with pytest.raises(StateConflict):
+        store.put(key, first.transition(attempts=5), expected_version=first.version)
+    assert store.get(key).attempts == 1
+
+    with pytest.raises(StateConflict):
+        store.put(key, CounterState(), expected_version=0)  # must not exist yet
+
+
+class CountingClient:
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name == 'exceptions' or not callable(attribute):
+            return attribute
+
+        def call(**kwargs):
+            self.calls.append(name)
+            return attribute(**kwargs)
+        return call
+
+
+def test_ssm_one_call_per_write_conflicts_detected():
+    ssm = CountingClient(boto3.client('ssm'))
+    store = state_store.SSMStateStore(ssm)
+    key = '/test/ssm/detect'
+    first = store.put(key, CounterState(), expected_version=0)
+    second = store.put(key, first.transition(attempts=1), expected_version=first.version)
+    assert ssm.calls == ['put_parameter', 'put_parameter'] and second.version == first.version + 1
+
+    # a stale writer: detected from the returned version (not prevented, SSM has no conditional overwrite)
+    with pytest.raises(StateConflict):
+        store.put(key, first.transition(attempts=5), expected_version=first.version)
+    with pytest.raises(StateConflict):
+        store.put(key, CounterState(), expected_version=0)  # creation is conditional
+    assert len(ssm.calls) == 4
+
+
+def test_keys_and_delete(store, request):
+    prefix = f"/test/{request.node.callspec.id}/keys/"
+    for name in ('i-1', 'i-2', 'readiness/i-1'):
+        store.put(prefix + name, CounterState())
+    assert store.keys(prefix) == [prefix + 'i-1', prefix + 'i-2']
+
+    store.delete(prefix + 'i-1')
+    store.delete(prefix + 'i-missing')
+    assert store.get(prefix + 'i-1') is None
+    assert store.keys(prefix) == [prefix + 'i-2']
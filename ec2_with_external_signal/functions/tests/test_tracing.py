@@ -0,0 +1,58 @@
+import json
+import logging
+
+import pytest
+
+from CFSignalerFunction.tracing import Tracer
+
+
+class ReprCounter:
+    calls = 0
+
+    def __repr__(self):
+        ReprCounter.calls += 1
+        return 'ReprCounter'
+
+
+@pytest.fixture
+def trace_logger():
+    return logging.getLogger('test_tracing')
+
+
+def test_unsampled_invocation_skips_formatting(trace_logger, caplog):
+    tracer = Tracer(trace_logger, sample_rate=0)
+    traced = tracer.span(lambda value: value)
+
+    with caplog.at_level(logging.INFO, logger='test_tracing'):
+        traced(ReprCounter())
+    assert ReprCounter.calls == 0
+    assert caplog.records == []
+    # timings are still aggregated
+    assert tracer.summary()['trace_summary']['functions']['<lambda>']['calls'] == 1
+
+
+def test_span_record_redacted_and_truncated(trace_logger, caplog):
+    tracer = Tracer(trace_logger, sample_rate=1, max_length=10)
+
+    @tracer.span
+    def send(event):
+        raise ValueError('boom')
+
+    with caplog.at_level(logging.INFO, logger='test_tracing'), pytest.raises(ValueError):
+        send({'ResponseURL': 'https://presigned.example/secret', 'StackId': 'arn:aws:cloudformation:eu-central-1:1:stack/a/b'})
+
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['span'] == 'send'
+    assert record['outcome'] == 'error:ValueError'
+    assert record['args'][0]['ResponseURL'] == '***'
+    assert record['args'][0]['StackId'].startswith('arn:aws:cl...')
+
+    summary = tracer.summary()['trace_summary']['functions']['send']
+    assert (summary['calls'], summary['errors']) == (1, 1)
+
+
+def test_start_invocation_resets_summary(trace_logger):
+    tracer = Tracer(trace_logger, sample_rate=1, level=logging.DEBUG)
+    tracer.span(lambda: None)()
+    tracer.start_invocation()
+    assert tracer.summary()['trace_summary']['functions'] == {}
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+from CFSignalerFunction import waiter
+
+
+class FakeClock:
+    """ Drives both time.monotonic and the lambda remaining time """
+    def __init__(self, budget_ms):
+        self.now = 0.0
+        self.budget_ms = budget_ms
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def monotonic(self):
+        return self.now
+
+    def context(self):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.side_effect = lambda: self.budget_ms - self.now * 1000
+        return context
+
+
+def test_backoff_delays_are_capped():
+    delays = waiter.backoff_delays(base_delay=1, max_delay=8)
+    for attempt in range(10):
+        assert 0 <= next(delays) <= min(8, 2 ** attempt)
+
+
+def test_poll_until_converges():
+    clock = FakeClock(budget_ms=120000)
+    check = MagicMock(side_effect=[False, False, True])
+
+    converged, attempts = waiter.poll_until(check, clock.context(), sleep=clock.sleep, clock=clock.monotonic)
+    assert converged
+    assert attempts == 3
+
+
+def test_poll_until_stops_within_budget():
+    clock = FakeClock(budget_ms=60000)
+    check = MagicMock(return_value=False)
+
+    converged, attempts = waiter.poll_until(check, clock.context(), safety_margin_ms=15000, sleep=clock.sleep, clock=clock.monotonic)
+    assert not converged
+    assert attempts > 1
+    # safety margin left for the scheduler fallback
+    assert clock.now <= 45
@@ -0,0 +1,90 @@
+"""
+Accounts URL requests served from the inventory snapshot cache (inventory.py), against the stub organization.
+
+- cold: first request of an execution environment, full walk
+- warm 200: repeat request, snapshot and serialized body from memory
+- warm 304: repeat request with If-None-Match
+- MoveAccount event: incremental refresh (two containers visited) compared to a full walk
+
+usage (from lambda_urls_blog/src folder): python benchmarks/bench_inventory.py [--accounts 5000] [--latency-ms 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(SRC, 'functions', 'url_function'), os.path.dirname(os.path.abspath(__file__))]
+os.environ.setdefault('MAX_DEPTH', '3')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+logging_level = os.environ.get('LOG_LEVEL', 'WARNING')
+
+import logging  # noqa: E402
+
+import inventory  # noqa: E402
+import url_function  # noqa: E402
+from org_walker import OrganizationWalker, TokenBucket  # noqa: E402
+from stub_organizations import StubOrganizations  # noqa: E402
+
+
+def timed(function, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=40)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=200)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging_level)
+
+    stub = StubOrganizations(accounts=args.accounts, latency_ms=args.latency_ms)
+    walker = OrganizationWalker(stub, max_depth=3, max_workers=args.workers,
+                                rate_limiter=TokenBucket(rate=args.rate, burst=10))
+    url_function.INVENTORY = inventory.InventoryCache(walker)
+    url_function.INDEX.clear()
+    request = {'headers': {}, 'queryStringParameters': {'limit': '5000'},
+               'requestContext': {'http': {'method': 'GET', 'path': '/'}}}
+
+    response, seconds = timed(lambda: url_function.lambda_handler(request, None))
+    print(f"cold: {seconds * 1000:,.0f} ms, {stub.calls} calls, {len(response['body']):,} bytes")
+
+    response, seconds = timed(lambda: url_function.lambda_handler(request, None), args.requests)
+    print(f"warm 200: {seconds * 1e6:,.0f} us per request")
+
+    etag = response['headers']['ETag']
+    revalidation = dict(request, headers={'if-none-match': etag})
+    response, seconds = timed(lambda: url_function.lambda_handler(revalidation, None), args.requests)
+    print(f"warm 304: {seconds * 1e6:,.0f} us per request (status {response['statusCode']})")
+
+    destination = stub.ous[stub.root_id][0]['Id']
+    source = next(ou for ou in reversed(list(stub.accounts)) if stub.accounts[ou])
+    account_id = stub.accounts[source][0]['Id']
+    stub.move_account(account_id, source, destination)
+    event = {
+        'source': 'aws.organizations',
+        'detail-type': 'AWS API Call via CloudTrail',
+        'detail': {'eventName': 'MoveAccount', 'requestParameters': {
+            'accountId': account_id, 'sourceParentId': source, 'destinationParentId': destination}}
+    }
+    stub.calls = 0
+    result, seconds = timed(lambda: url_function.lambda_handler(event, None))
+    print(f"MoveAccount event, incremental: {seconds * 1000:,.0f} ms, {stub.calls} calls -> version {result['version']}")
+
+    response = url_function.lambda_handler(revalidation, None)
+    moved = [a for a in url_function.INVENTORY.get()['accounts'] if a['Id'] == account_id][0]
+    print(f"  previous etag now answers {response['statusCode']}, account {account_id} under {moved['Path']}")
+
+    stub.calls = 0
+    _, seconds = timed(lambda: walker.walk(stub.root_id))
+    print(f"full walk, for comparison: {seconds * 1000:,.0f} ms, {stub.calls} calls")
+
+
+if __name__ == '__main__':
+    main()
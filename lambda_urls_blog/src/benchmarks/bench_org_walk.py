@@ -0,0 +1,87 @@
+"""
+Organization walk against a synthetic 5,000 accounts tree (stub_organizations.py, in process).
+
+Variants:
+- recursive: sequential depth first walk, one call at a time (the previous get_accounts_recursive approach),
+  throttled calls retried with exponential backoff like the botocore default
+- walker: org_walker.OrganizationWalker, breadth first with each of --workers threads and the token bucket limiter
+
+The stub adds --latency-ms per call and throttles above --tps calls per second, like the Organizations API.
+
+usage (from lambda_urls_blog/src folder): python benchmarks/bench_org_walk.py [--accounts 5000] [--workers 1 4 8 16] [--tps 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+from botocore.exceptions import ClientError
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(SRC, 'functions', 'url_function'), os.path.dirname(os.path.abspath(__file__))]
+
+from org_walker import OrganizationWalker, TokenBucket  # noqa: E402
+from stub_organizations import StubOrganizations  # noqa: E402
+
+
+def call(operation, **kwargs):
+    for attempt in range(5):
+        try:
+            return operation(**kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TooManyRequestsException' or attempt == 4:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def recursive_walk(client, parent_id, max_depth, depth=0):
+    accounts = []
+    kwargs = {'ParentId': parent_id}
+    while True:
+        page = call(client.list_accounts_for_parent, **kwargs)
+        accounts += page['Accounts']
+        if 'NextToken' not in page:
+            break
+        kwargs['NextToken'] = page['NextToken']
+    if depth < max_depth:
+        kwargs = {'ParentId': parent_id}
+        while True:
+            page = call(client.list_organizational_units_for_parent, **kwargs)
+            for ou in page['OrganizationalUnits']:
+                accounts += recursive_walk(client, ou['Id'], max_depth, depth + 1)
+            if 'NextToken' not in page:
+                break
+            kwargs['NextToken'] = page['NextToken']
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--max-depth', type=int, default=3)
+    parser.add_argument('--latency-ms', type=float, default=40)
+    parser.add_argument('--tps', type=int, default=50, help='stub API rate limit, calls per second')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--rate', type=float, default=45, help='walker client side calls per second')
+    parser.add_argument('--burst', type=int, default=5, help='walker token bucket size')
+    args = parser.parse_args()
+
+    stub = StubOrganizations(accounts=args.accounts, latency_ms=args.latency_ms, tps=args.tps)
+    print(f"{args.accounts} accounts, {len(stub.ous) - 1} OUs, {args.latency_ms} ms per call, {args.tps} calls/s limit")
+
+    started = time.perf_counter()
+    found = recursive_walk(stub, stub.root_id, args.max_depth)
+    print(f"recursive: {len(found)} accounts in {time.perf_counter() - started:.1f}s, {stub.calls} calls")
+
+    for workers in args.workers:
+        stub.calls = stub.throttled = 0
+        walker = OrganizationWalker(stub, max_depth=args.max_depth, max_workers=workers,
+                                    rate_limiter=TokenBucket(rate=args.rate, burst=args.burst))
+        started = time.perf_counter()
+        found = walker.walk(stub.root_id)
+        print(f"walker {workers:>2} workers: {len(found)} accounts in {time.perf_counter() - started:.1f}s, "
+              f"{stub.calls} calls, {stub.throttled} throttled")
+
+
+if __name__ == '__main__':
+    main()
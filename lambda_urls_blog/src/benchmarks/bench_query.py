@@ -0,0 +1,60 @@
+"""
+Accounts URL queries (query.py): latency and response size per query, for organizations of growing size.
+The snapshot is walked once per size (stub organization, no latency); timings are per warm request.
+
+usage (from lambda_urls_blog/src folder): python benchmarks/bench_query.py [--accounts 5000 50000] [--requests 200]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(SRC, 'functions', 'url_function'), os.path.dirname(os.path.abspath(__file__))]
+os.environ.setdefault('MAX_DEPTH', '3')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+import inventory  # noqa: E402
+import url_function  # noqa: E402
+from org_walker import OrganizationWalker, TokenBucket  # noqa: E402
+from stub_organizations import StubOrganizations  # noqa: E402
+
+QUERIES = (
+    ('max page size (5000)', {'limit': '5000'}, {}),
+    ('first page', {}, {}),
+    ('first page, gzip', {}, {'accept-encoding': 'gzip'}),
+    ('first page, ndjson', {'format': 'ndjson'}, {}),
+    ('one OU subtree', {'path': 'Root/ou-1-1/ou-2-7'}, {}),
+    ('suspended', {'status': 'SUSPENDED'}, {}),
+    ('name prefix', {'name': 'account-0001'}, {}),
+    ('depth 1, active, gzip', {'depth': '1', 'status': 'ACTIVE'}, {'accept-encoding': 'gzip'}),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, nargs='+', default=[5000, 50000])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for accounts in args.accounts:
+        stub = StubOrganizations(accounts=accounts, latency_ms=0, page_size=1000)
+        walker = OrganizationWalker(stub, max_depth=3, rate_limiter=TokenBucket(rate=1e6, burst=1000))
+        url_function.INVENTORY = inventory.InventoryCache(walker)
+        url_function.INDEX.clear()
+        print(f"{accounts} accounts")
+        for label, parameters, headers in QUERIES:
+            request = {'queryStringParameters': parameters, 'headers': headers}
+            response = url_function.lambda_handler(request, None)  # warms the snapshot and index
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                url_function.lambda_handler(request, None)
+            microseconds = (time.perf_counter() - started) / args.requests * 1e6
+            print(f"  {label:<38} {response['headers']['X-Count']:>6} accounts {len(response['body']):>10,} bytes"
+                  f" {microseconds:>9,.0f} us{'  next page' if 'X-Next-Cursor' in response['headers'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
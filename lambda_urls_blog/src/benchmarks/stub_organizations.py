@@ -0,0 +1,89 @@
+"""
+In-process stand-in for the Organizations API, serving a synthetic tree: root -> OUs (branching per level)
+with accounts spread over every container. Paginated like the real API (NextToken), with a per call
+latency and an optional API rate limit raising TooManyRequestsException.
+"""
+import threading
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+
+class StubOrganizations:
+
+    def __init__(self, accounts=5000, branching=(6, 6, 4), latency_ms=40, page_size=20, tps=None):
+        self.latency_ms = latency_ms
+        self.page_size = page_size
+        self.tps = tps
+        self.calls = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+        self.root_id = 'r-root'
+        self.ous = {self.root_id: []}  # parent id -> child OUs
+        self.accounts = {self.root_id: []}  # parent id -> accounts
+        level = [self.root_id]
+        for depth, children in enumerate(branching, 1):
+            next_level = []
+            for parent in level:
+                for i in range(children):
+                    ou_id = f"ou-{depth}{len(self.ous):07d}"
+                    self.ous[parent].append({'Id': ou_id, 'Name': f"ou-{depth}-{len(self.ous)}",
+                                             'Arn': f"arn:aws:organizations::111111111111:ou/o-stub/{ou_id}"})
+                    self.ous[ou_id] = []
+                    self.accounts[ou_id] = []
+                    next_level.append(ou_id)
+            level = next_level
+        containers = list(self.accounts)
+        for i in range(accounts):
+            account_id = f"{200000000000 + i:012d}"
+            self.accounts[containers[i % len(containers)]].append({
+                'Id': account_id,
+                'Arn': f"arn:aws:organizations::111111111111:account/o-stub/{account_id}",
+                'Email': f"aws+{account_id}@example.com",
+                'Name': f"account-{i:05d}",
+                'Status': 'SUSPENDED' if i % 50 == 0 else 'ACTIVE',
+                'JoinedMethod': 'CREATED',
+                'JoinedTimestamp': '2023-01-01T00:00:00+00:00'
+            })
+
+    def _request(self, operation):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1:
+                self._recent.popleft()
+            if self.tps is not None and len(self._recent) >= self.tps:
+                self.throttled += 1
+                raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}}, operation)
+            self._recent.append(now)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def _page(self, items, key, NextToken=None):
+        start = int(NextToken or 0)
+        response = {key: [dict(item) for item in items[start:start + self.page_size]]}
+        if start + self.page_size < len(items):
+            response['NextToken'] = str(start + self.page_size)
+        return response
+
+    def list_roots(self):
+        self._request('ListRoots')
+        return {'Roots': [{'Id': self.root_id, 'Name': 'Root'}]}
+
+    def list_accounts_for_parent(self, ParentId, NextToken=None):
+        self._request('ListAccountsForParent')
+        return self._page(self.accounts[ParentId], 'Accounts', NextToken)
+
+    def list_organizational_units_for_parent(self, ParentId, NextToken=None):
+        self._request('ListOrganizationalUnitsForParent')
+        return self._page(self.ous[ParentId], 'OrganizationalUnits', NextToken)
+
+    def move_account(self, AccountId, SourceParentId, DestinationParentId):
+        """ As MoveAccount, without latency or throttling (an administrator's change, not a walker call) """
+        with self._lock:
+            account = next(a for a in self.accounts[SourceParentId] if a['Id'] == AccountId)
+            self.accounts[SourceParentId].remove(account)
+            self.accounts[DestinationParentId].append(account)
@@ -0,0 +1,8 @@
+# url_function modules import each other top level (as in the Lambda package), the stub organization is a benchmark tool
+import os
+import sys
+
+SRC = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(SRC, 'functions', 'url_function'), os.path.join(SRC, 'benchmarks')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('MAX_DEPTH', '3')
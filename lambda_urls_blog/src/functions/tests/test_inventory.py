@@ -0,0 +1,139 @@
+import threading
+import time
+
+import inventory
+from org_walker import OrganizationWalker, TokenBucket
+from stub_organizations import StubOrganizations
+
+
+class Clock:
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SlowWalker(OrganizationWalker):
+    """ Walks wait for release() once hold() was called, as a long Organizations walk would """
+
+    def __init__(self, client):
+        super().__init__(client, max_depth=2, max_workers=4, rate_limiter=TokenBucket(rate=1000, burst=1000))
+        self.started = threading.Event()
+        self._released = threading.Event()
+        self._released.set()
+
+    def hold(self):
+        self.started.clear()
+        self._released.clear()
+
+    def release(self):
+        self._released.set()
+
+    def walk_containers(self, starts, known=()):
+        self.started.set()
+        self._released.wait(10)
+        return super().walk_containers(starts, known)
+
+
+def make_cache(**kwargs):
+    stub = StubOrganizations(accounts=60, branching=(3, 2), latency_ms=0)
+    walker = SlowWalker(stub)
+    clock = Clock()
+    cache = inventory.InventoryCache(walker, ttl_seconds=900, check_seconds=60, clock=clock, **kwargs)
+    return stub, walker, clock, cache
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_get_serves_stale_snapshot_during_walk():
+    stub, walker, clock, cache = make_cache()
+    first = cache.get()
+    assert (first['version'], len(first['accounts'])) == (1, 60)
+
+    account = stub.accounts[stub.root_id][0]
+    stub.move_account(account['Id'], stub.root_id, stub.ous[stub.root_id][0]['Id'])
+    walker.hold()
+    clock.now += 1000  # past ttl: revalidation walks in the background
+    assert cache.get() is first
+    assert walker.started.wait(5)
+
+    # the walk is in progress (blocked): readers are answered right away, with the snapshot they had
+    started = time.perf_counter()
+    for _ in range(100):
+        assert cache.get() is first
+    assert time.perf_counter() - started < 0.5
+
+    walker.release()
+    wait_for(lambda: cache.snapshot is not first)
+    assert cache.get()['version'] == 2
+    assert cache.refreshes['full'] == 2
+
+
+def test_cold_get_waits_for_one_walk():
+    _, walker, _, cache = make_cache()
+    walker.hold()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert walker.started.wait(5)
+    walker.release()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert cache.refreshes['full'] == 1
+
+
+def test_apply_event_refreshes_moved_containers():
+    stub, walker, _, cache = make_cache()
+    first = cache.get()
+    account = stub.accounts[stub.root_id][0]
+    destination = stub.ous[stub.root_id][0]['Id']
+    stub.move_account(account['Id'], stub.root_id, destination)
+    event = {'detail': {'eventName': 'MoveAccount', 'requestParameters': {
+        'accountId': account['Id'], 'sourceParentId': stub.root_id, 'destinationParentId': destination}}}
+
+    snapshot = cache.apply_event(event)
+    assert snapshot['version'] == first['version'] + 1
+    moved = next(a for a in snapshot['accounts'] if a['Id'] == account['Id'])
+    assert moved['ParentId'] == destination
+    assert cache.refreshes == {'full': 1, 'incremental': 1, 'reloaded': 0}
+
+
+def test_revalidate_reloads_newer_stored_snapshot():
+    class MemoryStore:
+        def __init__(self):
+            self.saved, self.etag = None, 0
+
+        def load(self, if_none_match=None):
+            if self.saved is None or str(self.etag) == if_none_match:
+                return None, None
+            return self.saved, str(self.etag)
+
+        def save(self, snapshot):
+            self.saved = {key: value for key, value in snapshot.items() if key != 'accounts'}
+            self.etag += 1
+            return str(self.etag)
+
+    store = MemoryStore()
+    stub, _, clock, writer = make_cache(store=store)
+    writer.get()
+    _, _, _, reader = make_cache(store=store)
+    reader.clock = clock
+    assert reader.get()['version'] == 1 and reader.refreshes['full'] == 0  # loaded, not walked
+
+    account = stub.accounts[stub.root_id][0]
+    stub.move_account(account['Id'], stub.root_id, stub.ous[stub.root_id][0]['Id'])
+    clock.now += 10
+    writer.refresh([stub.root_id, stub.ous[stub.root_id][0]['Id']])
+    clock.now += 60
+    reader.get()
+    wait_for(lambda: reader.refreshes['reloaded'] == 1)
+    assert reader.get()['etag'] == writer.snapshot['etag']
@@ -0,0 +1,106 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import org_walker
+from org_walker import OrganizationWalker, TokenBucket
+from stub_organizations import StubOrganizations
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_rate_and_throttling_backoff():
+    clock = Clock()
+    bucket = TokenBucket(rate=8, burst=2, min_rate=1, recovery=0.5, clock=clock, sleep=clock.sleep)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.now == 1.0  # 2 in the burst, then 8 at 8 per second
+
+    bucket.throttled()
+    bucket.throttled()
+    assert (bucket.rate, bucket.tokens, bucket.throttles) == (2, 0, 2)
+    bucket.acquire()  # at the halved rate, then a granted call adds back recovery * max rate
+    assert (clock.now, bucket.rate) == (1.5, 6)
+
+
+def walker_for(stub, **kwargs):
+    return OrganizationWalker(stub, rate_limiter=TokenBucket(rate=10000, burst=10000), sleep=lambda _: None, **kwargs)
+
+
+def test_walk_matches_sequential_walk_and_respects_depth():
+    stub = StubOrganizations(accounts=300, branching=(3, 2, 2), latency_ms=2, page_size=7)
+    parallel = walker_for(stub, max_depth=3, max_workers=8).walk(stub.root_id, 'Root')
+    sequential = walker_for(stub, max_depth=3, max_workers=1).walk(stub.root_id, 'Root')
+    assert parallel == sequential
+    assert len(parallel) == 300 and len({a['Id'] for a in parallel}) == 300  # every page followed, no duplicates
+
+    shallow = walker_for(stub, max_depth=1).walk(stub.root_id, 'Root')
+    assert {a['Depth'] for a in shallow} == {0, 1}
+    assert all(a['Path'].count('/') == a['Depth'] for a in parallel)
+
+
+def test_throttled_calls_are_retried():
+    class Throttling(StubOrganizations):
+        """ The first attempt of every request throttled, from several walker threads at once """
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.attempted = set()
+
+        def _throttle_first(self, operation, *request):
+            with self._lock:
+                first = (operation, *request) not in self.attempted
+                self.attempted.add((operation, *request))
+                self.throttled += first
+            if first:
+                raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'Rate exceeded'}}, operation)
+
+        def list_accounts_for_parent(self, ParentId, NextToken=None):
+            self._throttle_first('ListAccountsForParent', ParentId, NextToken)
+            return super().list_accounts_for_parent(ParentId, NextToken)
+
+        def list_organizational_units_for_parent(self, ParentId, NextToken=None):
+            self._throttle_first('ListOrganizationalUnitsForParent', ParentId, NextToken)
+            return super().list_organizational_units_for_parent(ParentId, NextToken)
+
+    stub = Throttling(accounts=200, branching=(4, 3), latency_ms=0, page_size=5)
+    sleeps = []
+    walker = OrganizationWalker(stub, max_depth=2, max_workers=4,
+                                rate_limiter=TokenBucket(rate=1000, burst=1000, min_rate=100), sleep=sleeps.append)
+    accounts = walker.walk(stub.root_id)
+    assert len(accounts) == 200 and len({a['Id'] for a in accounts}) == 200
+    assert stub.throttled == len(stub.attempted) == walker.rate_limiter.throttles == len(sleeps)
+    assert walker.calls == 2 * len(stub.attempted)
+
+
+def test_other_errors_are_raised_at_once(monkeypatch):
+    calls = []
+
+    class Denied:
+        def list_roots(self):
+            calls.append(1)
+            raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'no'}}, 'ListRoots')
+
+    with pytest.raises(ClientError):
+        walker_for(Denied()).root()
+    assert len(calls) == 1
+
+    monkeypatch.setattr(org_walker, 'MAX_ATTEMPTS', 3)
+
+    class Throttled:
+        def list_roots(self):
+            calls.append(1)
+            raise ClientError({'Error': {'Code': 'TooManyRequestsException', 'Message': 'slow down'}}, 'ListRoots')
+
+    with pytest.raises(ClientError):
+        walker_for(Throttled()).root()
+    assert len(calls) == 4
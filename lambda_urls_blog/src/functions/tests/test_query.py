@@ -0,0 +1,78 @@
+import base64
+import gzip
+import json
+
+import pytest
+
+import query
+
+
+def account(i, depth, path, status='ACTIVE'):
+    return {'Id': f"{100000000000 + i:012d}", 'Name': f"{'prod' if i % 2 else 'dev'}-{i:03d}", 'Status': status,
+            'Depth': depth, 'Path': path, 'ParentId': path}
+
+
+@pytest.fixture
+def index():
+    accounts = [account(i, 0, 'Root') for i in range(3)]
+    accounts += [account(i, 1, 'Root/Prod', 'SUSPENDED' if i == 12 else 'ACTIVE') for i in range(10, 15)]
+    accounts += [account(i, 2, 'Root/Prod/Web') for i in range(20, 24)]
+    accounts += [account(i, 1, 'Root/Production') for i in range(30, 32)]  # shares the Root/Prod prefix
+    accounts.sort(key=query.sort_key)
+    return query.AccountIndex(accounts)
+
+
+def select_all(index, filters, limit):
+    """ Follow the cursor page by page, as a client would """
+    pages, after = [], None
+    while True:
+        positions, more = index.select(filters, after, limit)
+        pages.append([index.accounts[p]['Id'] for p in positions])
+        if not more:
+            return pages
+        after = query.decode_cursor(query.encode_cursor(index.keys[positions[-1]]))
+
+
+def test_path_is_a_subtree_not_a_prefix(index):
+    positions, more = index.select({'path': 'Root/Prod/'}, limit=100)
+    assert not more
+    assert {index.accounts[p]['Path'] for p in positions} == {'Root/Prod', 'Root/Prod/Web'}
+
+
+def test_filters_combine(index):
+    positions, _ = index.select({'path': 'Root/Prod', 'status': {'ACTIVE'}, 'name': 'PROD'}, limit=100)
+    assert [index.accounts[p]['Id'] for p in positions] == ['100000000011', '100000000013', '100000000021',
+                                                            '100000000023']
+
+
+def test_cursor_pages_cover_everything_once(index):
+    pages = select_all(index, {}, limit=4)
+    assert [len(page) for page in pages] == [4, 4, 4, 2]
+    ids = [i for page in pages for i in page]
+    assert ids == [a['Id'] for a in index.accounts]
+
+    filtered = [i for page in select_all(index, {'status': {'ACTIVE'}}, limit=3) for i in page]
+    assert len(filtered) == len(set(filtered)) == 13
+
+
+def test_parse_defaults_and_bad_requests():
+    filters, after, limit, output_format = query.parse({'queryStringParameters': None}, 5000, 5000)
+    assert (filters, after, limit, output_format) == ({}, None, 5000, 'json')
+    assert query.parse({'headers': {'accept': 'application/x-ndjson'}})[3] == 'ndjson'
+
+    for parameters in ({'limit': '0'}, {'limit': '5001'}, {'limit': 'ten'}, {'status': 'GONE'}, {'depth': 'x'},
+                       {'cursor': 'not-a-cursor'}, {'format': 'xml'}):
+        with pytest.raises(query.BadRequest):
+            query.parse({'queryStringParameters': parameters})
+
+
+def test_bodies_and_gzip(index):
+    positions, _ = index.select({'depth': 2}, limit=100)
+    assert [a['Id'] for a in json.loads(index.body(positions, 'json'))] == [index.accounts[p]['Id'] for p in positions]
+    assert len(index.body(positions, 'ndjson').splitlines()) == 4
+
+    assert query.accepts_gzip({'headers': {'accept-encoding': 'br, gzip;q=0.8'}})
+    assert not query.accepts_gzip({'headers': {'accept-encoding': 'gzipx'}})
+    body = index.body(range(len(index.accounts)), 'json')
+    encoded, is_base64 = query.compress(body)
+    assert is_base64 and gzip.decompress(base64.b64decode(encoded)).decode('utf-8') == body
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import inventory
+import url_function
+from org_walker import OrganizationWalker, TokenBucket
+from stub_organizations import StubOrganizations
+
+
+@pytest.fixture
+def organization(monkeypatch):
+    stub = StubOrganizations(accounts=1500, branching=(3, 2), latency_ms=0, page_size=200)
+    walker = OrganizationWalker(stub, max_depth=3, rate_limiter=TokenBucket(rate=1000, burst=1000))
+    monkeypatch.setattr(url_function, 'INVENTORY', inventory.InventoryCache(walker))
+    url_function.INDEX.clear()
+    return stub
+
+
+def request(parameters=None, headers=None):
+    return {'headers': headers or {}, 'queryStringParameters': parameters,
+            'requestContext': {'http': {'method': 'GET', 'path': '/'}}}
+
+
+def test_no_limit_returns_the_full_list(organization):
+    # clients written before paging: every account, no cursor to follow
+    response = url_function.lambda_handler(request(), None)
+    assert response['statusCode'] == 200
+    assert len(json.loads(response['body'])) == 1500
+    assert response['headers']['X-Count'] == '1500' and 'X-Next-Cursor' not in response['headers']
+
+
+def test_past_max_page_size_pages_and_warns(organization, monkeypatch, caplog):
+    monkeypatch.setattr(url_function, 'PAGE_SIZE', 1000)
+    response = url_function.lambda_handler(request(), None)
+    assert response['headers']['X-Count'] == '1000' and 'X-Next-Cursor' in response['headers']
+    assert 'without limit=' in caplog.text
+
+    rest = url_function.lambda_handler(request({'cursor': response['headers']['X-Next-Cursor']}), None)
+    ids = [account['Id'] for account in json.loads(response['body']) + json.loads(rest['body'])]
+    assert len(ids) == len(set(ids)) == 1500 and 'X-Next-Cursor' not in rest['headers']
+
+
+def test_bad_limit_is_rejected(organization):
+    response = url_function.lambda_handler(request({'limit': str(url_function.MAX_PAGE_SIZE + 1)}), None)
+    assert response['statusCode'] == 400
+    assert 'limit' in json.loads(response['body'])['error']
@@ -0,0 +1,272 @@
+############ IMPORTS AND SETTINGS ##############
+
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import org_walker
+
+logger = logging.getLogger()
+
+# CloudTrail events of the organizations service (EventBridge, us-east-1 only) that change the inventory
+CHANGE_EVENTS = (
+    'MoveAccount', 'CreateAccountResult', 'CreateOrganizationalUnit', 'DeleteOrganizationalUnit',
+    'UpdateOrganizationalUnit', 'RemoveAccountFromOrganization', 'LeaveOrganization', 'CloseAccount',
+    'AcceptHandshake'
+)
+
+########## IMPORTS AND SETTINGS END HERE ############
+
+
+def _json_default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    return None
+
+
+def new_snapshot(root_id, root_name, containers, previous=None, now=None):
+    """
+    Snapshot: the walked containers (persisted) and the flat account list served (derived).
+    The version only moves, and the etag only changes, when the account list changes.
+    """
+    accounts = json.loads(json.dumps(org_walker.flatten(containers, root_id, root_name), default=_json_default))
+    digest = hashlib.sha256(json.dumps(accounts, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    etag = f'"{digest}"'
+    version = (previous or {}).get('version', 0)
+    if previous is None or previous['etag'] != etag:
+        version += 1
+    return {
+        'version': version,
+        'etag': etag,
+        'built_at': now if now is not None else time.time(),
+        'root_id': root_id,
+        'root_name': root_name,
+        'containers': containers,
+        'accounts': accounts
+    }
+
+
+def reachable(containers, root_id):
+    """ Containers still in the tree (OUs deleted or moved out of reach are dropped) """
+    kept, queue = {}, [root_id]
+    while queue:
+        container_id = queue.pop()
+        if container_id in containers and container_id not in kept:
+            kept[container_id] = containers[container_id]
+            queue += [child['Id'] for child in containers[container_id]['children']]
+    return kept
+
+
+def parent_of(snapshot, child_id):
+    for container_id, container in snapshot['containers'].items():
+        if any(child['Id'] == child_id for child in container['children']):
+            return container_id
+        if any(account['Id'] == child_id for account in container['accounts']):
+            return container_id
+    return None
+
+
+def changed_containers(event, snapshot):
+    """
+    Containers to visit again for an organizations change event, or None when it cannot be
+    narrowed down (a full walk is needed).
+    """
+    detail = event.get('detail', {})
+    name = detail.get('eventName')
+    parameters = detail.get('requestParameters') or {}
+    root_id = snapshot['root_id']
+    if name == 'MoveAccount':
+        return {parameters.get('sourceParentId'), parameters.get('destinationParentId')} - {None}
+    if name == 'CreateOrganizationalUnit':
+        return {parameters['parentId']} if parameters.get('parentId') else None
+    if name in ('CreateAccountResult', 'AcceptHandshake'):
+        return {root_id}  # new and invited accounts land in the root
+    if name in ('DeleteOrganizationalUnit', 'UpdateOrganizationalUnit'):
+        parent = parent_of(snapshot, parameters.get('organizationalUnitId'))
+        return {parent} if parent else None
+    if name in ('RemoveAccountFromOrganization', 'CloseAccount'):
+        parent = parent_of(snapshot, parameters.get('accountId'))
+        return {parent} if parent else None
+    if name == 'LeaveOrganization':
+        parent = parent_of(snapshot, detail.get('recipientAccountId'))
+        return {parent} if parent else None
+    return None
+
+
+class S3SnapshotStore:
+    """ Snapshot persisted as one JSON object, shared by all execution environments of the function """
+
+    def __init__(self, bucket, key='inventory/snapshot.json', client=None):
+        self.bucket = bucket
+        self.key = key
+        if client is None:
+            import boto3
+            client = boto3.client('s3')
+        self.client = client
+
+    def load(self, if_none_match=None):
+        """ (snapshot, object etag); (None, None) when missing or unchanged since if_none_match """
+        kwargs = {'Bucket': self.bucket, 'Key': self.key}
+        if if_none_match:
+            kwargs['IfNoneMatch'] = if_none_match
+        try:
+            response = self.client.get_object(**kwargs)
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code in ('304', 'NotModified', 'NoSuchKey', '404'):
+                return None, None
+            raise
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def save(self, snapshot):
+        body = json.dumps({key: value for key, value in snapshot.items() if key != 'accounts'}, default=_json_default)
+        return self.client.put_object(Bucket=self.bucket, Key=self.key, Body=body.encode('utf-8'),
+                                      ContentType='application/json')['ETag']
+
+
+class InventoryCache:
+    """
+    Organization inventory kept across warm invocations (module level instance), stale-while-revalidate:
+    - get() returns the snapshot held in memory right away. After check_seconds it is revalidated in a
+      background thread: reloaded from the store if another environment saved a newer one (conditional GET),
+      walked again once older than ttl_seconds. Past max_stale_seconds the walk is done before answering.
+    - apply_event() visits again only the containers an organizations change event touched, and saves.
+
+    Walks run outside the snapshot lock, into a new snapshot swapped in once complete: readers holding a
+    snapshot are never blocked by a walk, only callers with none (cold, or past max_stale_seconds) wait for one.
+
+    The background thread runs while the environment is active: when Lambda freezes it between invocations,
+    the refresh resumes on the next one, which is still served the current snapshot.
+
+    :param store: S3SnapshotStore or None (memory only: each environment walks on cold start)
+    """
+
+    def __init__(self, walker, ttl_seconds=900, check_seconds=60, max_stale_seconds=86400, store=None,
+                 clock=time.time):
+        self.walker = walker
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.store = store
+        self.clock = clock
+        self.snapshot = None
+        self.store_etag = None
+        self.checked_at = 0
+        self.refreshes = {'full': 0, 'incremental': 0, 'reloaded': 0}
+        self._lock = threading.Lock()  # snapshot swaps only, never held during a walk or a store call
+        self._walking = threading.Lock()  # one walk at a time, each built on the snapshot the previous one swapped in
+        self._refreshing = threading.Lock()  # one background refresh at a time
+
+    def _usable(self, snapshot, now):
+        return snapshot is not None and now - snapshot['built_at'] <= self.max_stale_seconds
+
+    def get(self):
+        now = self.clock()
+        with self._lock:
+            snapshot = self.snapshot
+            due = now - self.checked_at >= self.check_seconds
+            if due and self._usable(snapshot, now):
+                self.checked_at = now
+        if not self._usable(snapshot, now):
+            return self._get_blocking(now)
+        if due and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._revalidate, daemon=True).start()
+        return snapshot
+
+    def _get_blocking(self, now):
+        """ No snapshot to serve: load or walk before answering, once for the callers waiting together """
+        with self._walking:
+            if self.snapshot is None and self.store is not None:
+                self._load()
+            snapshot = self.snapshot
+            if not self._usable(snapshot, now):
+                snapshot = self._full_refresh()
+        with self._lock:
+            self.checked_at = now
+        return snapshot
+
+    def _revalidate(self):
+        try:
+            if self.store is not None:
+                stored, etag = self.store.load(if_none_match=self.store_etag)
+                if stored is not None and stored['built_at'] >= self.snapshot['built_at']:
+                    if self._swap(stored, etag, newer_only=True):
+                        self.refreshes['reloaded'] += 1
+            if self.clock() - self.snapshot['built_at'] > self.ttl_seconds:
+                with self._walking:
+                    if self.clock() - self.snapshot['built_at'] > self.ttl_seconds:  # not walked while waiting
+                        self._full_refresh()
+        except Exception as err:
+            logger.error(f"inventory refresh failed, serving version {self.snapshot['version']}: {err}", exc_info=True)
+        finally:
+            self._refreshing.release()
+
+    def _load(self):
+        stored, etag = self.store.load()
+        if stored is not None:
+            self._swap(stored, etag)
+
+    def _swap(self, snapshot, store_etag=None, newer_only=False):
+        """ Derive outside the lock, swap under it. newer_only: not over a snapshot built since (a walk) """
+        if 'accounts' not in snapshot:  # as persisted: derive the account list, keep version and etag
+            stored = snapshot
+            snapshot = new_snapshot(stored['root_id'], stored['root_name'], stored['containers'], now=stored['built_at'])
+            snapshot['version'] = stored['version']
+        with self._lock:
+            if newer_only and self.snapshot is not None and self.snapshot['built_at'] > snapshot['built_at']:
+                return False
+            self.snapshot = snapshot
+            self.store_etag = store_etag
+        return True
+
+    def _save(self, snapshot):
+        if self.store is not None:
+            etag = self.store.save(snapshot)
+            with self._lock:
+                if self.snapshot is snapshot:
+                    self.store_etag = etag
+
+    def _full_refresh(self):
+        """ Caller holds _walking """
+        root_id, root_name = self.walker.root()
+        containers = self.walker.walk_containers([(root_id, 0)])
+        snapshot = new_snapshot(root_id, root_name, containers, previous=self.snapshot, now=self.clock())
+        self._swap(snapshot)
+        self.refreshes['full'] += 1
+        self._save(snapshot)
+        return snapshot
+
+    def refresh(self, container_ids):
+        """ Visit container_ids again (and OUs new under them), keep every other container as walked """
+        with self._walking:
+            if self.snapshot is None:
+                if self.store is not None:
+                    self._load()
+                if self.snapshot is None:
+                    return self._full_refresh()
+            current = self.snapshot
+            previous = current['containers']
+            starts = [(container_id, previous[container_id]['depth']) for container_id in container_ids
+                      if container_id in previous]
+            containers = dict(previous)
+            containers.update(self.walker.walk_containers(starts, known=set(previous) - set(container_ids)))
+            containers = reachable(containers, current['root_id'])
+            snapshot = new_snapshot(current['root_id'], current['root_name'], containers,
+                                    previous=current, now=self.clock())
+            self._swap(snapshot)
+            self.refreshes['incremental'] += 1
+            self._save(snapshot)
+            return snapshot
+
+    def apply_event(self, event):
+        """ Organizations change event (EventBridge): incremental refresh, full walk when it cannot be narrowed """
+        snapshot = self.get()
+        container_ids = changed_containers(event, snapshot)
+        logger.info(f"{event.get('detail', {}).get('eventName')}: refreshing {container_ids or 'everything'}")
+        if container_ids is None:
+            with self._walking:
+                return self._full_refresh()
+        return self.refresh(container_ids)
@@ -0,0 +1,173 @@
+############ IMPORTS AND SETTINGS ##############
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger()
+
+THROTTLING_CODES = ('TooManyRequestsException', 'ThrottlingException', 'Throttling')
+MAX_ATTEMPTS = 8  # per API call, on throttling
+BASE_DELAY = 0.2  # seconds, exponential backoff with full jitter
+
+########## IMPORTS AND SETTINGS END HERE ############
+
+
+class TokenBucket:
+    """
+    Client side rate limiter shared by the walker threads: `rate` calls per second, bursts up to `burst`.
+    Throttling aware: throttled() halves the rate (down to min_rate), each granted call then adds back
+    `recovery` times the configured rate until it is reached again.
+    """
+
+    def __init__(self, rate=8.0, burst=8, min_rate=0.5, recovery=0.02, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.updated = clock()
+        self.throttles = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.rate = min(self.max_rate, self.rate + self.recovery * self.max_rate)
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+            self.sleep(wait_seconds)
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+
+
+def is_throttling(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code') in THROTTLING_CODES
+
+
+class OrganizationWalker:
+    """
+    Breadth first walk of the organization tree from a root or OU, with a bounded thread pool.
+    Each container (root or OU) is one task: its accounts and child OUs are listed (following NextToken),
+    child OUs are queued as new tasks while max_depth allows.
+
+    Depth: the root (or start OU) is depth 0. Accounts of containers up to max_depth are returned,
+    OUs deeper than max_depth are not listed.
+
+    :param client: boto3 organizations client, or any object with the same list_* methods (stub)
+    """
+
+    def __init__(self, client, max_depth=2, max_workers=8, rate_limiter=None, sleep=time.sleep):
+        self.client = client
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.sleep = sleep
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self, operation, **kwargs):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.rate_limiter.acquire()
+            with self._lock:
+                self.calls += 1
+            try:
+                return getattr(self.client, operation)(**kwargs)
+            except Exception as e:
+                if not is_throttling(e) or attempt == MAX_ATTEMPTS:
+                    raise
+                self.rate_limiter.throttled()
+                self.sleep(random.uniform(0, BASE_DELAY * 2 ** attempt))
+
+    def _paginate(self, operation, key, **kwargs):
+        items = []
+        while True:
+            response = self._call(operation, **kwargs)
+            items += response.get(key, [])
+            if not response.get('NextToken'):
+                return items
+            kwargs['NextToken'] = response['NextToken']
+
+    def root(self):
+        """ (id, name) of the organization root """
+        root = self._call('list_roots')['Roots'][0]
+        return root['Id'], root.get('Name', 'Root')
+
+    def _visit(self, parent_id, depth):
+        """ One container: its accounts and child OUs (not listed below max_depth) """
+        container = {
+            'depth': depth,
+            'accounts': self._paginate('list_accounts_for_parent', 'Accounts', ParentId=parent_id),
+            'children': []
+        }
+        if depth < self.max_depth:
+            ous = self._paginate('list_organizational_units_for_parent', 'OrganizationalUnits', ParentId=parent_id)
+            container['children'] = [{'Id': ou['Id'], 'Name': ou.get('Name', ou['Id'])} for ou in ous]
+        return container
+
+    def walk_containers(self, starts, known=()):
+        """
+        Visit the containers in starts ([(id, depth)]) and, breadth first, the child OUs they contain.
+        Child OUs in known are not descended into (incremental refresh: their content is already known).
+
+        :return: {container id: {'depth', 'accounts', 'children': [{'Id', 'Name'}]}}
+        """
+        containers = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {pool.submit(self._visit, container_id, depth): container_id for container_id, depth in starts}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    container_id = pending.pop(future)
+                    container = containers[container_id] = future.result()
+                    for child in container['children']:
+                        if child['Id'] not in known and child['Id'] not in containers:
+                            pending[pool.submit(self._visit, child['Id'], container['depth'] + 1)] = child['Id']
+        logger.info(f"{len(containers)} containers visited, {self.calls} calls, {self.rate_limiter.throttles} throttled")
+        return containers
+
+    def walk(self, root_id, root_name=None):
+        """ :return: accounts as returned by list_accounts_for_parent, plus ParentId, Path and Depth """
+        return flatten(self.walk_containers([(root_id, 0)]), root_id, root_name)
+
+
+def flatten(containers, root_id, root_name=None):
+    """
+    Accounts of the containers reachable from root_id, with ParentId, Path (OU names from the root) and Depth.
+    Paths are derived here, not stored, so a renamed OU only needs its parent visited again.
+    """
+    accounts = []
+    queue = [(root_id, root_name or root_id, 0)]
+    while queue:
+        container_id, path, depth = queue.pop()
+        container = containers.get(container_id)
+        if container is None:
+            continue
+        for account in container['accounts']:
+            accounts.append(dict(account, ParentId=container_id, Path=path, Depth=depth))
+        queue += [(child['Id'], f"{path}/{child['Name']}", depth + 1) for child in container['children']]
+    accounts.sort(key=lambda account: (account['Depth'], account['Path'], account['Id']))
+    return accounts
+
+
+def get_accounts_recursive(root_id, MAX_DEPTH=2, client=None, max_workers=8, rate=8.0):
+    """ Accounts under root_id down to MAX_DEPTH levels of OUs """
+    if client is None:
+        import boto3
+        client = boto3.client('organizations')
+    walker = OrganizationWalker(client, max_depth=MAX_DEPTH, max_workers=max_workers, rate_limiter=TokenBucket(rate=rate))
+    return walker.walk(root_id)
@@ -0,0 +1,159 @@
+############ IMPORTS AND SETTINGS ##############
+
+import base64
+import bisect
+import gzip
+import json
+
+STATUSES = ('ACTIVE', 'SUSPENDED', 'PENDING_CLOSURE')
+FORMATS = ('json', 'ndjson')
+MIN_GZIP_BYTES = 1024  # smaller bodies are sent as is
+
+########## IMPORTS AND SETTINGS END HERE ############
+
+
+class BadRequest(Exception):
+    pass
+
+
+def sort_key(account):
+    """ Order of the snapshot accounts (org_walker.flatten), also the cursor """
+    return (account['Depth'], account['Path'], account['Id'])
+
+
+class AccountIndex:
+    """
+    Indexes over the accounts of one snapshot, built once per snapshot version, so a query costs
+    in proportion to the accounts it matches rather than to the organization:
+    - path (subtree) and name prefixes: bisect over sorted keys
+    - status and depth: positions per value
+    - each account serialized once; responses join the serialized accounts
+    Positions are indexes into the snapshot account list, which is sorted by sort_key.
+    """
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.keys = [sort_key(account) for account in accounts]
+        self.serialized = [json.dumps(account) for account in accounts]
+        self.paths = sorted((account['Path'], position) for position, account in enumerate(accounts))
+        self.names = sorted((account.get('Name', '').lower(), position) for position, account in enumerate(accounts))
+        self.by_status, self.by_depth = {}, {}
+        for position, account in enumerate(accounts):
+            self.by_status.setdefault(account.get('Status'), []).append(position)
+            self.by_depth.setdefault(account['Depth'], []).append(position)
+
+    @staticmethod
+    def _prefixed(pairs, prefix):
+        start = bisect.bisect_left(pairs, (prefix, -1))
+        end = bisect.bisect_left(pairs, (prefix + '\U0010ffff', -1))
+        return [position for _, position in pairs[start:end]]
+
+    def _subtree(self, path):
+        path = path.rstrip('/')
+        exact = self._prefixed(self.paths, path)
+        return [p for p in exact if self.accounts[p]['Path'] == path or self.accounts[p]['Path'].startswith(path + '/')]
+
+    def select(self, filters, after=None, limit=1000):
+        """ (positions of up to limit matching accounts after the `after` sort key, more left) """
+        candidates = []
+        if 'path' in filters:
+            candidates.append(self._subtree(filters['path']))
+        if 'name' in filters:
+            candidates.append(self._prefixed(self.names, filters['name'].lower()))
+        if 'status' in filters:
+            candidates.append(sorted(p for status in filters['status'] for p in self.by_status.get(status, [])))
+        if 'depth' in filters:
+            candidates.append(self.by_depth.get(filters['depth'], []))
+        if candidates:
+            positions = sorted(min(candidates, key=len))
+        else:
+            positions = range(len(self.accounts))
+        start = 0
+        if after is not None:
+            start = bisect.bisect_left(positions, bisect.bisect_right(self.keys, after))
+
+        selected = []
+        for i in range(start, len(positions)):
+            position = positions[i]
+            if self._matches(self.accounts[position], filters):
+                if len(selected) == limit:
+                    return selected, True
+                selected.append(position)
+        return selected, False
+
+    @staticmethod
+    def _matches(account, filters):
+        if 'path' in filters:
+            path = filters['path'].rstrip('/')
+            if account['Path'] != path and not account['Path'].startswith(path + '/'):
+                return False
+        if 'name' in filters and not account.get('Name', '').lower().startswith(filters['name'].lower()):
+            return False
+        if 'status' in filters and account.get('Status') not in filters['status']:
+            return False
+        if 'depth' in filters and account['Depth'] != filters['depth']:
+            return False
+        return True
+
+    def body(self, positions, output_format):
+        if output_format == 'ndjson':
+            return ''.join(self.serialized[p] + '\n' for p in positions)
+        return '[' + ', '.join(self.serialized[p] for p in positions) + ']'
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        depth, path, account_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (int(depth), str(path), str(account_id))
+    except Exception:
+        raise BadRequest('cursor: not a cursor returned by this endpoint')
+
+
+def parse(event, default_limit=5000, max_limit=5000):
+    """
+    Query string of a function URL request -> (filters, cursor key, limit, format).
+
+    path=Root/Prod (the OU and its sub OUs), status=ACTIVE[,SUSPENDED], depth=2, name=<prefix>,
+    limit=<page size>, cursor=<X-Next-Cursor of the previous page>, format=json|ndjson
+    (or Accept: application/x-ndjson)
+    """
+    parameters = event.get('queryStringParameters') or {}
+    filters = {}
+    if parameters.get('path'):
+        filters['path'] = parameters['path']
+    if parameters.get('name'):
+        filters['name'] = parameters['name']
+    if parameters.get('status'):
+        filters['status'] = {status.strip().upper() for status in parameters['status'].split(',')}
+        unknown = filters['status'] - set(STATUSES)
+        if unknown:
+            raise BadRequest(f"status: unknown {sorted(unknown)}, expected {', '.join(STATUSES)}")
+    if parameters.get('depth'):
+        if not parameters['depth'].isdigit():
+            raise BadRequest('depth: expected an integer')
+        filters['depth'] = int(parameters['depth'])
+
+    limit = parameters.get('limit', str(default_limit))
+    if not limit.isdigit() or not 1 <= int(limit) <= max_limit:
+        raise BadRequest(f"limit: expected an integer from 1 to {max_limit}")
+    after = decode_cursor(parameters['cursor']) if parameters.get('cursor') else None
+
+    accept = (event.get('headers') or {}).get('accept', '')
+    output_format = parameters.get('format', 'ndjson' if 'application/x-ndjson' in accept else 'json')
+    if output_format not in FORMATS:
+        raise BadRequest(f"format: expected {' or '.join(FORMATS)}")
+    return filters, after, int(limit), output_format
+
+
+def accepts_gzip(event):
+    encodings = (event.get('headers') or {}).get('accept-encoding', '')
+    return any(encoding.split(';')[0].strip() == 'gzip' for encoding in encodings.split(','))
+
+
+def compress(body):
+    """ gzip body for a function URL response: (base64 body, True) """
+    return base64.b64encode(gzip.compress(body.encode('utf-8'), compresslevel=6)).decode('ascii'), True
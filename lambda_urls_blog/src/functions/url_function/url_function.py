@@ -5,6 +5,7 @@ import logging
 import os
 import json
 import datetime
+import time
 import boto3
 import uuid
 from operator import attrgetter
@@ -12,40 +13,108 @@ from operator import attrgetter
 from botocore.exceptions import ClientError
 # from time import sleep
 from pprint import pprint as pp
-import sys; sys.path.insert(0, './lib'); # sys.path.append('./lib') #; print(sys.path)
-import get_accounts_recursive
-# from .lib import get_accounts_recursive # import for package mode
+import inventory
+import org_walker
+import query
 
 
 OS_MAX_DEPTH = os.environ["MAX_DEPTH"]
+WALK_WORKERS = int(os.environ.get("WALK_WORKERS", "8"))  # OUs listed concurrently
+ORG_API_RATE = float(os.environ.get("ORG_API_RATE", "8"))  # Organizations calls per second, all threads
+INVENTORY_TTL_SECONDS = int(os.environ.get("INVENTORY_TTL_SECONDS", "900"))  # walk again after, changes events aside
+INVENTORY_CHECK_SECONDS = int(os.environ.get("INVENTORY_CHECK_SECONDS", "60"))  # revalidation interval
+INVENTORY_BUCKET = os.environ.get("INVENTORY_BUCKET", "")  # optional durable snapshot store
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "5000"))  # keeps responses under the 6 MB payload limit
+# accounts per response without limit=: by default the full list (up to MAX_PAGE_SIZE), as before paging
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE") or MAX_PAGE_SIZE)
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 json.JSONEncoder.default = lambda self, obj: (obj.isoformat() if (
     isinstance(obj, datetime.datetime) or isinstance(obj, datetime.date)) else None)
 
+# kept across warm invocations
+INVENTORY = inventory.InventoryCache(
+    org_walker.OrganizationWalker(
+        boto3.client('organizations'),
+        max_depth=int(OS_MAX_DEPTH),
+        max_workers=WALK_WORKERS,
+        rate_limiter=org_walker.TokenBucket(rate=ORG_API_RATE)
+    ),
+    ttl_seconds=INVENTORY_TTL_SECONDS,
+    check_seconds=INVENTORY_CHECK_SECONDS,
+    store=inventory.S3SnapshotStore(INVENTORY_BUCKET) if INVENTORY_BUCKET else None
+)
+INDEX = {}  # etag -> query.AccountIndex of the current snapshot
+
 ########## IMPORTS AND SETTINGS END HERE ############
 
-def lambda_handler(event, context):
-    logger.info('## EVENT')
-    logger.info(json.dumps(event))
-    logger.info('## ENVIRONMENT VARIABLES')
-    logger.info(json.dumps(dict(os.environ)))
-    logger.info('## CONTEXT VARIABLES')
-    logger.info(json.dumps(vars(context)))
-    logger.info('## CALLER')
-    logger.info(json.dumps(boto3.client('sts').get_caller_identity()))
+def not_modified(event, etag):
+    """ If-None-Match of the request matches etag (weak comparison) """
+    header = (event.get('headers') or {}).get('if-none-match', '')
+    tags = [tag.strip() for tag in header.split(',') if tag.strip()]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
 
-    reponse = []
 
+def lambda_handler(event, context):
+    if event.get('source') == 'aws.organizations':  # change event (EventBridge rule)
+        if event.get('detail', {}).get('eventName') not in inventory.CHANGE_EVENTS:
+            return {'refreshed': False}
+        snapshot = INVENTORY.apply_event(event)
+        return {'refreshed': True, 'version': snapshot['version'], 'accounts': len(snapshot['accounts'])}
+
+    started = time.perf_counter()
     try:
-        response = get_accounts_recursive.get_accounts_recursive(boto3.client('organizations').list_roots()['Roots'][0]['Id'], MAX_DEPTH=int(OS_MAX_DEPTH))
-        # print(len(response))
-        # pp(response)
+        filters, after, limit, output_format = query.parse(event, PAGE_SIZE, MAX_PAGE_SIZE)
+    except query.BadRequest as err:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'error': str(err)})
+        }
 
+    try:
+        snapshot = INVENTORY.get()
     except Exception as err:
         logger.error(err, exc_info=True)
+        return {
+            'statusCode': 200,
+            'body': json.dumps([])
+        }
+
+    gzipped = query.accepts_gzip(event)
+    headers = {
+        'ETag': ('W/' if gzipped else '') + snapshot['etag'],  # per snapshot: the URL (query) is part of the cache key
+        'Cache-Control': 'no-cache',  # clients revalidate with If-None-Match
+        'Vary': 'Accept, Accept-Encoding',
+        'X-Inventory-Version': str(snapshot['version'])
+    }
+    if not_modified(event, snapshot['etag']):
+        return {'statusCode': 304, 'headers': headers}
+
+    if snapshot['etag'] not in INDEX:
+        INDEX.clear()
+        INDEX[snapshot['etag']] = query.AccountIndex(snapshot['accounts'])
+    index = INDEX[snapshot['etag']]
+    positions, more = index.select(filters, after, limit)
+    body = index.body(positions, output_format)
+    headers['Content-Type'] = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+    headers['X-Count'] = str(len(positions))
+    if more:
+        headers['X-Next-Cursor'] = query.encode_cursor(index.keys[positions[-1]])
+        if after is None and 'limit' not in (event.get('queryStringParameters') or {}):
+            logger.warning(f"{filters}: {len(positions)} accounts returned without limit=, more left "
+                           f"(PAGE_SIZE {PAGE_SIZE}): the client must follow X-Next-Cursor")
+    size = len(body)
+    encoded = False
+    if gzipped and size >= query.MIN_GZIP_BYTES:
+        body, encoded = query.compress(body)
+        headers['Content-Encoding'] = 'gzip'
 
+    logger.info(f"{filters} limit={limit} {output_format}: {len(positions)} accounts, {size} bytes"
+                f"{' gzip ' + str(len(body)) if encoded else ''}, {(time.perf_counter() - started) * 1000:.1f} ms")
     return {
         'statusCode': 200,
-        'body': json.dumps(response)
+        'headers': headers,
+        'body': body,
+        'isBase64Encoded': encoded
     }
@@ -1,4 +1,5 @@
 -- select most recent rows from a table.
+-- with MaintainCurrentState=true, read the current state table instead: python tools/current_status.py --table <table>
 Select
     a.*
 from
@@ -14,6 +15,39 @@ from
     ) b on a.stackname = b.stackname
     and a.time = b.maxtime;
 
+-- same result reading only 3 columns: with OutputFormat=PARQUET only their column chunks are scanned.
+select
+    stackname,
+    max(time) as time,
+    max_by(stackstatus, time) as stackstatus
+from
+    observability.cflogs_table
+group by
+    stackname;
+
+-- DynamicPartitioning=true: per day and per stack queries only read the matching partitions.
+-- events of one day
+select
+    time, stackname, stackstatus
+from
+    observability.cflogs_table
+where
+    year = 2023 and month = 1 and day = 15
+order by
+    time;
+
+-- history of one stack this year, StackBuckets=16: only its bucket is read (same hash as the processor)
+select
+    time, stackstatus
+from
+    observability.cflogs_table
+where
+    year = 2023
+    and stackbucket = crc32(to_utf8('my-stack')) % 16
+    and stackname = 'my-stack'
+order by
+    time;
+
 Select
     a.*
 from
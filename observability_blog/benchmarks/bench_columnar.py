@@ -0,0 +1,106 @@
+"""
+JSON vs Parquet layout for the "latest status per stack" query, on synthetic CloudFormation status events.
+
+Both layouts are produced by the processor (process_batch, without and with the parquet projection) and
+written locally, the parquet file with tools/columnar_writer.py. For each layout:
+- bytes scanned: what Athena bills for the query. JSON: the whole objects. Parquet: the compressed
+  column chunks of stackname, time and stackstatus only.
+- query time: latest row per stack (max(time) per stackname, joined back), computed locally
+  (python over NDJSON, pyarrow over Parquet).
+
+usage (from observability_blog/ folder): python benchmarks/bench_columnar.py [--events 200000] [--stacks 500]
+needs pyarrow.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'processor_function'), os.path.join(ROOT, 'tools')]
+
+import app  # noqa: E402
+from columnar_writer import decode_records, write_parquet  # noqa: E402
+from synthetic_events import generate_events, firehose_batches  # noqa: E402
+
+QUERY_COLUMNS = ('stackname', 'time', 'stackstatus')
+
+
+def write_json(records, path):
+    with open(path, 'wb') as f:
+        for record in records:
+            if record['result'] == 'Ok':
+                f.write(base64.b64decode(record['data']))
+    return os.path.getsize(path)
+
+
+def latest_from_json(path):
+    latest = {}
+    with open(path, 'rb') as f:
+        for line in f:
+            row = json.loads(line)
+            current = latest.get(row['stackname'])
+            if current is None or row['time'] > current[0]:
+                latest[row['stackname']] = (row['time'], row['stackstatus'])
+    return len(latest)
+
+
+def latest_from_parquet(path):
+    import pyarrow.parquet as pq
+    table = pq.read_table(path, columns=list(QUERY_COLUMNS))
+    latest = table.group_by('stackname').aggregate([('time', 'max')]).rename_columns(['stackname', 'time'])
+    return table.join(latest, keys=['stackname', 'time'], join_type='inner').num_rows
+
+
+def parquet_scanned_bytes(path):
+    import pyarrow.parquet as pq
+    metadata = pq.ParquetFile(path).metadata
+    scanned = 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            if column.path_in_schema in QUERY_COLUMNS:
+                scanned += column.total_compressed_size
+    return scanned
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--stacks', type=int, default=500)
+    args = parser.parse_args()
+
+    json_records, parquet_records = [], []
+    for batch in firehose_batches(generate_events(args.events, stacks=args.stacks)):
+        json_records += app.process_batch(batch, projection=None, seen=None)[0]
+        parquet_records += app.process_batch(batch, projection=app.project_columns, seen=None)[0]
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'events.json')
+        parquet_path = os.path.join(directory, 'events.parquet')
+        json_size = write_json(json_records, json_path)
+        parquet_size = write_parquet(decode_records(parquet_records), parquet_path, app.COLUMNS)
+
+        json_rows, json_ms = timed(latest_from_json, json_path)
+        parquet_rows, parquet_ms = timed(latest_from_parquet, parquet_path)
+        parquet_scanned = parquet_scanned_bytes(parquet_path)
+
+    print(f"{args.events} events, {args.stacks} stacks")
+    print(f"{'layout':>8} {'stored MB':>10} {'scanned MB':>11} {'query ms':>9} {'rows':>6}")
+    print(f"{'json':>8} {json_size / 1e6:10.2f} {json_size / 1e6:11.2f} {json_ms:9.1f} {json_rows:6d}")
+    print(f"{'parquet':>8} {parquet_size / 1e6:10.2f} {parquet_scanned / 1e6:11.2f} {parquet_ms:9.1f} {parquet_rows:6d}")
+    print(f"scanned bytes: /{json_size / parquet_scanned:.0f}")
+
+
+if __name__ == '__main__':
+    main()
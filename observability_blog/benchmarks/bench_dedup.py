@@ -0,0 +1,78 @@
+"""
+Deduplication cache at one million events.
+
+Event ids are uuid strings; --duplicates of the deliveries repeat an id delivered within the last --window
+events (at-least-once redelivery). Reports throughput, hit rate against the known duplicate count, and
+memory: as estimated by the cache (memory_bytes) and as measured with tracemalloc.
+
+usage (from observability_blog/ folder): python benchmarks/bench_dedup.py [--events 1000000] [--max-entries 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processor_function'))
+
+from dedup import DedupCache  # noqa: E402
+
+
+def deliveries(count, duplicates, window, seed=0):
+    """ Event ids in delivery order, and the number of redeliveries among them """
+    rng = random.Random(seed)
+    ids, redelivered = [], 0
+    for _ in range(count):
+        if ids and rng.random() < duplicates:
+            ids.append(ids[-rng.randint(1, min(window, len(ids)))])
+            redelivered += 1
+        else:
+            ids.append(str(uuid.UUID(int=rng.getrandbits(128))))
+    return ids, redelivered
+
+
+def run(ids, max_entries, fresh_ids=False):
+    """ fresh_ids: new string objects, as the processor decodes them, so the cache owns its keys """
+    cache = DedupCache(max_entries=max_entries, ttl_seconds=3600)
+    dropped = 0
+    started = time.perf_counter()
+    for event_id in ids:
+        if fresh_ids:
+            event_id = (event_id + ' ')[:-1]
+        if cache.contains(event_id):
+            dropped += 1
+        else:
+            cache.add(event_id)
+    return cache, dropped, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--duplicates', type=float, default=0.05, help='share of redeliveries')
+    parser.add_argument('--window', type=int, default=5000, help='redeliveries repeat one of the last N events')
+    parser.add_argument('--max-entries', type=int, default=100000)
+    args = parser.parse_args()
+
+    ids, redelivered = deliveries(args.events, args.duplicates, args.window)
+
+    # throughput and memory in separate runs: tracemalloc slows every allocation down
+    cache, dropped, elapsed = run(ids, args.max_entries)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    measured_cache = run(ids, args.max_entries, fresh_ids=True)[0]
+    measured = tracemalloc.get_traced_memory()[0] - baseline
+    del measured_cache
+    tracemalloc.stop()
+
+    stats = cache.stats()
+    print(f"{args.events} events, {redelivered} redeliveries, max_entries {args.max_entries}")
+    print(f"throughput: {args.events / elapsed:,.0f} events/s ({elapsed / args.events * 1e9:.0f} ns/event)")
+    print(f"dropped: {dropped} ({dropped / redelivered:.1%} of redeliveries), hit rate {stats['hit_rate']:.2%}, evictions {stats['evictions']}")
+    print(f"memory: {stats['entries']} entries, estimated {stats['memory_bytes'] / 1e6:.1f} MB, measured {measured / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Object count, bytes written and Athena read cost for delivery settings (buffering hints x compression x
+processor aggregation), on synthetic CloudFormation status events at a given rate.
+
+The processor runs on Firehose sized batches, tools/delivery.py buffers and writes the objects locally
+(simulated clock: --hours of traffic take seconds). For each setting:
+- objects, MB written
+- Athena: scanned MB (compressed bytes), $ for scans at $5/TB, S3 GET requests (one per object)
+- local read: decompress and parse every object
+- modeled Athena read time: local read + --object-overhead-ms per object (S3 open/GET latency, the small files
+  cost that a local disk does not show)
+
+usage (from observability_blog/ folder): python benchmarks/bench_delivery.py [--rate 20] [--hours 2] [--object-overhead-ms 20]
+HADOOP_SNAPPY is included when python-snappy is installed.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'processor_function'), os.path.join(ROOT, 'tools')]
+
+import app  # noqa: E402
+from delivery import COMPRESSIONS, S3Buffer  # noqa: E402
+from synthetic_events import generate_events, firehose_batches  # noqa: E402
+
+ATHENA_USD_PER_TB = 5.0
+BUFFERS = ((1, 60), (64, 300), (128, 900))  # (SizeInMBs, IntervalInSeconds)
+BATCH_SECONDS = 60  # processor invoked once a minute (Firehose processing buffer)
+
+
+def read_back(objects, compression):
+    decompress = COMPRESSIONS[compression][1]
+    started = time.perf_counter()
+    rows = 0
+    for path, _, _ in objects:
+        with open(path, 'rb') as f:
+            for line in decompress(f.read()).splitlines():
+                json.loads(line)
+                rows += 1
+    return rows, (time.perf_counter() - started) * 1000
+
+
+def deliver(batches, directory, size_mb, interval_seconds, compression, aggregate):
+    buffer = S3Buffer(directory, size_mb, interval_seconds, compression)
+    records = 0
+    now = 0
+    for now, batch in batches:
+        output, _ = app.process_batch(batch, seen=None, aggregate=aggregate)
+        records += sum(1 for record in output if record['result'] == 'Ok')
+        buffer.add(output, now)
+    buffer.close(now + interval_seconds)
+    return buffer, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=20, help='events per second')
+    parser.add_argument('--hours', type=float, default=2)
+    parser.add_argument('--object-overhead-ms', type=float, default=20, help='assumed per object latency in Athena')
+    args = parser.parse_args()
+
+    count = int(args.rate * args.hours * 3600)
+    start = 1672531200  # 2023-01-01, as generate_events
+    events = list(generate_events(count, interval_seconds=1 / args.rate))
+    per_batch = max(1, int(args.rate * BATCH_SECONDS))
+    batches = [
+        (start + i * BATCH_SECONDS, batch)
+        for i, batch in enumerate(
+            b for chunk in range(0, count, per_batch) for b in firehose_batches(events[chunk:chunk + per_batch])
+        )
+    ]
+    print(f"{count} events, {args.rate}/s over {args.hours}h, {len(batches)} processor invocations")
+    print(f"{'buffer':>10} {'compression':>13} {'agg':>4} {'records':>8} {'objects':>8} {'MB':>8} "
+          f"{'Athena $':>10} {'GETs':>6} {'read ms':>8} {'model ms':>9}")
+
+    for size_mb, interval_seconds in BUFFERS:
+        for compression in COMPRESSIONS:
+            for aggregate in (False, True):
+                with tempfile.TemporaryDirectory() as directory:
+                    buffer, records = deliver(batches, directory, size_mb, interval_seconds, compression, aggregate)
+                    stats = buffer.stats()
+                    rows, read_ms = read_back(buffer.objects, compression)
+                assert rows == count
+                cost = stats['written_bytes'] / 1e12 * ATHENA_USD_PER_TB
+                print(f"{f'{size_mb}MB/{interval_seconds}s':>10} {compression:>13} {'yes' if aggregate else 'no':>4} "
+                      f"{records:8d} {stats['objects']:8d} {stats['written_bytes'] / 1e6:8.2f} {cost:10.7f} "
+                      f"{stats['objects']:6d} {read_ms:8.1f} {read_ms + stats['objects'] * args.object_overhead_ms:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
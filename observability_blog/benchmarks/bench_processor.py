@@ -0,0 +1,90 @@
+"""
+Throughput benchmark of the Firehose processor on synthetic 6 MB batches.
+
+Variants:
+- baseline: the previous per-record implementation (print of every payload, stdlib json, bytes round trips)
+- json: process_batch with the stdlib codec
+- orjson: process_batch with orjson (skipped when not installed)
+
+usage (from observability_blog/ folder): python benchmarks/bench_processor.py [--batches 5] [--repeat 3]
+"""
+import argparse
+import base64
+import contextlib
+import importlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'processor_function'), os.path.join(ROOT, 'tools')]
+
+import app  # noqa: E402
+import codec  # noqa: E402
+from synthetic_events import generate_events, firehose_batches  # noqa: E402
+
+ORJSON = sys.modules.get('orjson')  # as loaded by codec, None when not installed
+
+
+def baseline_process_batch(records):
+    def transform(data):
+        print("Processing data: %s" % data)
+        data['stackname'] = data['detail']['stack-id'].split(':')[-1].split('/')[1]
+        data['stackstatus'] = data['detail']['status-details']['status']
+        return data
+
+    def process(record):
+        data = json.loads(base64.b64decode(record['data']))
+        record['data'] = base64.b64encode((json.dumps(transform(data)) + "\n").encode("utf-8"))
+        record['result'] = 'Ok'
+        return record
+
+    return list(map(process, records)), None
+
+
+def use_codec(backend):
+    """ Reload codec with or without orjson; False when the backend is not available """
+    sys.modules['orjson'] = None if backend == 'json' else ORJSON
+    importlib.reload(codec)
+    return codec.BACKEND == backend
+
+
+def run(process, batches, repeat):
+    durations = []
+    for _ in range(repeat):
+        copies = [[dict(record) for record in batch] for batch in batches]  # baseline mutates records
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            for batch in copies:
+                process(batch)
+            durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batches', type=int, default=5, help='number of 6 MB batches')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    events_per_batch = 6 * 1024 * 1024 // 800 + 1  # records are ~800 bytes once base64 encoded
+    batches = list(firehose_batches(generate_events(args.batches * events_per_batch)))[:args.batches]
+    records = sum(len(batch) for batch in batches)
+    megabytes = sum(len(record['data']) for batch in batches for record in batch) / 1024 / 1024
+    print(f"{len(batches)} batches, {records} records, {megabytes:.1f} MB")
+
+    results = {'baseline': run(baseline_process_batch, batches, args.repeat)}
+    for backend in ('json', 'orjson'):
+        if use_codec(backend):
+            # no dedup: repeats would drop every record
+            results[backend] = run(lambda batch: app.process_batch(batch, seen=None), batches, args.repeat)
+    for name, seconds in results.items():
+        print(f"{name:>8}: {seconds * 1000:8.1f} ms  {records / seconds:10.0f} records/s  "
+              f"{megabytes / seconds:6.1f} MB/s  x{results['baseline'] / seconds:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,283 @@
+import binascii
 import json
-from base64 import b64decode, b64encode
-import datetime
+import os
+import zlib
+
+import codec
+import current_state
+import dedup
+import enrichment
 
-json.JSONEncoder.default = lambda self,obj: (obj.isoformat() if (isinstance(obj, datetime.datetime) or isinstance(obj,datetime.date)) else None)
 # some useful constants
 STATUS_OK = 'Ok'
 STATUS_DROPPED = 'Dropped'
 STATUS_FAIL = 'ProcessingFailed'
 
+MAX_LOGGED_ERRORS = 5  # per batch, the rest is only counted
+
+# json: records are written as is (nested EventBridge shape).
+# parquet: records are flattened to COLUMNS, Firehose converts them against the Glue table.
+OUTPUT_FORMAT = os.environ.get('OutputFormat', 'json').lower()
+
+# flat layout of the parquet Glue table, in column order
+COLUMNS = (
+    'version', 'id', 'detail_type', 'source', 'account', 'time', 'region', 'resources',
+    'stackid', 'stackname', 'stackstatus', 'stackstatusreason',
+    'stacktags', 'owner', 'environment', 'parentstackid', 'rootstackid'  # EnrichStackMetadata, null otherwise
+)
+
+# Firehose dynamic partitioning: partition keys are returned in each record metadata.
+# StackBuckets > 0 adds a stackbucket key, crc32(stackname) % StackBuckets (Athena: crc32(to_utf8(stackname)) % n).
+DYNAMIC_PARTITIONING = os.environ.get('DynamicPartitioning', 'false').lower() == 'true'
+STACK_BUCKETS = int(os.environ.get('StackBuckets', '0'))
+
+# DynamoDB table holding the current status of each stack, updated from every batch. Blank: disabled.
+CURRENT_STATE_TABLE = os.environ.get('CurrentStateTable', '')
+if CURRENT_STATE_TABLE:
+    import boto3
+    CURRENT_STATE = current_state.CurrentStateStore(boto3.client('dynamodb'), CURRENT_STATE_TABLE)
+else:
+    CURRENT_STATE = None
+
+# Stack metadata enrichment (tags, owner, environment, parent/root stack), one describe_stacks per stack while
+# cached across warm invocations.
+ENRICH_STACK_METADATA = os.environ.get('EnrichStackMetadata', 'false').lower() == 'true'
+if ENRICH_STACK_METADATA:
+    import boto3
+    ENRICHER = enrichment.StackMetadataEnricher(
+        boto3.client('cloudformation'),
+        cache=enrichment.TTLCache(
+            max_entries=int(os.environ.get('EnrichCacheMaxEntries', '5000')),
+            ttl_seconds=int(os.environ.get('EnrichCacheTTLSeconds', '900'))
+        ),
+        owner_tag=os.environ.get('EnrichOwnerTag', 'owner'),
+        environment_tag=os.environ.get('EnrichEnvironmentTag', 'environment')
+    )
+else:
+    ENRICHER = None
+
+
 class DroppedRecordException(Exception):
     """ This exception can be raised if a record needs to be skipped/dropped """
     pass
-    
+
+
+# Aggregation: the Ok records of a batch sharing the same partition keys are packed into the first one
+# (up to AGGREGATE_MAX_BYTES, Firehose caps a record at 1000 KiB), the others are returned Dropped.
+# Not with parquet output: record format conversion expects one json document per record.
+AGGREGATE = os.environ.get('AggregateRecords', 'false').lower() == 'true' and OUTPUT_FORMAT != 'parquet'
+AGGREGATE_MAX_BYTES = int(os.environ.get('AggregateMaxBytes', str(900 * 1024)))
+STATUS_AGGREGATED = 'Aggregated'  # stats only: packed into another record, returned Dropped
+
+# EventBridge and Firehose deliver at least once: records whose event id was processed recently are dropped.
+# Module level, so it survives warm invocations. DedupMaxEntries=0 disables it.
+DEDUP_MAX_ENTRIES = int(os.environ.get('DedupMaxEntries', '100000'))
+DEDUP_TTL_SECONDS = int(os.environ.get('DedupTTLSeconds', '3600'))
+DEDUP = dedup.DedupCache(DEDUP_MAX_ENTRIES, DEDUP_TTL_SECONDS) if DEDUP_MAX_ENTRIES else None
+
+
+################# extractors #################
+# Built once at import, applied in order to every record: field name -> function(data).
+# stack-id is an arn 'arn:aws:cloudformation:<region>:<account>:stack/<name>/<guid>', the only '/' are after 'stack'.
+def extract_stackname(data):
+    return data['detail']['stack-id'].split('/', 2)[1]
+
+
+def extract_stackstatus(data):
+    return data['detail']['status-details']['status']
+
+
+EXTRACTORS = (
+    ('stackname', extract_stackname),
+    ('stackstatus', extract_stackstatus),
+)
+
+
+def project_columns(data):
+    """ Flat record matching COLUMNS. Hyphenated and nested keys do not map to parquet columns. """
+    detail = data['detail']
+    return {
+        'version': data.get('version'),
+        'id': data.get('id'),
+        'detail_type': data.get('detail-type'),
+        'source': data.get('source'),
+        'account': data.get('account'),
+        'time': data.get('time'),
+        'region': data.get('region'),
+        'resources': data.get('resources'),
+        'stackid': detail['stack-id'],
+        'stackname': data['stackname'],
+        'stackstatus': data['stackstatus'],
+        'stackstatusreason': detail['status-details'].get('status-reason'),
+        'stacktags': data.get('stacktags'),
+        'owner': data.get('owner'),
+        'environment': data.get('environment'),
+        'parentstackid': data.get('parentstackid'),
+        'rootstackid': data.get('rootstackid'),
+    }
+
+
+PROJECTION = project_columns if OUTPUT_FORMAT == 'parquet' else None
+
+
+def partition_keys(data, stack_buckets=STACK_BUCKETS):
+    """ Partition keys of a transformed record. account/region are renamed: they already are table columns. """
+    time = data['time']  # 2023-01-31T12:00:00Z
+    keys = {
+        'year': time[0:4],
+        'month': time[5:7],
+        'day': time[8:10],
+        'accountid': data['account'],
+        'awsregion': data['region'],
+    }
+    if stack_buckets:
+        keys['stackbucket'] = f"{zlib.crc32(data['stackname'].encode('utf-8')) % stack_buckets:02d}"
+    return keys
+
+
+PARTITIONER = partition_keys if DYNAMIC_PARTITIONING else None
+
+
+################# handler #################
 def lambda_handler(event, context):
     """ This is the main Lambda entry point """
-    print('event:', event)
+    records, stats = process_batch(event['records'])
+    print(json.dumps({'batch': stats, 'json': codec.BACKEND}))
     return {
-        'records': list(map(process_record, event['records'])),
+        'records': records,
     }
 
-def process_record(record):
-    """ Invoked once for each record (raw base64-encoded data) """
-    data = json.loads(b64decode(record['data']))
+
+def process_batch(records, projection=PROJECTION, partitioner=PARTITIONER, state=CURRENT_STATE, seen=DEDUP,
+                  aggregate=AGGREGATE, enricher=ENRICHER):
+    """
+    Transform a Firehose batch. Decoding, transformation and encoding run as tight loops over the
+    whole batch; nothing is logged per record.
+
+    :param projection: function applied to each transformed record (output layout), None to keep it as is
+    :param partitioner: function returning the partition keys of a transformed record, None without dynamic partitioning
+    :param state: CurrentStateStore updated with the latest event of each stack of the batch, or None
+    :param seen: DedupCache, records with an already processed event id are Dropped. None: no deduplication.
+                 The ids of this batch are only committed when the next batch begins, unless it is a retry.
+    :param aggregate: pack Ok records into as few records as possible, see pack_records
+    :param enricher: StackMetadataEnricher, or None. Records are then decoded first, to look up the stacks
+                     of the batch once each and concurrently.
+    :return: (output records in input order, counters by result)
+    """
+    decode = binascii.a2b_base64
+    encode = binascii.b2a_base64
+    loads = codec.loads
+    dumps = codec.dumps
+
+    output = []
+    stats = {STATUS_OK: 0, STATUS_DROPPED: 0, STATUS_FAIL: 0}
+    errors = []
+    latest = current_state.LatestPerStack() if state is not None else None
+    if seen is not None:
+        seen.begin(record['recordId'] for record in records)  # commits the previous invocation's ids
+    decoded = None
+    if enricher is not None:
+        decoded = [_decode(record, decode, loads) for record in records]
+        enricher.prefetch(
+            data['detail']['stack-id'] for data in decoded
+            if isinstance(data, dict) and isinstance(data.get('detail'), dict) and 'stack-id' in data['detail']
+        )
+    for index, record in enumerate(records):
+        try:
+            if decoded is None:
+                new_data = loads(decode(record['data']))
+            elif isinstance(decoded[index], Exception):
+                raise decoded[index]
+            else:
+                new_data = decoded[index]
+            event_id = new_data.get('id') if seen is not None else None
+            if event_id is not None and seen.contains(event_id):
+                raise DroppedRecordException()  # duplicate delivery
+            new_data = transform_data(new_data, enricher)  # manipulate/validate record
+            keys = None if partitioner is None else partitioner(new_data)
+            if latest is not None:
+                latest.add(new_data)
+            if projection is not None:
+                new_data = projection(new_data)
+            # newline delimited for Athena, base64 string as Firehose expects
+            payload = dumps(new_data) + b'\n'
+            if aggregate:
+                out = {'recordId': record['recordId'], 'result': STATUS_OK, 'data': record['data'], 'payload': payload}
+            else:
+                out = {'recordId': record['recordId'], 'result': STATUS_OK,
+                       'data': encode(payload, newline=False).decode('ascii')}
+            if keys is not None:
+                out['metadata'] = {'partitionKeys': keys}
+            if event_id is not None:
+                seen.stage(event_id)
+        except DroppedRecordException:
+            out = {'recordId': record['recordId'], 'result': STATUS_DROPPED, 'data': record['data']}  # skip
+        except Exception as e:
+            out = {'recordId': record['recordId'], 'result': STATUS_FAIL, 'data': record['data']}  # generic error
+            if len(errors) < MAX_LOGGED_ERRORS:
+                errors.append(f"{record['recordId']}: {type(e).__name__}: {e}")
+        stats[out['result']] += 1
+        output.append(out)
+
+    if aggregate:
+        stats[STATUS_AGGREGATED] = pack_records(output)
+        stats[STATUS_OK] -= stats[STATUS_AGGREGATED]
+    if latest is not None:
+        stats['current_state'] = state.apply(latest)  # derived data: failures are logged, records stay Ok
+    if seen is not None:
+        stats['dedup'] = seen.stats()
+    if enricher is not None:
+        stats['enrichment'] = enricher.stats()
+
+    if errors:
+        print(json.dumps({'errors': errors, 'failed': stats[STATUS_FAIL]}))
+    return output, stats
+
+
+def _decode(record, decode, loads):
     try:
-        new_data = transform_data(data)  # manipulate/validate record
-        record['data'] = b64encode((json.dumps(new_data) + "\n").encode("utf-8"))  # encode as bytes then b64 re-encode and add newline (for Athena)
-    except DroppedRecordException:
-        record['result'] = STATUS_DROPPED  # skip
+        return loads(decode(record['data']))
     except Exception as e:
-        print(e)
-        record['result'] = STATUS_FAIL  # generic error
-    else:
-        record['result'] = STATUS_OK  # all good
-    return record
-
-  
-def transform_data(data):
+        return e
+
+
+def pack_records(output, max_bytes=AGGREGATE_MAX_BYTES):
+    """
+    Concatenate the payloads of Ok records with the same partition keys into the first record of
+    the group, until max_bytes; the records packed into another one become Dropped, with no data.
+    :return: number of records packed into another one
+    """
+    groups = {}  # partition keys -> [head record, payloads, size]
+    finished = []
+    packed = 0
+    for out in output:
+        payload = out.pop('payload', None)
+        if payload is None:
+            continue
+        metadata = out.get('metadata')
+        key = tuple(metadata['partitionKeys'].items()) if metadata else None
+        group = groups.get(key)
+        if group is None or group[2] + len(payload) > max_bytes:
+            group = groups[key] = [out, [], 0]
+            finished.append(group)
+        else:
+            out['result'] = STATUS_DROPPED
+            out['data'] = ''  # its payload travels in the head: not returned twice
+            packed += 1
+        group[1].append(payload)
+        group[2] += len(payload)
+    for head, payloads, _ in finished:
+        head['data'] = binascii.b2a_base64(b''.join(payloads), newline=False).decode('ascii')
+    return packed
+
+
+def process_record(record):
+    """ Single record version of process_batch """
+    return process_batch([record])[0][0]
+
+
+def transform_data(data, enricher=ENRICHER):
     """ Invoked once for each record """
-    print("Processing data: %s" % data)
 
     # example: you can skip records
     # if 'invalid stuff' in data:
@@ -46,8 +286,10 @@ def transform_data(data):
     # example: you can add new fields
     # data['new_value'] = True
 
-    data['stackname'] = data['detail']['stack-id'].split(':')[-1].split('/')[1]
-    data['stackstatus'] = data['detail']['status-details']['status']
+    for name, extract in EXTRACTORS:
+        data[name] = extract(data)
+
+    if enricher is not None:
+        data.update(enricher.metadata(data['detail']['stack-id']))
 
     return data
-  
\ No newline at end of file
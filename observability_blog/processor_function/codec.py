@@ -0,0 +1,32 @@
+import datetime
+import json
+
+# orjson when packaged with the function (~5x faster on these payloads), stdlib json otherwise.
+# Both sides return/accept bytes so callers do not care which one is loaded.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the deployment package
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return obj.isoformat()
+    return None
+
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    loads = orjson.loads
+
+    def dumps(obj):
+        """ Compact json, as bytes """
+        return orjson.dumps(obj, default=_default)
+else:
+    BACKEND = 'json'
+    loads = json.loads
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(obj):
+        """ Compact json, as bytes """
+        return _encoder.encode(obj).encode('utf-8')
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Current status per stack, maintained from each processor batch: one DynamoDB item per stack id
+# (string hash key 'stackid'). Last writer wins on the event time (then event id for ties), whatever
+# the order batches and records arrive in: older events never overwrite newer ones.
+
+MAX_WORKERS = 16
+
+CONDITION = 'attribute_not_exists(stackid) OR #time < :time OR (#time = :time AND eventid < :eventid)'
+
+
+def newer(a, b):
+    """ True when event a is more recent than event b """
+    return (a['time'], a['id']) > (b['time'], b['id'])
+
+
+class LatestPerStack:
+    """ Per batch reduction: most recent transformed event of each stack id """
+
+    def __init__(self):
+        self.events = {}
+
+    def add(self, data):
+        stack_id = data['detail']['stack-id']
+        current = self.events.get(stack_id)
+        if current is None or newer(data, current):
+            self.events[stack_id] = data
+
+
+class CurrentStateStore:
+    """
+    :param client: boto3 dynamodb client, or anything with update_item/scan (tests, local runs)
+    """
+
+    def __init__(self, client, table_name, max_workers=MAX_WORKERS):
+        self.client = client
+        self.table_name = table_name
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _write(self, data):
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key={'stackid': {'S': data['detail']['stack-id']}},
+                UpdateExpression='SET stackname = :stackname, stackstatus = :stackstatus, statusreason = :reason, '
+                                 '#time = :time, eventid = :eventid, account = :account, #region = :region',
+                ConditionExpression=CONDITION,
+                ExpressionAttributeNames={'#time': 'time', '#region': 'region'},
+                ExpressionAttributeValues={
+                    ':stackname': {'S': data['stackname']},
+                    ':stackstatus': {'S': data['stackstatus']},
+                    ':reason': {'S': data['detail']['status-details'].get('status-reason') or ''},
+                    ':time': {'S': data['time']},
+                    ':eventid': {'S': data['id']},
+                    ':account': {'S': data['account']},
+                    ':region': {'S': data['region']},
+                }
+            )
+            return 'written'
+        except Exception as e:
+            if type(e).__name__ == 'ConditionalCheckFailedException':
+                return 'stale'  # a newer event is stored already
+            print(f"current state {data['detail']['stack-id']}: {type(e).__name__}: {e}")
+            return 'errors'
+
+    def apply(self, latest):
+        """
+        Write the latest event of each stack of a batch, concurrently.
+        :return: counters: written, stale (older than the stored state), errors
+        """
+        stats = {'written': 0, 'stale': 0, 'errors': 0}
+        events = list(latest.events.values())
+        if not events:
+            return stats
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        for outcome in self._executor.map(self._write, events):
+            stats[outcome] += 1
+        return stats
+
+    def scan(self):
+        """ Yield the current state of every stack as a dict. O(stacks). """
+        kwargs = {'TableName': self.table_name}
+        while True:
+            response = self.client.scan(**kwargs)
+            for item in response['Items']:
+                yield {key: value['S'] for key, value in item.items()}
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
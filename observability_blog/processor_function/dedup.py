@@ -0,0 +1,103 @@
+import sys
+import time
+from collections import OrderedDict
+
+
+class DedupCache:
+    """
+    Event ids seen recently, kept across warm invocations.
+    Bounded by max_entries (least recently seen evicted first) and by ttl_seconds.
+
+    Within an invocation, the ids of processed records are only staged (begin / stage). They are committed
+    when the next invocation begins, unless that invocation is a retry of the staged batch (same Firehose
+    record ids): the invocation failed or timed out after processing, Firehose sends the whole batch again,
+    and its records must come back Ok, not Dropped.
+    """
+
+    def __init__(self, max_entries=100000, ttl_seconds=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._seen = OrderedDict()  # id -> last seen, oldest first
+        self._key_bytes = 0
+        self._expired_at = float('-inf')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.retried_batches = 0
+        self._staged = {}  # id -> staged at, current invocation
+        self._staged_records = frozenset()  # Firehose record ids of the current invocation
+
+    def __len__(self):
+        return len(self._seen)
+
+    def contains(self, event_id):
+        """ True when event_id was added less than ttl_seconds ago, or staged by the current invocation """
+        seen_at = self._seen.get(event_id)
+        if event_id in self._staged or (seen_at is not None and self.clock() - seen_at <= self.ttl_seconds):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def begin(self, record_ids):
+        """
+        Start of an invocation with these Firehose record ids: commits the ids staged by the previous one,
+        or discards them when this batch is its retry.
+        """
+        record_ids = frozenset(record_ids)
+        if self._staged and not self._staged_records.isdisjoint(record_ids):
+            self.retried_batches += 1
+        else:
+            for event_id, staged_at in self._staged.items():
+                self.add(event_id, staged_at)
+        self._staged = {}
+        self._staged_records = record_ids
+
+    def stage(self, event_id):
+        """ Processed in the current invocation: a duplicate within the batch, committed by the next begin() """
+        self._staged[event_id] = self.clock()
+
+    def add(self, event_id, now=None):
+        now = self.clock() if now is None else now
+        if event_id in self._seen:
+            self._seen.move_to_end(event_id)
+        else:
+            self._key_bytes += sys.getsizeof(event_id)
+        self._seen[event_id] = now
+        self._evict(now)
+
+    def _evict(self, now):
+        seen = self._seen
+        while len(seen) > self.max_entries:
+            self._drop(seen.popitem(last=False)[0])
+        if now - self._expired_at < 1:  # expire by ttl at most once a second
+            return
+        self._expired_at = now
+        while seen:
+            oldest = next(iter(seen))
+            if now - seen[oldest] <= self.ttl_seconds:
+                return
+            del seen[oldest]
+            self._drop(oldest)
+
+    def _drop(self, event_id):
+        self._key_bytes -= sys.getsizeof(event_id)
+        self.evictions += 1
+
+    def memory_bytes(self):
+        """ Approximate footprint: table, keys and timestamps """
+        return sys.getsizeof(self._seen) + self._key_bytes + len(self._seen) * sys.getsizeof(0.0)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._seen),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'staged': len(self._staged),
+            'retried_batches': self.retried_batches,
+            'memory_bytes': self.memory_bytes()
+        }
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Stack metadata added to each record: tags, owner and environment (from tags), parent and root stack ids.
+FIELDS = ('stacktags', 'owner', 'environment', 'parentstackid', 'rootstackid')
+EMPTY = dict.fromkeys(FIELDS)
+
+
+class TTLCache:
+    """ Size bounded (least recently used evicted first) cache with a time to live per entry. Thread safe. """
+
+    def __init__(self, max_entries=5000, ttl_seconds=900, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, ttl_seconds=None):
+        with self._lock:
+            self._entries[key] = (self.clock() + (ttl_seconds or self.ttl_seconds), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StackMetadataEnricher:
+    """
+    Stack metadata looked up with describe_stacks, once per stack id while cached.
+    prefetch() looks up the unique stacks of a batch concurrently; metadata() is then served from cache.
+
+    :param client: boto3 cloudformation client, or any object with describe_stacks (stub for local runs)
+    """
+
+    def __init__(self, client, cache=None, owner_tag='owner', environment_tag='environment',
+                 negative_ttl_seconds=60, max_workers=8):
+        self.client = client
+        self.cache = cache if cache is not None else TTLCache()  # an empty TTLCache is falsy (__len__)
+        self.owner_tag = owner_tag.lower()
+        self.environment_tag = environment_tag.lower()
+        self.negative_ttl_seconds = negative_ttl_seconds  # failed lookups are retried sooner
+        self.max_workers = max_workers
+        self.lookups = 0
+        self.errors = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def metadata(self, stack_id):
+        cached = self.cache.get(stack_id)
+        if cached is not None:
+            return cached
+        return self._lookup(stack_id)
+
+    def prefetch(self, stack_ids):
+        missing = [stack_id for stack_id in set(stack_ids) if self.cache.get(stack_id) is None]
+        if len(missing) <= 1:
+            for stack_id in missing:
+                self._lookup(stack_id)
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        list(self._executor.map(self._lookup, missing))
+
+    def _lookup(self, stack_id):
+        with self._lock:
+            self.lookups += 1
+        try:
+            stack = self.client.describe_stacks(StackName=stack_id)['Stacks'][0]
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"stack metadata {stack_id}: {type(e).__name__}: {e}")
+            self.cache.put(stack_id, EMPTY, self.negative_ttl_seconds)
+            return EMPTY
+        tags = {tag['Key']: tag['Value'] for tag in stack.get('Tags', [])}
+        lowered = {key.lower(): value for key, value in tags.items()}
+        metadata = {
+            'stacktags': tags,
+            'owner': lowered.get(self.owner_tag),
+            'environment': lowered.get(self.environment_tag),
+            'parentstackid': stack.get('ParentId'),
+            'rootstackid': stack.get('RootId'),
+        }
+        self.cache.put(stack_id, metadata)
+        return metadata
+
+    def stats(self):
+        return {'lookups': self.lookups, 'errors': self.errors, 'cached': len(self.cache),
+                'hits': self.cache.hits, 'misses': self.cache.misses}
@@ -0,0 +1,33 @@
+# processor_function modules import each other top level (as in the Lambda package)
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processor_function'))
+
+
+def stack_event(event_id, stack='stack-a', status='CREATE_COMPLETE', time='2024-05-28T12:00:00Z'):
+    return {
+        'version': '0', 'id': event_id, 'detail-type': 'CloudFormation Stack Status Change',
+        'source': 'aws.cloudformation', 'account': '123456789012', 'time': time, 'region': 'eu-west-1',
+        'resources': [f"arn:aws:cloudformation:eu-west-1:123456789012:stack/{stack}/guid"],
+        'detail': {
+            'stack-id': f"arn:aws:cloudformation:eu-west-1:123456789012:stack/{stack}/guid",
+            'status-details': {'status': status, 'status-reason': ''}
+        }
+    }
+
+
+def firehose_record(record_id, event):
+    return {'recordId': record_id, 'data': base64.b64encode(json.dumps(event).encode('utf-8')).decode('ascii')}
+
+
+@pytest.fixture
+def make_batch():
+    def _make_batch(*pairs):
+        """ (record id, event id) pairs -> Firehose transformation event """
+        return {'records': [firehose_record(record_id, stack_event(event_id)) for record_id, event_id in pairs]}
+    return _make_batch
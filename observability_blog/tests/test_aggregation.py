@@ -0,0 +1,49 @@
+import base64
+import json
+
+import app
+from conftest import firehose_record, stack_event
+
+
+def batch(count):
+    """ count events over 3 stacks and 2 days, a kilobyte of status reason each, as CloudFormation sends """
+    records = []
+    for i in range(count):
+        event = stack_event(f"agg-{i}", stack=f"stack-{i % 3}", time=f"2024-05-{28 + i % 2}T12:00:00Z")
+        event['detail']['status-details']['status-reason'] = 'Resource creation Initiated ' * 40
+        records.append(firehose_record(f"r{i}", event))
+    return records
+
+
+def process(records, **kwargs):
+    return app.process_batch(records, projection=None, state=None, seen=None, enricher=None, **kwargs)
+
+
+def test_packed_records_carry_no_data():
+    output, stats = process(batch(30), partitioner=app.partition_keys, aggregate=True)
+    heads = [out for out in output if out['result'] == 'Ok']
+    packed = [out for out in output if out['result'] == 'Dropped']
+    assert len(heads) == 2 and stats['Aggregated'] == len(packed) == 28  # one per day partition
+    assert all(out['data'] == '' for out in packed)
+
+    lines = b''.join(base64.b64decode(out['data']) for out in heads).splitlines()
+    assert sorted(json.loads(line)['id'] for line in lines) == sorted(f"agg-{i}" for i in range(30))
+
+
+def test_response_size_stays_about_the_input_size():
+    records = batch(3000)
+    input_bytes = len(json.dumps({'records': records}))
+    for kwargs in ({}, {'aggregate': True}, {'aggregate': True, 'partitioner': app.partition_keys}):
+        output, _ = process(records, **kwargs)
+        response_bytes = len(json.dumps({'records': output}))
+        assert response_bytes < input_bytes * 1.2, (kwargs, response_bytes, input_bytes)
+
+
+def test_groups_split_at_max_bytes():
+    output = [{'recordId': f"r{i}", 'result': 'Ok', 'data': 'x', 'payload': b'a' * 40} for i in range(10)]
+    output.append({'recordId': 'failed', 'result': 'ProcessingFailed', 'data': 'kept'})
+    assert app.pack_records(output, max_bytes=100) == 5  # heads of 2 payloads each (80 bytes), 5 heads
+    heads = [out for out in output if out['result'] == 'Ok']
+    assert [len(base64.b64decode(out['data'])) for out in heads] == [80] * 5
+    assert output[-1] == {'recordId': 'failed', 'result': 'ProcessingFailed', 'data': 'kept'}
+    assert all('payload' not in out for out in output)
@@ -0,0 +1,62 @@
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+import app
+from conftest import stack_event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+import backfill  # noqa: E402
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill.tempfile, 'tempdir', str(tmp_path / 'tmp'))
+    os.makedirs(tmp_path / 'tmp')
+    source = tmp_path / 'source'
+    for prefix, stack in (('2023/01', 'web'), ('2023/02', 'db')):
+        os.makedirs(source / prefix)
+        lines = [json.dumps(stack_event(f"{stack}-{i}", stack=stack)) for i in range(3)] + ['{"not": "an event"}']
+        (source / prefix / 'events.json').write_text('\n'.join(lines) + '\n')
+    return str(source), str(tmp_path / 'out'), tmp_path / 'tmp'
+
+
+def published(destination):
+    return sorted(os.path.relpath(os.path.join(d, name), destination) for d, _, files in os.walk(destination)
+                  for name in files)
+
+
+def test_same_names_under_different_prefixes_do_not_collide(history):
+    source, destination, _ = history
+    for key in backfill.list_objects(source):
+        assert backfill.reprocess(source, key, destination, 'partitioned', 0, False)[1:] == (3, 1)
+    outputs = [name for name in published(destination) if not name.startswith('backfill-failed')]
+    assert len(outputs) == 2 and len({os.path.basename(name) for name in outputs}) == 2
+    lines = [json.loads(line) for name in outputs for line in open(os.path.join(destination, name))]
+    assert sorted(line['id'] for line in lines) == sorted(f"{s}-{i}" for s in ('web', 'db') for i in range(3))
+
+
+def test_parquet_output_reads_as_the_table(history):
+    pq = pytest.importorskip('pyarrow.parquet')
+    source, destination, _ = history
+    backfill.reprocess(source, '2023/01/events.json', destination, 'same', 0, False, 'parquet')
+    names = published(destination)
+    parquet = [name for name in names if name.endswith('.parquet')]
+    assert parquet == ['2023/01/' + backfill.output_name('2023/01/events.json')[:-len('.json')] + '.parquet']
+    table = pq.read_table(os.path.join(destination, parquet[0]))
+    assert table.column_names == list(app.COLUMNS)
+    assert sorted(table.column('stackname').to_pylist()) == ['web'] * 3
+    failed = [name for name in names if name.startswith('backfill-failed/')]
+    assert len(failed) == 1 and open(os.path.join(destination, failed[0])).read() == '{"not": "an event"}\n'
+
+
+def test_temporary_files_removed_when_interrupted(history):
+    source, destination, temporary = history
+    with open(os.path.join(source, '2023/01/broken.json.gz'), 'wb') as f:
+        f.write(gzip.compress(b'\n'.join(json.dumps(stack_event(f"b{i}")).encode() for i in range(50)))[:200])
+    with pytest.raises(EOFError):
+        backfill.reprocess(source, '2023/01/broken.json.gz', destination, 'partitioned', 0, False)
+    assert os.listdir(temporary) == []
@@ -0,0 +1,23 @@
+import base64
+import json
+
+import app
+from conftest import firehose_record, stack_event
+
+
+def test_projection_matches_the_table_columns():
+    data = app.transform_data(stack_event('e1', stack='web', status='DELETE_FAILED'))
+    data['detail']['status-details']['status-reason'] = 'Resource is in use'
+    row = app.project_columns(data)
+    assert tuple(row) == app.COLUMNS
+    assert (row['detail_type'], row['stackid'], row['stackname'], row['stackstatus'], row['stackstatusreason']) == \
+        ('CloudFormation Stack Status Change', data['detail']['stack-id'], 'web', 'DELETE_FAILED', 'Resource is in use')
+    assert row['owner'] is None and row['stacktags'] is None  # enrichment off: null columns
+
+
+def test_parquet_records_are_flat():
+    output, _ = app.process_batch([firehose_record('r1', stack_event('e1', stack='web'))], projection=app.project_columns,
+                                  partitioner=None, state=None, seen=None, aggregate=False, enricher=None)
+    row = json.loads(base64.b64decode(output[0]['data']))
+    assert list(row) == list(app.COLUMNS)
+    assert not any(isinstance(value, dict) for value in row.values())
@@ -0,0 +1,95 @@
+import random
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from conftest import stack_event
+from current_state import CurrentStateStore, LatestPerStack
+
+
+def state_event(event_id, stack, minute, status='UPDATE_COMPLETE'):
+    data = stack_event(event_id, stack=stack, status=status, time=f"2024-05-28T12:{minute:02d}:00Z")
+    return dict(data, stackname=stack, stackstatus=status)
+
+
+@pytest.fixture
+def table():
+    with mock_aws():
+        client = boto3.client('dynamodb', region_name='eu-west-1')
+        client.create_table(
+            TableName='current-state',
+            KeySchema=[{'AttributeName': 'stackid', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'stackid', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield client
+
+
+def latest_of(*events):
+    latest = LatestPerStack()
+    for data in events:
+        latest.add(data)
+    return latest
+
+
+def stored(store):
+    return {item['stackname']: (item['time'], item['eventid']) for item in store.scan()}
+
+
+def test_batch_keeps_latest_event_per_stack():
+    latest = latest_of(state_event('e2', 'a', 2), state_event('e1', 'a', 1), state_event('e3', 'b', 1),
+                       state_event('e4', 'b', 1))  # same time: event id breaks the tie
+    assert {data['stackname']: data['id'] for data in latest.events.values()} == {'a': 'e2', 'b': 'e4'}
+
+
+def test_older_batch_does_not_overwrite(table):
+    store = CurrentStateStore(table, 'current-state')
+    assert store.apply(latest_of(state_event('e5', 'a', 5))) == {'written': 1, 'stale': 0, 'errors': 0}
+    # a retried / late batch with older events: conditional write rejects them
+    assert store.apply(latest_of(state_event('e3', 'a', 3), state_event('e1', 'b', 1))) == \
+        {'written': 1, 'stale': 1, 'errors': 0}
+    assert stored(store) == {'a': ('2024-05-28T12:05:00Z', 'e5'), 'b': ('2024-05-28T12:01:00Z', 'e1')}
+
+
+def test_concurrent_batches_in_any_order_converge(table):
+    store = CurrentStateStore(table, 'current-state', max_workers=4)
+    events = [state_event(f"e{stack}-{minute}", stack, minute) for stack in 'abcd' for minute in range(10)]
+    random.Random(7).shuffle(events)
+    batches = [events[i::5] for i in range(5)]
+
+    def apply(batch):
+        store.apply(latest_of(*batch))
+
+    threads = [threading.Thread(target=apply, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stored(store) == {stack: ('2024-05-28T12:09:00Z', f"e{stack}-9") for stack in 'abcd'}
+
+
+def test_failed_write_is_counted_and_retried_by_next_batch(table):
+    class Flaky:
+        """ update_item throttled once per stack """
+
+        def __init__(self, client):
+            self.client = client
+            self.failed = set()
+
+        def update_item(self, **kwargs):
+            stack_id = kwargs['Key']['stackid']['S']
+            if stack_id not in self.failed:
+                self.failed.add(stack_id)
+                raise type('ProvisionedThroughputExceededException', (Exception,), {})('throttled')
+            return self.client.update_item(**kwargs)
+
+        def scan(self, **kwargs):
+            return self.client.scan(**kwargs)
+
+    store = CurrentStateStore(Flaky(table), 'current-state')
+    batch = latest_of(state_event('e1', 'a', 1), state_event('e2', 'b', 1))
+    assert store.apply(batch) == {'written': 0, 'stale': 0, 'errors': 2}
+    assert store.apply(batch) == {'written': 2, 'stale': 0, 'errors': 0}
+    assert set(stored(store)) == {'a', 'b'}
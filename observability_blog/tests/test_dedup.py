@@ -0,0 +1,45 @@
+import app
+from dedup import DedupCache
+
+
+def results(response):
+    return [record['result'] for record in response['records']]
+
+
+def test_retried_batch_is_not_dropped(make_batch):
+    # the module level cache the handler uses (process_batch default), ids unique to this test
+    retried = app.DEDUP.retried_batches
+    batch = make_batch(('retry-r1', 'retry-e1'), ('retry-r2', 'retry-e2'), ('retry-r3', 'retry-e1'))  # e1 twice
+
+    # the invocation processed the batch, then timed out: Firehose never got the response
+    assert results(app.lambda_handler(batch, None)) == ['Ok', 'Ok', 'Dropped']
+
+    # Firehose retries the whole batch, in the same warm container
+    assert results(app.lambda_handler(batch, None)) == ['Ok', 'Ok', 'Dropped']
+    assert app.DEDUP.retried_batches == retried + 1
+
+    # next batch: the retried one was returned, its ids are committed
+    next_batch = make_batch(('retry-r4', 'retry-e2'), ('retry-r5', 'retry-e3'))
+    assert results(app.lambda_handler(next_batch, None)) == ['Dropped', 'Ok']
+
+
+def test_staged_ids_committed_by_next_batch():
+    now = [0.0]
+    cache = DedupCache(max_entries=10, ttl_seconds=60, clock=lambda: now[0])
+    cache.begin(['r1'])
+    cache.stage('e1')
+    assert cache.contains('e1') and len(cache) == 0
+
+    cache.begin(['r2'])
+    assert len(cache) == 1 and cache.contains('e1')
+
+    now[0] = 61  # expired by ttl
+    assert not cache.contains('e1')
+
+
+def test_bounded_by_max_entries():
+    cache = DedupCache(max_entries=3, ttl_seconds=3600)
+    for event_id in ('a', 'b', 'c', 'd'):
+        cache.add(event_id)
+    assert len(cache) == 3 and not cache.contains('a') and cache.contains('d')
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from enrichment import EMPTY, StackMetadataEnricher, TTLCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubCloudFormation:
+    """ describe_stacks with a latency, failing for the stack ids in `failing` """
+
+    def __init__(self, latency=0.02, failing=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def describe_stacks(self, StackName):
+        with self._lock:
+            self.calls.append(StackName)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if StackName in self.failing:
+                raise type('ThrottlingException', (Exception,), {})('Rate exceeded')
+            return {'Stacks': [{'StackName': StackName, 'ParentId': 'parent', 'RootId': 'root',
+                                'Tags': [{'Key': 'Owner', 'Value': 'team-a'}, {'Key': 'Environment', 'Value': 'prod'}]}]}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_ttl_cache_expires_and_evicts():
+    clock = Clock()
+    cache = TTLCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # a most recently used
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
+    clock.now = 11
+    assert cache.get('a') is None
+
+
+def test_prefetch_looks_up_unique_stacks_concurrently():
+    client = StubCloudFormation()
+    enricher = StackMetadataEnricher(client, max_workers=4)
+    stacks = [f"stack-{i}" for i in range(8)]
+    enricher.prefetch(stacks * 3)
+    assert sorted(client.calls) == sorted(stacks) and client.max_active > 1
+
+    metadata = enricher.metadata('stack-0')
+    assert (metadata['owner'], metadata['environment'], metadata['rootstackid']) == ('team-a', 'prod', 'root')
+    assert len(client.calls) == 8  # served from cache
+    assert enricher.stats()['lookups'] == 8
+
+
+def test_failed_lookup_is_retried_after_negative_ttl():
+    clock = Clock()
+    client = StubCloudFormation(latency=0, failing={'stack-x'})
+    enricher = StackMetadataEnricher(client, cache=TTLCache(ttl_seconds=900, clock=clock), negative_ttl_seconds=60)
+    assert enricher.metadata('stack-x') == EMPTY
+    assert enricher.metadata('stack-x') == EMPTY and client.calls == ['stack-x']  # not hammered
+    assert enricher.stats()['errors'] == 1
+
+    client.failing.clear()
+    clock.now = 61
+    assert enricher.metadata('stack-x')['owner'] == 'team-a'
+    assert client.calls == ['stack-x', 'stack-x']
@@ -0,0 +1,28 @@
+import zlib
+
+import app
+from conftest import firehose_record, stack_event
+
+
+def test_keys_from_event_time_account_and_region():
+    data = app.transform_data(stack_event('e1', stack='web', time='2024-01-31T23:59:59Z'))
+    assert app.partition_keys(data, stack_buckets=0) == {
+        'year': '2024', 'month': '01', 'day': '31', 'accountid': '123456789012', 'awsregion': 'eu-west-1'}
+
+
+def test_stack_bucket_is_stable_and_bounded():
+    buckets = {}
+    for i in range(200):
+        data = app.transform_data(stack_event(f"e{i}", stack=f"stack-{i}"))
+        bucket = app.partition_keys(data, stack_buckets=8)['stackbucket']
+        assert bucket == f"{zlib.crc32(f'stack-{i}'.encode('utf-8')) % 8:02d}"  # as Athena computes it
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    assert sorted(buckets) == [f"{b:02d}" for b in range(8)]
+
+
+def test_keys_returned_in_record_metadata():
+    records = [firehose_record('r1', stack_event('e1')), {'recordId': 'bad', 'data': '%%%'}]
+    output, _ = app.process_batch(records, projection=None, partitioner=app.partition_keys, state=None, seen=None,
+                                  aggregate=False, enricher=None)
+    assert output[0]['metadata']['partitionKeys']['day'] == '28'
+    assert 'metadata' not in output[1]  # failed records go to the error prefix, unpartitioned
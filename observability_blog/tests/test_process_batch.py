@@ -0,0 +1,65 @@
+import base64
+import json
+
+import app
+from conftest import firehose_record, stack_event
+from dedup import DedupCache
+
+
+def decoded(out):
+    return json.loads(base64.b64decode(out['data']))
+
+
+def process(records, **kwargs):
+    options = dict(projection=None, partitioner=None, state=None, seen=None, aggregate=False, enricher=None)
+    options.update(kwargs)
+    return app.process_batch(records, **options)
+
+
+def test_results_in_input_order():
+    malformed = {'recordId': 'bad-base64', 'data': '%%%'}
+    not_json = {'recordId': 'not-json', 'data': base64.b64encode(b'{"id": ').decode('ascii')}
+    no_stack = firehose_record('no-stack', {'id': 'e9', 'detail': {}})
+    records = [firehose_record('r1', stack_event('e1', stack='web')), malformed, not_json, no_stack,
+               firehose_record('r2', stack_event('e2', stack='db', status='UPDATE_ROLLBACK_COMPLETE'))]
+
+    output, stats = process(records)
+    assert [out['recordId'] for out in output] == [record['recordId'] for record in records]
+    assert [out['result'] for out in output] == ['Ok', 'ProcessingFailed', 'ProcessingFailed', 'ProcessingFailed', 'Ok']
+    assert stats == {'Ok': 2, 'Dropped': 0, 'ProcessingFailed': 3}
+    assert output[1]['data'] == '%%%'  # failed records are returned as received
+
+    first = decoded(output[0])
+    assert (first['id'], first['stackname'], first['stackstatus']) == ('e1', 'web', 'CREATE_COMPLETE')
+    assert base64.b64decode(output[0]['data']).endswith(b'\n')  # newline delimited for Athena
+    assert decoded(output[4])['stackstatus'] == 'UPDATE_ROLLBACK_COMPLETE'
+
+
+def test_duplicates_dropped():
+    seen = DedupCache(max_entries=100, ttl_seconds=3600)
+    records = [firehose_record('r1', stack_event('e1')), firehose_record('r2', stack_event('e2')),
+               firehose_record('r3', stack_event('e1'))]
+    output, stats = process(records, seen=seen)
+    assert [out['result'] for out in output] == ['Ok', 'Ok', 'Dropped']
+    assert (stats['Dropped'], stats['dedup']['staged']) == (1, 2)
+
+    output, _ = process([firehose_record('r4', stack_event('e2')), firehose_record('r5', stack_event('e3'))], seen=seen)
+    assert [out['result'] for out in output] == ['Dropped', 'Ok']  # committed with the next batch
+
+
+def test_failed_records_are_not_remembered():
+    seen = DedupCache(max_entries=100, ttl_seconds=3600)
+    event = stack_event('e1')
+    event['detail'].pop('status-details')  # transform fails after the id was read
+    output, _ = process([firehose_record('r1', event)], seen=seen)
+    assert output[0]['result'] == 'ProcessingFailed'
+
+    output, _ = process([firehose_record('r2', stack_event('e1'))], seen=seen)  # fixed and sent again
+    assert output[0]['result'] == 'Ok'
+
+
+def test_handler_and_single_record():
+    record = firehose_record('r1', stack_event('handler-e1'))
+    response = app.lambda_handler({'records': [record]}, None)
+    assert list(response) == ['records'] and response['records'][0]['recordId'] == 'r1'
+    assert app.process_record(firehose_record('r2', {'id': 'handler-e2'}))['result'] == 'ProcessingFailed'
@@ -0,0 +1,269 @@
+"""
+Reprocess historical NDJSON objects through the current processor transform_data, into the current layout.
+
+- source / destination: a local directory or s3://bucket/prefix (local directories stand in for the bucket)
+- one task per source object on a process pool (--workers, default: all cores); objects are read line by
+  line (gzip streamed too), never loaded whole
+- records are re-transformed (extractors are recomputed, so fixes apply to old records) and written:
+  --layout partitioned: under the dynamic partitioning prefixes (year=/month=/day=/accountid=/awsregion=[/stackbucket=])
+  --layout same: under the source relative path
+  one output object per source object and prefix, named after the source key (its name and a hash of the
+  whole key, so objects with the same name under different prefixes do not collide): reruns overwrite
+- --output-format (default: the OutputFormat setting of the processor, json): json writes NDJSON, parquet
+  writes the projected columns (app.COLUMNS) as Parquet, what the Parquet table reads (needs pyarrow)
+- lines that fail to transform go to backfill-failed/ under the destination
+- checkpoint: finished source objects are appended to --checkpoint; a rerun skips them (--restart ignores it)
+
+usage (from observability_blog/ folder):
+python tools/backfill.py --source s3://bucket/2023/ --destination s3://bucket/events/ [--gzip] [--stack-buckets 16]
+python tools/backfill.py --source /tmp/history --destination /tmp/reprocessed --workers 8
+python tools/backfill.py --source s3://bucket/2023/ --destination s3://bucket/events/ --output-format parquet
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'processor_function'), os.path.join(ROOT, 'tools')]
+
+FAILED_PREFIX = 'backfill-failed/'
+PARQUET_ROW_GROUP = 10000  # rows buffered per prefix before they are written
+
+_s3 = None  # per process
+
+
+def s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        _s3 = boto3.client('s3')
+    return _s3
+
+
+def split_s3(url):
+    bucket, _, prefix = url[len('s3://'):].partition('/')
+    return bucket, prefix
+
+
+def list_objects(source):
+    """ Relative keys of the objects under source, sorted """
+    if source.startswith('s3://'):
+        bucket, prefix = split_s3(source)
+        keys = []
+        for page in s3_client().get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            keys += [item['Key'][len(prefix):] for item in page.get('Contents', []) if not item['Key'].endswith('/')]
+        return sorted(keys)
+    keys = []
+    for directory, _, files in os.walk(source):
+        keys += [os.path.relpath(os.path.join(directory, name), source).replace(os.sep, '/') for name in files]
+    return sorted(keys)
+
+
+def open_lines(source, key):
+    """ Binary line iterator over a source object, decompressing .gz on the fly. Use as a context manager. """
+    if source.startswith('s3://'):
+        bucket, prefix = split_s3(source)
+        body = s3_client().get_object(Bucket=bucket, Key=prefix + key)['Body']
+        if key.endswith('.gz'):
+            return gzip.GzipFile(fileobj=body)
+        return contextlib.closing(body.iter_lines(chunk_size=1024 * 1024, keepends=True))
+    raw = open(os.path.join(source, key), 'rb')
+    return gzip.GzipFile(fileobj=raw) if key.endswith('.gz') else raw
+
+
+class Outputs:
+    """
+    One temporary file per destination prefix, published when the source object is done.
+    json: NDJSON lines (gzip with compress). parquet: flat rows, written by row group (snappy).
+    Failed lines are NDJSON whatever the format. close() removes what was not published.
+    """
+
+    def __init__(self, destination, name, compress, output_format='json', columns=()):
+        self.destination = destination
+        self.output_format = output_format
+        self.columns = columns
+        self.compress = compress
+        self.name = os.path.splitext(name)[0] + '.parquet' if output_format == 'parquet' else name + ('.gz' if compress else '')
+        self.failed_name = name + ('.gz' if compress else '')
+        self.directory = tempfile.mkdtemp(prefix='backfill-')
+        self.files = {}  # prefix -> (temporary path, file)
+        self.rows = {}  # parquet: prefix -> (temporary path, writer, buffered rows)
+
+    def _path(self):
+        return os.path.join(self.directory, f"{len(self.files) + len(self.rows)}")
+
+    def write(self, prefix, line):
+        if prefix not in self.files:
+            path = self._path()
+            self.files[prefix] = (path, gzip.open(path, 'wb', compresslevel=6) if self.compress else open(path, 'wb'))
+        self.files[prefix][1].write(line)
+
+    def write_row(self, prefix, row):
+        if prefix not in self.rows:
+            import columnar_writer
+            pa = columnar_writer._pyarrow()
+            path = self._path()
+            self.rows[prefix] = (path, pa.parquet.ParquetWriter(path, columnar_writer.schema(self.columns)), [])
+        buffered = self.rows[prefix][2]
+        buffered.append(row)
+        if len(buffered) >= PARQUET_ROW_GROUP:
+            self._flush(prefix)
+
+    def _flush(self, prefix):
+        import columnar_writer
+        path, writer, buffered = self.rows[prefix]
+        if buffered:
+            pa = columnar_writer._pyarrow()
+            writer.write_table(pa.Table.from_pylist(buffered, schema=writer.schema))
+            buffered.clear()
+
+    def publish(self):
+        for prefix in list(self.rows):
+            self._flush(prefix)
+            self.rows[prefix][1].close()
+        published = [(prefix + self.name, path) for prefix, (path, _, _) in self.rows.items()]
+        for prefix, (path, f) in self.files.items():
+            f.close()
+            published.append((prefix + (self.failed_name if prefix.startswith(FAILED_PREFIX) else self.name), path))
+        for key, path in published:
+            if self.destination.startswith('s3://'):
+                bucket, base = split_s3(self.destination)
+                s3_client().upload_file(path, bucket, base + key)
+                os.remove(path)
+            else:
+                target = os.path.join(self.destination, key)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+        self.files, self.rows = {}, {}
+
+    def close(self):
+        for _, f in self.files.values():
+            f.close()
+        for _, writer, _ in self.rows.values():
+            writer.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def output_name(key):
+    """ Source name without .gz, with a hash of the whole key: a/x.json and b/x.json do not collide """
+    name = key.rsplit('/', 1)[-1]
+    if name.endswith('.gz'):
+        name = name[:-3]
+    stem, dot, extension = name.rpartition('.')
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+    return f"{stem}-{digest}.{extension}" if dot else f"{name}-{digest}"
+
+
+def reprocess(source, key, destination, layout, stack_buckets, compress, output_format='json'):
+    """ Worker: one source object. Returns (key, records, failed). """
+    import app
+    import codec
+
+    loads, dumps = codec.loads, codec.dumps
+    transform, partition, project = app.transform_data, app.partition_keys, app.project_columns
+    parquet = output_format == 'parquet'
+    same_prefix = key[:len(key) - len(key.rsplit('/', 1)[-1])]
+    outputs = Outputs(destination, output_name(key), compress, output_format, app.COLUMNS)
+    records = failed = 0
+    try:
+        with open_lines(source, key) as lines:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    data = transform(loads(line))
+                    if layout == 'partitioned':
+                        keys = partition(data, stack_buckets)
+                        prefix = ''.join(f"{k}={v}/" for k, v in keys.items())
+                    else:
+                        prefix = same_prefix
+                    if parquet:
+                        outputs.write_row(prefix, project(data))
+                    else:
+                        outputs.write(prefix, dumps(data) + b'\n')
+                    records += 1
+                except Exception:
+                    outputs.write(FAILED_PREFIX + same_prefix, line if line.endswith(b'\n') else line + b'\n')
+                    failed += 1
+        outputs.publish()
+    finally:
+        outputs.close()  # interrupted or failed: nothing left behind in the temporary directory
+    return key, records, failed
+
+
+def load_checkpoint(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line)['key'])
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', required=True, help='directory or s3://bucket/prefix/')
+    parser.add_argument('--destination', required=True, help='directory or s3://bucket/prefix/')
+    parser.add_argument('--layout', choices=('partitioned', 'same'), default='partitioned')
+    parser.add_argument('--stack-buckets', type=int, default=0, help='as the StackBuckets stack parameter')
+    parser.add_argument('--gzip', action='store_true', help='compress output objects (json)')
+    parser.add_argument('--output-format', choices=('json', 'parquet'),
+                        default=os.environ.get('OutputFormat', 'json').lower(),
+                        help='as the OutputFormat stack parameter (default: $OutputFormat, json)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--checkpoint', default='.backfill-checkpoint.jsonl')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint')
+    args = parser.parse_args()
+    if args.output_format == 'parquet':
+        import columnar_writer
+        columnar_writer._pyarrow()  # fail before any work without pyarrow
+
+    if args.destination.startswith('s3://'):
+        args.destination = args.destination.rstrip('/') + '/'
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+    keys = [key for key in list_objects(args.source) if key not in done]
+    print(f"{len(keys)} objects to process, {len(done)} already done", file=sys.stderr)
+
+    records = failed = 0
+    started = time.perf_counter()
+    with open(args.checkpoint, 'a') as checkpoint, ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(reprocess, args.source, key, args.destination, args.layout, args.stack_buckets, args.gzip,
+                        args.output_format)
+            for key in keys
+        ]
+        for i, future in enumerate(as_completed(futures), 1):
+            key, object_records, object_failed = future.result()
+            checkpoint.write(json.dumps({'key': key, 'records': object_records, 'failed': object_failed}) + '\n')
+            checkpoint.flush()
+            records += object_records
+            failed += object_failed
+            elapsed = time.perf_counter() - started
+            print(f"[{i}/{len(keys)}] {key}: {object_records} records, {object_failed} failed "
+                  f"({records / elapsed:,.0f} records/s)", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'objects': len(keys),
+        'records': records,
+        'failed': failed,
+        'seconds': round(elapsed, 1),
+        'records_per_second': round(records / elapsed) if elapsed else 0,
+        'workers': args.workers,
+        'output_format': args.output_format
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Local columnar writer: flat processor records -> Parquet file, in the layout Firehose record format
+conversion writes (processor_function/app.py COLUMNS, OutputFormat=PARQUET).
+Needs pyarrow (pip install pyarrow). It is not part of the Lambda package: in AWS, Firehose converts.
+"""
+import base64
+import json
+import os
+
+LIST_COLUMNS = ('resources',)  # array<string>
+MAP_COLUMNS = ('stacktags',)  # map<string,string>, every other column is a string
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception('pyarrow is required for local parquet output: pip install pyarrow')
+    return pyarrow
+
+
+def schema(columns):
+    pa = _pyarrow()
+
+    def column_type(name):
+        if name in LIST_COLUMNS:
+            return pa.list_(pa.string())
+        if name in MAP_COLUMNS:
+            return pa.map_(pa.string(), pa.string())
+        return pa.string()
+    return pa.schema([(name, column_type(name)) for name in columns])
+
+
+def decode_records(records):
+    """ Data of the Ok records of a processor response, as dicts """
+    return [json.loads(base64.b64decode(record['data'])) for record in records if record['result'] == 'Ok']
+
+
+def write_parquet(rows, path, columns, compression='snappy'):
+    """ Write flat rows to path. Returns the file size in bytes. """
+    pa = _pyarrow()
+    pa.parquet.write_table(pa.Table.from_pylist(rows, schema=schema(columns)), path, compression=compression)
+    return os.path.getsize(path)
@@ -0,0 +1,41 @@
+"""
+Latest status of every stack, read from the current state table the processor maintains
+(stack parameter MaintainCurrentState=true). Replaces the max(time) self-join of athena_queries.sql:
+one item per stack is read, whatever the length of the event history.
+
+usage: python tools/current_status.py --table <CurrentStateTable output> [--status-prefix DELETE] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'processor_function'))
+
+from current_state import CurrentStateStore  # noqa: E402
+
+
+def latest_status(client, table_name, status_prefix=''):
+    rows = [row for row in CurrentStateStore(client, table_name).scan() if row['stackstatus'].startswith(status_prefix)]
+    return sorted(rows, key=lambda row: row['stackname'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', required=True)
+    parser.add_argument('--region', default=None)
+    parser.add_argument('--status-prefix', default='', help='e.g. UPDATE_ROLLBACK, DELETE')
+    parser.add_argument('--json', action='store_true', help='one json object per line')
+    args = parser.parse_args()
+
+    import boto3
+    rows = latest_status(boto3.client('dynamodb', region_name=args.region), args.table, args.status_prefix)
+    for row in rows:
+        if args.json:
+            print(json.dumps(row))
+        else:
+            print(f"{row['time']}  {row['stackstatus']:<40} {row['stackname']}  ({row['account']} {row['region']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Local stand-in for the Firehose S3 destination: buffers processed records (per partition prefix with
+dynamic partitioning), flushes them on the buffering hints and writes compressed objects to a directory.
+Time is driven by the caller (simulated clock), nothing sleeps.
+"""
+import base64
+import datetime
+import gzip
+import os
+
+try:
+    import snappy  # python-snappy, optional
+except ImportError:
+    snappy = None
+
+
+def _hadoop_snappy(data):
+    return snappy.HadoopStreamCompressor().add_chunk(data)
+
+
+def _hadoop_snappy_decompress(data):
+    return snappy.HadoopStreamDecompressor().decompress(data)
+
+
+# CompressionFormat -> (compress, decompress, file extension)
+COMPRESSIONS = {
+    'UNCOMPRESSED': (lambda data: data, lambda data: data, ''),
+    'GZIP': (lambda data: gzip.compress(data, compresslevel=6), gzip.decompress, '.gz'),
+}
+if snappy is not None:
+    COMPRESSIONS['HADOOP_SNAPPY'] = (_hadoop_snappy, _hadoop_snappy_decompress, '.snappy')
+
+
+class S3Buffer:
+    """
+    :param size_mb: BufferingHints.SizeInMBs
+    :param interval_seconds: BufferingHints.IntervalInSeconds
+    :param compression: key of COMPRESSIONS (CompressionFormat)
+    """
+
+    def __init__(self, directory, size_mb=1, interval_seconds=60, compression='UNCOMPRESSED', prefix='', stream='local'):
+        if compression not in COMPRESSIONS:
+            raise Exception(f"Compression {compression} not available here: {sorted(COMPRESSIONS)}")
+        self.directory = directory
+        self.size_bytes = size_mb * 1024 * 1024
+        self.interval_seconds = interval_seconds
+        self.compress, _, self.extension = COMPRESSIONS[compression]
+        self.prefix = prefix
+        self.stream = stream
+        self.buffers = {}  # prefix -> [first record time, parts, size]
+        self.objects = []  # (path, raw bytes, written bytes)
+
+    def add(self, response_records, now):
+        """ Buffer the Ok records of a processor response. now: simulated time, in seconds. """
+        self.tick(now)
+        for record in response_records:
+            if record['result'] != 'Ok':
+                continue
+            data = base64.b64decode(record['data'])
+            prefix = self._prefix(record, now)
+            buffer = self.buffers.get(prefix)
+            if buffer is None:
+                buffer = self.buffers[prefix] = [now, [], 0]
+            buffer[1].append(data)
+            buffer[2] += len(data)
+            if buffer[2] >= self.size_bytes:
+                self._flush(prefix, now)
+
+    def tick(self, now):
+        """ Flush the buffers older than the interval hint """
+        for prefix, (first, _, _) in list(self.buffers.items()):
+            if now - first >= self.interval_seconds:
+                self._flush(prefix, now)
+
+    def close(self, now):
+        for prefix in list(self.buffers):
+            self._flush(prefix, now)
+
+    def _prefix(self, record, now):
+        keys = record.get('metadata', {}).get('partitionKeys')
+        if keys:
+            return self.prefix + ''.join(f"{key}={value}/" for key, value in keys.items())
+        return self.prefix + datetime.datetime.fromtimestamp(now, datetime.timezone.utc).strftime('%Y/%m/%d/%H/')
+
+    def _flush(self, prefix, now):
+        first, parts, size = self.buffers.pop(prefix)
+        body = self.compress(b''.join(parts))
+        stamp = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).strftime('%Y-%m-%d-%H-%M-%S')
+        path = os.path.join(self.directory, prefix, f"{self.stream}-1-{stamp}-{len(self.objects):08d}{self.extension}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        self.objects.append((path, size, len(body)))
+
+    def stats(self):
+        return {
+            'objects': len(self.objects),
+            'raw_bytes': sum(raw for _, raw, _ in self.objects),
+            'written_bytes': sum(written for _, _, written in self.objects)
+        }
@@ -0,0 +1,212 @@
+"""
+Local delivery stream: drives processor_function/app.py lambda_handler the way Firehose does, end to end.
+
+- generates CloudFormation status change events at --rate events/s for --seconds (simulated clock: runs
+  as fast as the processor allows), with optional malformed records and duplicate deliveries
+- groups them in processor invocations on the processing buffer hints (--processing-mb / --processing-seconds),
+  under the 6 MB invocation payload and --max-records limits
+- checks the response contract (one result per recordId, known result, base64 data)
+- Ok records go through the S3 buffering hints (--buffer-mb / --buffer-seconds, --compression) to objects
+  under --output, ProcessingFailed records to processing-failed/, Dropped records are discarded
+- reports records/s, p50/p99 invocation latency, per record latency and peak RSS; exits with 1 when
+  --min-records-per-second or --max-p99-ms budgets are not met
+
+usage (from observability_blog/ folder):
+python tools/firehose_emulator.py --rate 500 --seconds 600 --output /tmp/firehose [--env DynamicPartitioning=true]
+"""
+import argparse
+import base64
+import binascii
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TOOLS_DIR)
+sys.path.insert(0, TOOLS_DIR)
+
+from delivery import COMPRESSIONS, S3Buffer  # noqa: E402
+from synthetic_events import MAX_BATCH_BYTES, firehose_event, generate_events  # noqa: E402
+
+RESULTS = ('Ok', 'Dropped', 'ProcessingFailed')
+START = 1672531200  # 2023-01-01, as generate_events
+
+
+class Context:
+    function_name = 'processor-emulator'
+    invoked_function_arn = 'arn:aws:lambda:eu-central-1:123456789012:function:processor-emulator'
+    log_stream_name = 'emulator'
+
+    def __init__(self, timeout_ms=60000):
+        self.deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self.deadline - time.monotonic()) * 1000)
+
+
+def deliveries(count, rate, malformed=0.0, duplicates=0.0, seed=0):
+    """ Yield (arrival time, raw record data) in arrival order """
+    rng = random.Random(seed)
+    delivered = []
+    for i, event in enumerate(generate_events(count, interval_seconds=1 / rate, seed=seed)):
+        data = json.dumps(event).encode('utf-8')
+        if rng.random() < malformed:
+            data = data[:len(data) // 2]  # truncated json
+        arrival = START + i / rate
+        yield arrival, data
+        delivered.append(data)
+        if rng.random() < duplicates:
+            yield arrival, rng.choice(delivered[-1000:])
+        if len(delivered) > 2000:
+            del delivered[:1000]
+
+
+def invocations(arrivals, processing_mb, processing_seconds, max_records):
+    """ Group arrivals in processor invocations: (invocation time, records) """
+    limit = min(processing_mb * 1024 * 1024, MAX_BATCH_BYTES)
+    batch, size, opened = [], 0, None
+    index = 0
+    for arrival, data in arrivals:
+        if batch and arrival - opened >= processing_seconds:
+            yield arrival, batch
+            batch, size = [], 0
+        record = {
+            'recordId': f"{index:056d}",
+            'approximateArrivalTimestamp': int(arrival * 1000),
+            'data': base64.b64encode(data).decode('ascii')
+        }
+        index += 1
+        record_size = len(record['data']) + 120
+        if batch and (size + record_size > limit or len(batch) >= max_records):
+            yield arrival, batch
+            batch, size = [], 0
+        if not batch:
+            opened = arrival
+        batch.append(record)
+        size += record_size
+    if batch:
+        yield opened + processing_seconds, batch
+
+
+def check_response(records, response):
+    """ Firehose rejects the whole invocation when the response breaks the contract """
+    output = response['records']
+    if sorted(record['recordId'] for record in output) != sorted(record['recordId'] for record in records):
+        raise Exception('Response record ids do not match the invocation record ids')
+    for record in output:
+        if record['result'] not in RESULTS:
+            raise Exception(f"Unknown result {record['result']} for {record['recordId']}")
+        binascii.a2b_base64(record['data'])
+    if len(json.dumps(response)) > MAX_BATCH_BYTES:
+        raise Exception('Response over the 6 MB Lambda payload limit')
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def run(args, handler):
+    buffer = S3Buffer(args.output, args.buffer_mb, args.buffer_seconds, args.compression)
+    errors = S3Buffer(args.output, args.buffer_mb, args.buffer_seconds, 'UNCOMPRESSED', prefix='processing-failed/')
+    results = dict.fromkeys(RESULTS, 0)
+    latencies, per_record = [], []
+    count = int(args.rate * args.seconds)
+    arrivals = deliveries(count, args.rate, args.malformed, args.duplicates, args.seed)
+
+    started = time.perf_counter()
+    now = START
+    for now, records in invocations(arrivals, args.processing_mb, args.processing_seconds, args.max_records):
+        event = firehose_event(records)
+        invoke_started = time.perf_counter()
+        response = handler(event, Context())
+        latency = (time.perf_counter() - invoke_started) * 1000
+        check_response(records, response)
+        latencies.append(latency)
+        per_record.append(latency / len(records))
+        for record in response['records']:
+            results[record['result']] += 1
+        buffer.add(response['records'], now)
+        failed = {record['recordId'] for record in response['records'] if record['result'] == 'ProcessingFailed'}
+        errors.add([{'result': 'Ok', 'data': r['data']} for r in records if r['recordId'] in failed], now)
+    elapsed = time.perf_counter() - started
+    buffer.close(now + args.buffer_seconds)
+    errors.close(now + args.buffer_seconds)
+
+    total = sum(results.values())
+    return {
+        'records': total,
+        'results': results,
+        'invocations': len(latencies),
+        'records_per_second': round(total / elapsed, 1),
+        'invocation_ms': {'p50': round(percentile(latencies, 50), 3), 'p99': round(percentile(latencies, 99), 3)},
+        'record_us': {'p50': round(percentile(per_record, 50) * 1000, 3), 'p99': round(percentile(per_record, 99) * 1000, 3)},
+        'objects': buffer.stats(),
+        'error_objects': errors.stats(),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KB on linux
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=float, default=500, help='events per second')
+    parser.add_argument('--seconds', type=float, default=600, help='simulated duration')
+    parser.add_argument('--malformed', type=float, default=0.0, help='share of truncated records (ProcessingFailed)')
+    parser.add_argument('--duplicates', type=float, default=0.0, help='share of redelivered records (Dropped)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processing-mb', type=float, default=3, help='Lambda processor buffer size hint')
+    parser.add_argument('--processing-seconds', type=float, default=60, help='Lambda processor buffer interval hint')
+    parser.add_argument('--max-records', type=int, default=10000)
+    parser.add_argument('--buffer-mb', type=int, default=1, help='S3 BufferingHints.SizeInMBs')
+    parser.add_argument('--buffer-seconds', type=int, default=60, help='S3 BufferingHints.IntervalInSeconds')
+    parser.add_argument('--compression', default='UNCOMPRESSED', choices=sorted(COMPRESSIONS))
+    parser.add_argument('--output', default=None, help='output directory, temporary when omitted')
+    parser.add_argument('--processor', default=os.path.join(ROOT, 'processor_function'), help='folder of app.py')
+    parser.add_argument('--env', action='append', default=[], help='KEY=VALUE processor environment, repeatable')
+    parser.add_argument('--stub-stack-metadata', type=float, default=None, metavar='LATENCY_MS',
+                        help='enable stack metadata enrichment against tools/stub_cloudformation.py')
+    parser.add_argument('--min-records-per-second', type=float, default=0)
+    parser.add_argument('--max-p99-ms', type=float, default=0, help='invocation p99 budget, 0 for none')
+    args = parser.parse_args()
+
+    # the processor reads its configuration at import
+    os.environ.update(dict(item.split('=', 1) for item in args.env))
+    sys.path.insert(0, args.processor)
+    import app
+    handler, stub = app.lambda_handler, None
+    if args.stub_stack_metadata is not None:
+        import enrichment
+        from stub_cloudformation import StubCloudFormation
+        stub = StubCloudFormation(latency_ms=args.stub_stack_metadata)
+        enricher = enrichment.StackMetadataEnricher(stub)
+
+        def enriched_handler(event, context):
+            return {'records': app.process_batch(event['records'], enricher=enricher)[0]}
+        handler = enriched_handler
+
+    if args.output is None:
+        with tempfile.TemporaryDirectory() as directory:
+            args.output = directory
+            report = run(args, handler)
+    else:
+        report = run(args, handler)
+    if stub is not None:
+        report['describe_stacks_calls'] = stub.calls
+
+    print(json.dumps(report, indent=2), file=sys.stderr)
+    failures = []
+    if report['records_per_second'] < args.min_records_per_second:
+        failures.append(f"{report['records_per_second']} records/s under {args.min_records_per_second}")
+    if args.max_p99_ms and report['invocation_ms']['p99'] > args.max_p99_ms:
+        failures.append(f"p99 {report['invocation_ms']['p99']} ms over {args.max_p99_ms}")
+    if failures:
+        print('FAILED: ' + ', '.join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Stand-in for the CloudFormation client of the processor enrichment stage (describe_stacks only):
+deterministic tags and nesting per stack id, optional latency, call counter.
+"""
+import time
+import zlib
+
+OWNERS = ('team-a', 'team-b', 'team-c')
+ENVIRONMENTS = ('dev', 'staging', 'prod')
+
+
+class StubCloudFormation:
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def describe_stacks(self, StackName):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        h = zlib.crc32(StackName.encode('utf-8'))
+        stack = {
+            'StackId': StackName,
+            'StackName': StackName.split('/', 2)[1] if '/' in StackName else StackName,
+            'Tags': [{'Key': 'Owner', 'Value': OWNERS[h % 3]}, {'Key': 'Environment', 'Value': ENVIRONMENTS[h // 3 % 3]}]
+        }
+        if h % 4 == 0:  # a quarter of the stacks are nested
+            parent = StackName.rsplit('/', 1)[0] + '/00000000-0000-0000-0000-parent000000'
+            stack.update({'ParentId': parent, 'RootId': parent})
+        return {'Stacks': [stack]}
@@ -0,0 +1,134 @@
+"""
+Synthetic "CloudFormation Stack Status Change" EventBridge events, and Firehose processor batches built from them.
+
+python tools/synthetic_events.py --count 10 prints events as NDJSON.
+python tools/synthetic_events.py --count 1000000 --output-dir /tmp/history writes them as Firehose style
+objects (YYYY/MM/DD/HH/ prefixes, --per-object events each, --gzip), e.g. to try tools/backfill.py.
+"""
+import argparse
+import base64
+import datetime
+import gzip
+import json
+import os
+import random
+import uuid
+
+STATUSES = (
+    'CREATE_IN_PROGRESS', 'CREATE_COMPLETE', 'UPDATE_IN_PROGRESS', 'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS',
+    'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE', 'DELETE_IN_PROGRESS', 'DELETE_COMPLETE'
+)
+REGIONS = ('eu-central-1', 'eu-west-1', 'us-east-1', 'us-west-2')
+
+MAX_BATCH_BYTES = 6 * 1024 * 1024  # Lambda synchronous invocation payload
+MAX_BATCH_RECORDS = 10000
+
+
+def stack_id(account, region, name, seed):
+    return f"arn:aws:cloudformation:{region}:{account}:stack/{name}/{uuid.UUID(int=seed)}"
+
+
+def generate_events(count, stacks=100, accounts=5, start=None, interval_seconds=1.0, reason_size=40, seed=0):
+    """
+    Yield count events over a fixed set of stacks, with increasing event time.
+
+    :param reason_size: length of status-reason, to tune the record size (~550 bytes with the default)
+    """
+    rng = random.Random(seed)
+    start = start or datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    account_ids = [f"{100000000000 + i * 7919:012d}" for i in range(accounts)]
+    stack_ids = [
+        stack_id(account_ids[i % accounts], REGIONS[i % len(REGIONS)], f"stack-{i:05d}", i + 1)
+        for i in range(stacks)
+    ]
+    reason = ('x' * reason_size)
+    for i in range(count):
+        sid = stack_ids[rng.randrange(stacks)]
+        _, _, _, region, account, _ = sid.split(':', 5)
+        yield {
+            'version': '0',
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'detail-type': 'CloudFormation Stack Status Change',
+            'source': 'aws.cloudformation',
+            'account': account,
+            'time': (start + datetime.timedelta(seconds=i * interval_seconds)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'region': region,
+            'resources': [sid],
+            'detail': {
+                'stack-id': sid,
+                'status-details': {'status': rng.choice(STATUSES), 'status-reason': reason}
+            }
+        }
+
+
+def firehose_record(event, index=0, arrival_ms=0):
+    return {
+        'recordId': f"{index:056d}",
+        'approximateArrivalTimestamp': arrival_ms,
+        'data': base64.b64encode(json.dumps(event).encode('utf-8')).decode('ascii')
+    }
+
+
+def firehose_batches(events, max_bytes=MAX_BATCH_BYTES, max_records=MAX_BATCH_RECORDS):
+    """ Group events into processor invocation payloads, under the size and record limits """
+    batch, size = [], 0
+    for index, event in enumerate(events):
+        record = firehose_record(event, index)
+        record_size = len(record['data']) + 120  # json framing of the record
+        if batch and (size + record_size > max_bytes or len(batch) >= max_records):
+            yield batch
+            batch, size = [], 0
+        batch.append(record)
+        size += record_size
+    if batch:
+        yield batch
+
+
+def firehose_event(records):
+    return {
+        'invocationId': str(uuid.uuid4()),
+        'deliveryStreamArn': 'arn:aws:firehose:eu-central-1:123456789012:deliverystream/local',
+        'region': 'eu-central-1',
+        'records': records
+    }
+
+
+def write_objects(directory, events, per_object=10000, compress=False):
+    """ NDJSON objects under Firehose's default YYYY/MM/DD/HH/ prefixes. Returns the number of objects. """
+    opener = gzip.open if compress else open
+    count = 0
+    batch = []
+    for event in events:
+        batch.append(event)
+        if len(batch) >= per_object:
+            _write_object(directory, batch, count, opener, '.gz' if compress else '')
+            batch, count = [], count + 1
+    if batch:
+        _write_object(directory, batch, count, opener, '.gz' if compress else '')
+        count += 1
+    return count
+
+
+def _write_object(directory, events, index, opener, extension):
+    hour = events[0]['time'][:13].replace('-', '/').replace('T', '/')  # 2023/01/01/00
+    path = os.path.join(directory, hour, f"local-1-{events[0]['time'].replace(':', '-')}-{index:08d}{extension}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with opener(path, 'wb') as f:
+        f.write(''.join(json.dumps(event) + '\n' for event in events).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--stacks', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output-dir', default=None, help='write objects there instead of printing')
+    parser.add_argument('--per-object', type=int, default=10000)
+    parser.add_argument('--gzip', action='store_true')
+    args = parser.parse_args()
+    events = generate_events(args.count, stacks=args.stacks, seed=args.seed)
+    if args.output_dir:
+        print(f"{write_objects(args.output_dir, events, args.per_object, args.gzip)} objects written")
+    else:
+        for event in events:
+            print(json.dumps(event))
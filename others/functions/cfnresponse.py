@@ -1,40 +1,133 @@
+import http.client
 import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 
-try:
-    from urllib3 import HTTPError, build_opener, HTTPHandler, Request
-except ImportError:
-    from urllib.error import HTTPError
-    from urllib.request import build_opener, HTTPHandler, Request
-
+# Shared custom resource responder. Same file in every function folder that answers CloudFormation
+# custom resources (each CodeUri is packaged on its own): keep the copies identical.
 
 SUCCESS = "SUCCESS"
 FAILED = "FAILED"
 
+MAX_BODY_SIZE = 4096  # CloudFormation rejects larger response bodies
+TIMEOUT = 10  # seconds, per attempt
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5  # seconds, exponential backoff with full jitter between attempts
+MAX_DELAY = 8
+MAX_WORKERS = 8  # send_async / send_batch
+
+# Configure logging
+logging.basicConfig(format='%(levelname)s:%(module)s:%(message)s', level=logging.INFO)
+
+_local = threading.local()  # keep-alive connections, per thread: (scheme, host) -> connection
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def build_body(event, context, response_status, response_data=None, reason=None, physical_resource_id=None):
+    """
+    Encoded response body. When over MAX_BODY_SIZE, Data is dropped and the reason says so,
+    rather than CloudFormation rejecting the response and the stack waiting for its timeout.
+    """
+    body = {
+        'Status': response_status,
+        'Reason': reason or f"See the details in CloudWatch Log Stream: {context.log_stream_name}",
+        'PhysicalResourceId': physical_resource_id or context.log_stream_name,
+        'StackId': event['StackId'],
+        'RequestId': event['RequestId'],
+        'LogicalResourceId': event['LogicalResourceId'],
+        'Data': response_data or {}
+    }
+    encoded = json.dumps(body).encode('utf-8')
+    if len(encoded) <= MAX_BODY_SIZE:
+        return encoded
+
+    logging.warning("Response body is %s bytes, over the %s bytes limit. Dropping Data.", len(encoded), MAX_BODY_SIZE)
+    body['Data'] = {}
+    body['Reason'] = f"Response data dropped (over {MAX_BODY_SIZE} bytes). {body['Reason']}"
+    encoded = json.dumps(body).encode('utf-8')
+    if len(encoded) > MAX_BODY_SIZE:
+        body['Reason'] = body['Reason'][:len(body['Reason']) - (len(encoded) - MAX_BODY_SIZE) - 3] + '...'
+        encoded = json.dumps(body).encode('utf-8')
+    return encoded
+
+
+def _connection(scheme, netloc):
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    if (scheme, netloc) not in connections:
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        connections[(scheme, netloc)] = connection_class(netloc, timeout=TIMEOUT)
+    return connections[(scheme, netloc)]
+
+
+def _drop_connection(scheme, netloc):
+    connection = getattr(_local, 'connections', {}).pop((scheme, netloc), None)
+    if connection is not None:
+        connection.close()
+
+
+def put(url, body):
+    """
+    PUT body to the pre-signed url over a reused connection. Retries 5xx and connection errors.
+
+    :return: True on 2xx, False otherwise.
+    """
+    parsed = urlparse(url)
+    path = parsed.path + (f"?{parsed.query}" if parsed.query else '')
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            connection = _connection(parsed.scheme, parsed.netloc)
+            connection.request('PUT', path, body=body, headers={'Content-Type': '', 'Content-Length': str(len(body))})
+            response = connection.getresponse()
+            response.read()  # drain so the connection can be reused
+            if response.will_close:
+                _drop_connection(parsed.scheme, parsed.netloc)
+            logging.info("Request status code: %s", response.status)
+            logging.info("Request status message: %s", response.reason)
+            if response.status < 500:
+                return 200 <= response.status < 300
+            logging.warning("Attempt %s/%s failed with status %s", attempt, MAX_ATTEMPTS, response.status)
+        except (http.client.HTTPException, OSError) as exc:
+            _drop_connection(parsed.scheme, parsed.netloc)
+            logging.warning("Attempt %s/%s failed: %s", attempt, MAX_ATTEMPTS, exc)
+        if attempt < MAX_ATTEMPTS:
+            time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1))))
+    logging.error("Failed executing HTTP request after %s attempts", MAX_ATTEMPTS)
+    return False
+
+
+def send(event, context, response_status, response_data=None, reason=None, physical_resource_id=None):
+    body = build_body(event, context, response_status, response_data, reason, physical_resource_id)
+    return put(event['ResponseURL'], body)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    return _executor
+
+
+def send_async(event, context, response_status, response_data=None, reason=None, physical_resource_id=None):
+    """
+    send() on a background thread. The caller must wait on the returned Future before the handler returns.
+    """
+    return _get_executor().submit(send, event, context, response_status, response_data, reason, physical_resource_id)
+
+
+def send_batch(responses):
+    """
+    Send several responses concurrently, e.g. one function answering many custom resource requests.
 
-def send(event, context, response_status, reason=None, response_data=None, physical_resource_id=None):
-    response_data = response_data or {}
-    response_body = json.dumps(
-        {
-            'Status': response_status,
-            'Reason': reason or "See the details in CloudWatch Log Stream: " + context.log_stream_name,
-            'PhysicalResourceId': physical_resource_id or context.log_stream_name,
-            'StackId': event['StackId'],
-            'RequestId': event['RequestId'],
-            'LogicalResourceId': event['LogicalResourceId'],
-            'Data': response_data
-        }
-    )
-
-    opener = build_opener(HTTPHandler)
-    request = Request(event['ResponseURL'], data=response_body)
-    request.add_header('Content-Type', '')
-    request.add_header('Content-Length', len(response_body))
-    request.get_method = lambda: 'PUT'
-    try:
-        response = opener.open(request)
-        print("Status code: {}".format(response.getcode()))
-        print("Status message: {}".format(response.msg))
-        return True
-    except HTTPError as exc:
-        print("Failed executing HTTP request: {}".format(exc.code))
-        return False
\ No newline at end of file
+    :param responses: iterable of dicts with send() keyword arguments (event, context, response_status, ...)
+    :return: list of booleans, in input order.
+    """
+    futures = [send_async(**response) for response in responses]
+    return [future.result() for future in futures]
@@ -2,6 +2,13 @@ import logging
 import os
 import json
 import datetime
+import hashlib
+import shutil
+import tarfile
+import tempfile
+import time
+import urllib.request
+import zlib
 
 # import cfnresponse
 import subprocess
@@ -10,15 +17,24 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 json.JSONEncoder.default = lambda self,obj: (obj.isoformat() if isinstance(obj,datetime.date) else None)
 
-# import sys
-# import shutil
+# Install cache: /tmp/cfnbootstrap/<key>, key = hash of the install script + package version and url.
+# A pinned CfnBootstrapVersion (e.g. 2.0-32) names a fixed tarball, the key identifies it: a warm cache or a
+# layer needs no network at all. 'latest' changes upstream under the same url, so it always downloads the
+# tarball once per execution environment, before any cache is looked at: its sha256 is part of the key and
+# pip installs that very file, so a new release gets a new install, never a stale cache. When the download
+# fails, the newest verified 'latest' artifact (/tmp cache or layer) is used instead. Pin the version to keep
+# the network off the cold start path.
+# A prebuilt install can come from a layer (/opt/cfnbootstrap/<key>) or a bundle (<key>.tar.gz in a directory),
+# both made with: python subprocess_bash.py --bundle <directory>
+CFN_BOOTSTRAP_VERSION = os.environ.get('CfnBootstrapVersion', 'latest')
+CFN_BOOTSTRAP_URL = os.environ.get(
+    'CfnBootstrapUrl', 'https://s3.amazonaws.com/cloudformation-examples/aws-cfn-bootstrap-{version}.tar.gz')
+CACHE_ROOT = os.environ.get('CfnBootstrapCache', '/tmp/cfnbootstrap')
+PREBUILT_DIRS = [d for d in os.environ.get('CfnBootstrapBundleDirs', '/opt/cfnbootstrap').split(':') if d]
+MANIFEST = 'manifest.json'
+PINNED = CFN_BOOTSTRAP_VERSION != 'latest'
 
-def setup_environment():
-    # Define the path to the bash script in the Lambda /tmp directory
-    bash_script_path = '/tmp/install_cfnbootstrap.sh'
-    
-    # Write the bash script content to /tmp directory
-    bash_script_content = """#!/bin/bash
+bash_script_content = """#!/bin/bash
 
 # Change to the /tmp directory
 cd /tmp
@@ -28,19 +44,86 @@ yum update -y
 yum install -y python3-pip
 
 # Install cfn-bootstrap
-pip3 install --target=/tmp https://s3.amazonaws.com/cloudformation-examples/aws-cfn-bootstrap-latest.tar.gz
+pip3 install --target={target} {url}
 
 # Verify the installation
-/tmp/bin/cfn-init --version
+PYTHONPATH={target} {target}/bin/cfn-init --version
 """
-    
-    # Write the content to the bash script file
+
+# warm invocations: key -> verified install directory, not hashed again
+_verified = {}
+# 'latest': key, path and sha256 of the tarball this execution environment downloaded
+_latest = {}
+
+
+def cache_key(script=bash_script_content, version=CFN_BOOTSTRAP_VERSION, url=CFN_BOOTSTRAP_URL, digest=None):
+    value = f"{version}\n{url}\n{script}" + (f"\n{digest}" if digest else '')
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+
+def download_tarball(url=None, path='/tmp/aws-cfn-bootstrap-latest.tar.gz', timeout=15):
+    """ Download the cfn-bootstrap tarball: (path, sha256) """
+    url = url or CFN_BOOTSTRAP_URL.format(version=CFN_BOOTSTRAP_VERSION)
+    digest = hashlib.sha256()
+    with urllib.request.urlopen(url, timeout=timeout) as response, open(path, 'wb') as f:
+        for chunk in iter(lambda: response.read(1024 * 1024), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return path, digest.hexdigest()
+
+
+def resolve_key():
+    """ (key, tarball to install or None): pinned versions from the settings, 'latest' from the tarball content """
+    if PINNED:
+        return cache_key(), None
+    if not _latest:
+        try:
+            path, digest = download_tarball()
+        except OSError as e:  # URLError, timeouts
+            key = newest_verified()
+            if key is None:
+                raise
+            logger.warning(f"cfn-bootstrap download failed ({type(e).__name__}: {e}), using the cached install {key}")
+            _latest.update(key=key, path=None, sha256=None)  # not retried by warm invocations
+            return key, None
+        _latest.update(key=cache_key(digest=digest), path=path, sha256=digest)
+        logger.info(json.dumps({'cfnbootstrap': 'latest', 'sha256': digest, 'key': _latest['key']}))
+    return _latest['key'], _latest['path']
+
+
+def newest_verified(version=CFN_BOOTSTRAP_VERSION):
+    """ Key of the most recently installed verified artifact of version in the /tmp cache or a layer, or None """
+    newest = None
+    for root in [CACHE_ROOT] + PREBUILT_DIRS:
+        if not os.path.isdir(root):
+            continue
+        for key in os.listdir(root):
+            try:
+                with open(os.path.join(root, key, MANIFEST)) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if manifest.get('version') != version or not verify(os.path.join(root, key), key):
+                continue
+            if newest is None or str(manifest.get('installed')) > newest[0]:
+                newest = (str(manifest.get('installed')), key)
+    return newest and newest[1]
+
+
+def setup_environment(target=None, key=None, tarball=None):
+    # Define the path to the bash script in the Lambda /tmp directory
+    key = key or cache_key()
+    target = target or os.path.join(CACHE_ROOT, key)
+    bash_script_path = f"/tmp/install_cfnbootstrap-{key}.sh"
+
+    # Write the bash script content to /tmp directory (tarball: the downloaded file, 'latest')
     with open(bash_script_path, 'w') as file:
-        file.write(bash_script_content)
-    
+        file.write(bash_script_content.format(
+            target=target, url=tarball or CFN_BOOTSTRAP_URL.format(version=CFN_BOOTSTRAP_VERSION)))
+
     # Make the bash script executable
     os.chmod(bash_script_path, 0o755)
-    
+
     return bash_script_path
 
 def run_bash_script(script_path):
@@ -58,3 +141,127 @@ def run_bash_script(script_path):
         print("Script executed successfully.")
     else:
         print(f"Script failed with return code {result.returncode}.")
+    return result.returncode
+
+
+def _file_hashes(directory):
+    hashes = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory)
+            if relative == MANIFEST or os.path.islink(path):
+                continue
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            hashes[relative] = digest.hexdigest()
+    return hashes
+
+
+def write_manifest(directory, key, seconds=None):
+    manifest = {'key': key, 'version': CFN_BOOTSTRAP_VERSION, 'tarball_sha256': _latest.get('sha256'),
+                'files': _file_hashes(directory), 'installed': datetime.datetime.now(datetime.timezone.utc),
+                'install_seconds': seconds}
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def verify(directory, key):
+    """
+    True when directory holds the install for key: manifest key matches, every file hash matches, cfn-init present.
+    The manifest travels with the artifact: this catches partial extraction and files changed in /tmp, it does not
+    prove where the artifact came from. Layers and bundles are trusted as deployment artifacts, as the code is.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get('key') != key or 'bin/cfn-init' not in manifest.get('files', {}):
+        return False
+    if _file_hashes(directory) != manifest['files']:
+        logger.warning(f"cfn-bootstrap artifact {directory} does not match its manifest")
+        return False
+    return True
+
+
+def _from_prebuilt(key, target):
+    """ A verified layer directory is used in place (read only), a bundle is extracted into the cache """
+    for directory in PREBUILT_DIRS:
+        layer = os.path.join(directory, key)
+        if verify(layer, key):
+            return layer, 'layer'
+        bundle = os.path.join(directory, f"{key}.tar.gz")
+        if os.path.isfile(bundle):
+            staging = tempfile.mkdtemp(prefix=f"{key}-", dir=os.path.dirname(target))
+            try:
+                with tarfile.open(bundle) as archive:
+                    if hasattr(tarfile, 'data_filter'):
+                        archive.extractall(staging, filter='data')
+                    else:
+                        archive.extractall(staging)
+            except (tarfile.TarError, OSError, EOFError, zlib.error) as e:
+                logger.warning(f"cfn-bootstrap bundle {bundle} could not be extracted: {type(e).__name__}: {e}")
+                shutil.rmtree(staging, ignore_errors=True)
+                continue
+            if verify(staging, key):
+                shutil.rmtree(target, ignore_errors=True)
+                os.rename(staging, target)
+                return target, 'bundle'
+            shutil.rmtree(staging, ignore_errors=True)
+    return None, None
+
+
+def ensure_cfnbootstrap(key=None):
+    """
+    cfn-bootstrap install directory (bin/cfn-init), installed only when no verified artifact exists:
+    memory (warm invocation) > /tmp cache > layer / bundle > install script. Returns (directory, source, seconds).
+    """
+    started = time.perf_counter()
+    tarball = None
+    if key is None:
+        key, tarball = resolve_key()
+    target = os.path.join(CACHE_ROOT, key)
+    directory, source = _verified.get(key), 'memory'
+    if directory is None or not os.path.isfile(os.path.join(directory, 'bin', 'cfn-init')):
+        os.makedirs(CACHE_ROOT, exist_ok=True)
+        directory, source = (target, 'cache') if verify(target, key) else _from_prebuilt(key, target)
+    if directory is None:
+        shutil.rmtree(target, ignore_errors=True)
+        returncode = run_bash_script(setup_environment(target, key, tarball))
+        if returncode != 0:
+            raise Exception(f"cfn-bootstrap install failed with return code {returncode}")
+        write_manifest(target, key, round(time.perf_counter() - started, 1))
+        directory, source = target, 'install'
+    _verified[key] = directory
+    seconds = time.perf_counter() - started
+    logger.info(json.dumps({'cfnbootstrap': directory, 'key': key, 'source': source, 'seconds': round(seconds, 3)}))
+    return directory, source, seconds
+
+
+def build_bundle(output_directory, key=None):
+    """ Install (or reuse) and write <key>/ (layer layout) and <key>.tar.gz (bundle) to output_directory """
+    directory, _, _ = ensure_cfnbootstrap(key)
+    key = key or os.path.basename(directory)
+    os.makedirs(output_directory, exist_ok=True)
+    layer = os.path.join(output_directory, key)
+    shutil.rmtree(layer, ignore_errors=True)
+    shutil.copytree(directory, layer, symlinks=True)
+    with tarfile.open(os.path.join(output_directory, f"{key}.tar.gz"), 'w:gz') as archive:
+        for name in sorted(os.listdir(directory)):
+            archive.add(os.path.join(directory, name), arcname=name)
+    return layer
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='cfn-bootstrap install cache')
+    parser.add_argument('--bundle', help='write the layer directory and the bundle archive here')
+    args = parser.parse_args()
+    if args.bundle:
+        print(build_bundle(args.bundle))
+    else:
+        print(ensure_cfnbootstrap())
@@ -0,0 +1,103 @@
+"""
+api_worker HTTP modes against tools/stub_api.py (local server), the same items in every mode:
+
+- urlopen: a new connection per call, no cache (the worker before http_client)
+- pooled: http_client.Session, keep-alive connections reused across batches (warm invocations)
+- cached: pooled + ResponseCache (repeated items within max-age are not requested again)
+- fields: cached + projection on --fields, only those go back into the state payload
+- throttled: pooled, against a server limited to --rate requests per second (429s, retried with backoff)
+- limited: throttled + TokenBucket at --client-rate
+
+usage (from step_functions/ folder):
+python benchmarks/bench_api_worker.py [--items 2000] [--distinct 200] [--batch-size 100] [--latency-ms 20]
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'tools'), os.path.join(ROOT, 'functions', 'api_worker')]
+
+import app as api_worker  # noqa: E402
+import http_client  # noqa: E402
+from stub_api import StubApi  # noqa: E402
+
+
+def urlopen_fetch(item, timeout=5):
+    try:
+        with urllib.request.urlopen(api_worker.item_url(item), timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def run(mode, items, args):
+    with StubApi(latency_ms=args.latency_ms, max_age=args.max_age, rate=args.rate if mode in ('throttled', 'limited') else 0) as api:
+        api_worker.API_URL = api.url + '/volumes?q={name}'
+        session = None
+        if mode == 'urlopen':
+            fetch = urlopen_fetch
+        else:
+            session = http_client.Session(
+                timeout=5, pool_size=args.worker_concurrency,
+                cache=http_client.ResponseCache(args.cache_mb * 1024 * 1024) if mode in ('cached', 'fields') else None,
+                limiter=http_client.TokenBucket(args.client_rate) if mode == 'limited' else None)
+            fetch = functools.partial(api_worker.fetch, session=session)
+        fields = http_client.parse_fields(args.fields) if mode == 'fields' else None
+        started = time.perf_counter()
+        results = []
+        for start in range(0, len(items), args.batch_size):  # one warm invocation per batch
+            results += api_worker.process_batch(items[start:start + args.batch_size], fetch=fetch,
+                                                concurrency=args.worker_concurrency, fields=fields)
+        elapsed = time.perf_counter() - started
+        if session is not None:
+            session.close()
+        stats = dict(api.stats)
+    payload = len(json.dumps({'results': results}))
+    return {
+        'seconds': elapsed, 'failed': sum(1 for result in results if result['statusCode'] >= 400),
+        'requests': stats['requests'], 'connections': stats['connections'], 'not_modified': stats['not_modified'],
+        'throttled': stats['throttled'], 'served_mb': stats['bytes'] / 1024 / 1024,
+        'result_kb': payload / 1024, 'body_kb': sum(result.get('bytes', 0) for result in results) / 1024,
+        'sample': results[0].get('fields')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=200, help='distinct item names (the rest are repeats)')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--worker-concurrency', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--max-age', type=int, default=60)
+    parser.add_argument('--rate', type=int, default=100, help='server rate limit (limited mode)')
+    parser.add_argument('--client-rate', type=float, default=90, help='TokenBucket rate (limited mode)')
+    parser.add_argument('--cache-mb', type=int, default=8)
+    parser.add_argument('--fields', default='totalItems,items.0.volumeInfo.title')
+    parser.add_argument('--modes', nargs='+', default=['urlopen', 'pooled', 'cached', 'fields', 'throttled', 'limited'])
+    args = parser.parse_args()
+
+    items = [{'id': i, 'name': f"item{i % args.distinct}"} for i in range(args.items)]
+    print(f"{args.items} items ({args.distinct} distinct), batches of {args.batch_size}, worker concurrency "
+          f"{args.worker_concurrency}, API {args.latency_ms:.0f} ms")
+    print(f"{'mode':<8} {'seconds':>8} {'failed':>7} {'requests':>9} {'connections':>12} {'304s':>6} {'429s':>6} "
+          f"{'served MB':>10} {'result KB':>10}")
+    for mode in args.modes:
+        r = run(mode, items, args)
+        print(f"{mode:<8} {r['seconds']:>8.2f} {r['failed']:>7} {r['requests']:>9} {r['connections']:>12} "
+              f"{r['not_modified']:>6} {r['throttled']:>6} {r['served_mb']:>10.1f} {r['result_kb']:>10.1f}")
+        if mode == 'fields':
+            projected = r
+    if 'fields' in args.modes:
+        print(f"fields: {projected['result_kb']:,.1f} KB of results, {projected['body_kb']:,.1f} KB with the whole "
+              f"bodies; first item: {json.dumps(projected['sample'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+ParallelIterator per item (MapBatchSize=1, as before) versus batched (MapBatchSize=N), run offline with
+tools/asl_executor.py and the api_worker function code, against a simulated Lambda service and API:
+
+- Lambda: an execution environment per concurrent invocation, reused when free; a new one costs --cold-start-ms,
+  every invocation --invoke-ms; billed duration at 128 MB
+- API: --api-latency-ms per call, --api-rate calls per second, over it calls get a 429
+
+Cost per execution (us-east-1 list prices): Standard workflow state transitions, Lambda requests and GB-seconds.
+
+usage (from step_functions/ folder):
+python benchmarks/bench_map_batching.py [--items 2000] [--modes 1x40 10x8 50x4 100x2] [--worker-concurrency 5]
+(mode: <MapBatchSize>x<MapMaxConcurrency>)
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'tools'), os.path.join(ROOT, 'functions', 'api_worker')]
+
+import app as api_worker  # noqa: E402
+import asl_executor  # noqa: E402
+
+TRANSITION_PRICE = 0.000025  # per state transition, Standard workflows
+REQUEST_PRICE = 0.0000002  # per Lambda invocation
+GB_SECOND_PRICE = 0.0000166667
+MEMORY_GB = 0.125
+
+
+class SimulatedApi:
+    """ Fixed latency, calls over `rate` per second (1 s window) answered 429 right away """
+
+    def __init__(self, latency_ms, rate):
+        self.latency_ms = latency_ms
+        self.rate = rate
+        self.calls = 0
+        self.throttled = 0
+        self._window = (0, 0)  # (second, calls)
+        self._lock = threading.Lock()
+
+    def fetch(self, item):
+        with self._lock:
+            self.calls += 1
+            second = int(time.monotonic())
+            count = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, count)
+            if count > self.rate:
+                self.throttled += 1
+                return 429, b''
+        time.sleep(self.latency_ms / 1000)
+        return 200, b'x' * 2048
+
+
+class SimulatedLambda:
+    """ Task handler running the api_worker code in simulated execution environments """
+
+    def __init__(self, api, worker_concurrency, cold_start_ms, invoke_ms):
+        self.api = api
+        self.worker_concurrency = worker_concurrency
+        self.cold_start_ms = cold_start_ms
+        self.invoke_ms = invoke_ms
+        self.invocations = 0
+        self.cold_starts = 0
+        self.billed_ms = 0
+        self._free = 0  # idle warm environments
+        self._lock = threading.Lock()
+
+    def __call__(self, event, context):
+        with self._lock:
+            self.invocations += 1
+            cold = self._free == 0
+            if cold:
+                self.cold_starts += 1
+            else:
+                self._free -= 1
+        started = time.perf_counter()
+        time.sleep((self.invoke_ms + (self.cold_start_ms if cold else 0)) / 1000)
+        items = event['items'] if isinstance(event.get('items'), list) else [event]
+        results = api_worker.process_batch(items, fetch=self.api.fetch, concurrency=self.worker_concurrency)
+        with self._lock:
+            self.billed_ms += int((time.perf_counter() - started) * 1000) + 1
+            self._free += 1
+        return {'results': results, 'failed': sum(1 for result in results if result['statusCode'] >= 400)}
+
+
+def run(count, batch_size, map_concurrency, args):
+    api = SimulatedApi(args.api_latency_ms, args.api_rate)
+    worker = SimulatedLambda(api, args.worker_concurrency if batch_size > 1 else 1, args.cold_start_ms, args.invoke_ms)
+    machine = asl_executor.load(
+        os.path.join(ROOT, 'states', 'statemachine.asl.json'),
+        [f"ChildStepFunction={os.path.join(ROOT, 'states', 'child_statemachine.asl.json')}"],
+        handlers={'LambdaFunctionArn': worker},
+        values={'MapBatchSize': batch_size, 'MapMaxConcurrency': map_concurrency})
+    asl_executor.set_items(machine, count)
+    started = time.perf_counter()
+    output = machine.execute({})
+    elapsed = time.perf_counter() - started
+    failed = sum(batch['failed'] for batch in output['parallelResults'])
+    transitions = sum(len(state['seconds']) for state in machine.profile.states.values())
+    cost = (transitions * TRANSITION_PRICE + worker.invocations * REQUEST_PRICE
+            + worker.billed_ms / 1000 * MEMORY_GB * GB_SECOND_PRICE)
+    return {
+        'seconds': elapsed, 'invocations': worker.invocations, 'cold_starts': worker.cold_starts,
+        'throttled': api.throttled, 'failed': failed, 'transitions': transitions,
+        'gb_seconds': worker.billed_ms / 1000 * MEMORY_GB, 'cost': cost
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--modes', nargs='+', default=['1x40', '10x8', '50x4', '100x2'])
+    parser.add_argument('--worker-concurrency', type=int, default=5, help='WorkerConcurrency of batched invocations')
+    parser.add_argument('--api-latency-ms', type=float, default=50)
+    parser.add_argument('--api-rate', type=int, default=200, help='API calls per second before 429s')
+    parser.add_argument('--cold-start-ms', type=float, default=300)
+    parser.add_argument('--invoke-ms', type=float, default=15)
+    args = parser.parse_args()
+
+    print(f"{args.items} items, API {args.api_latency_ms:.0f} ms / {args.api_rate} calls/s, worker concurrency "
+          f"{args.worker_concurrency}, cold start {args.cold_start_ms:.0f} ms")
+    print(f"{'mode':>8} {'seconds':>8} {'invocations':>12} {'cold':>6} {'429s':>6} {'failed':>7} "
+          f"{'transitions':>12} {'GB-s':>8} {'$ / execution':>14}")
+    for mode in args.modes:
+        batch_size, map_concurrency = (int(value) for value in mode.split('x'))
+        r = run(args.items, batch_size, map_concurrency, args)
+        print(f"{mode:>8} {r['seconds']:>8.1f} {r['invocations']:>12} {r['cold_starts']:>6} {r['throttled']:>6} "
+              f"{r['failed']:>7} {r['transitions']:>12} {r['gb_seconds']:>8.1f} {r['cost']:>14.5f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Parent / child state machines (states/) run offline with tools/asl_executor.py, for growing item counts:
+execution time, largest payload between states, and where the 256 KB limit is hit.
+
+--handoff inline: statemachine.asl.json, the child returns the items in its output
+--handoff s3: statemachine_s3.asl.json, the child writes them to S3 (functions/manifest_writer, here a local
+  directory standing in for the bucket) and the distributed Map reads them from there
+
+usage (from step_functions/ folder):
+python benchmarks/bench_parent_child.py [--items 10 100 1000 2000 5000] [--task-latency-ms 50] [--batch-size 25]
+python benchmarks/bench_parent_child.py --handoff s3 --items 10000 100000 1000000 --batch-size 1000 --map-concurrency 40
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import asl_executor  # noqa: E402
+from local_s3 import LocalS3  # noqa: E402
+
+BUCKET = 'manifest-bucket'
+
+
+def function(name):
+    """ functions/<name>/app.py as a module (every function has an app.py) """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, 'functions', name, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def s3_machine(count, args, s3):
+    manifest_writer = function('manifest_writer')
+
+    def write_manifest(payload, context):
+        with contextlib.redirect_stdout(io.StringIO()):  # its log line
+            return manifest_writer.lambda_handler(dict(payload, Bucket=BUCKET), context, client=s3)
+
+    def call_api(payload, context):
+        if args.task_latency_ms:
+            time.sleep(args.task_latency_ms / 1000)
+        return {'results': [{'id': item['id'], 'statusCode': 200} for item in payload['items']], 'failed': 0}
+
+    machine = asl_executor.load(
+        os.path.join(ROOT, 'states', 'statemachine_s3.asl.json'),
+        [f"ChildStepFunction={os.path.join(ROOT, 'states', 'child_statemachine_s3.asl.json')}"],
+        handlers={'ManifestWriterArn': write_manifest, 'LambdaFunctionArn': call_api}, s3=s3,
+        values={'MapBatchSize': args.batch_size, 'MapMaxConcurrency': args.map_concurrency, 'ManifestBucket': BUCKET})
+    return machine, {'count': count}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 100, 1000, 2000, 5000])
+    parser.add_argument('--task-latency-ms', type=float, default=50)
+    parser.add_argument('--batch-size', type=int, default=25, help='MapBatchSize stack parameter (1: one item per task)')
+    parser.add_argument('--map-concurrency', type=int, default=10, help='MapMaxConcurrency stack parameter')
+    parser.add_argument('--handoff', choices=('inline', 's3'), default='inline')
+    parser.add_argument('--verbose', action='store_true', help='print the profile of each run')
+    args = parser.parse_args()
+
+    print(f"{'items':>8} {'status':<28} {'ms':>8} {'largest KB':>11} {'after state':<40} {'map in flight':>13}")
+    for count in args.items:
+        if args.handoff == 's3':
+            machine, execution_input = s3_machine(count, args, LocalS3(tempfile.mkdtemp(prefix='bench-s3-')))
+        else:
+            machine = asl_executor.load(
+                os.path.join(ROOT, 'states', 'statemachine.asl.json'),
+                [f"ChildStepFunction={os.path.join(ROOT, 'states', 'child_statemachine.asl.json')}"],
+                args.task_latency_ms, values={'MapBatchSize': args.batch_size, 'MapMaxConcurrency': args.map_concurrency})
+            asl_executor.set_items(machine, count)
+            execution_input = {}
+        started = time.perf_counter()
+        try:
+            machine.execute(execution_input)
+            status = 'SUCCEEDED'
+        except asl_executor.ExecutionFailed as failure:
+            status = failure.error
+        elapsed = (time.perf_counter() - started) * 1000
+        size, state = machine.profile.largest_payload
+        in_flight = max((stats['max_in_flight'] for stats in machine.profile.maps.values()), default=0)
+        print(f"{count:>8} {status:<28} {elapsed:>8,.0f} {size / 1024:>11,.1f} {state:<40} {in_flight:>13}")
+        if args.verbose:
+            print(machine.profile.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import random
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+API_URL = os.environ.get('ApiUrl', 'https://www.googleapis.com/books/v1/volumes?q={name}')  # {field} from the item
+CONCURRENCY = int(os.environ.get('WorkerConcurrency', '8'))  # API calls in flight per invocation
+TIMEOUT = float(os.environ.get('ApiTimeoutSeconds', '5'))
+MAX_BODY_BYTES = int(os.environ.get('MaxBodyBytes', '0'))  # response bytes kept per item (0: none, the size only)
+MAX_RETRIES = int(os.environ.get('MaxRetries', '4'))  # per item, on 429 / 5xx
+BASE_DELAY = float(os.environ.get('RetryBaseDelaySeconds', '0.2'))  # exponential backoff with full jitter
+RATE = float(os.environ.get('ApiRatePerSecond', '0'))  # client side limit per execution environment (0: none)
+CACHE_BYTES = int(os.environ.get('CacheMaxBytes', str(8 * 1024 * 1024)))  # response cache (0: no cache)
+FIELDS = http_client.parse_fields(os.environ.get('ProjectFields', ''))  # e.g. totalItems,items.*.volumeInfo.title
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# created once per execution environment: warm invocations reuse the connections and the cache
+SESSION = http_client.Session(
+    timeout=TIMEOUT, pool_size=max(1, CONCURRENCY),
+    cache=http_client.ResponseCache(CACHE_BYTES) if CACHE_BYTES else None,
+    limiter=http_client.TokenBucket(RATE) if RATE else None)
+
+
+def item_url(item):
+    return API_URL.format(**{key: urllib.parse.quote(str(value)) for key, value in item.items()})
+
+
+def fetch(item, session=None):
+    """ One API call for an item: (status code, body bytes), from the cache when still fresh """
+    response = (session or SESSION).get(item_url(item))
+    return response.status, response.body
+
+
+def process_item(item, fetch=fetch, sleep=time.sleep, fields=None):
+    """
+    Per item result, never raises: one failed item does not fail (and retry) the batch.
+    With `fields`, the JSON response is projected on them (http_client.project) into result['fields'],
+    or result['fields_error'] when the body is not JSON.
+    """
+    started = time.perf_counter()
+    result = {'id': item.get('id')}
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            status, body = fetch(item)
+            if status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            sleep(random.uniform(0, BASE_DELAY * 2 ** attempt))
+        result.update({'statusCode': status, 'bytes': len(body), 'attempts': attempt + 1})
+        if fields and status < 400:
+            try:
+                result['fields'] = http_client.project(body, fields)
+            except (ValueError, TypeError) as e:  # not JSON: the call itself succeeded, its status stays
+                result['fields_error'] = f"{type(e).__name__}: {e}"
+        if MAX_BODY_BYTES:
+            result['body'] = body[:MAX_BODY_BYTES].decode('utf-8', 'replace')
+    except Exception as e:
+        result.update({'statusCode': 500, 'error': f"{type(e).__name__}: {e}"})
+    result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def process_batch(items, fetch=fetch, concurrency=CONCURRENCY, fields=None):
+    if len(items) <= 1 or concurrency <= 1:
+        return [process_item(item, fetch, fields=fields) for item in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as pool:
+        return list(pool.map(lambda item: process_item(item, fetch, fields=fields), items))
+
+
+def lambda_handler(event, context):
+    """
+    Map iteration: {"items": [item, ...][, "fields": [...]]} (batch) or a single item (per item mode).
+    Returns {"results": [{"id", "statusCode", "bytes", "attempts", "ms"[, "fields" | "fields_error"][, "error"][, "body"]}],
+    "failed": n}. Only a summary per item (and the projected fields) goes back into the state machine payload
+    (256 KB limit).
+    """
+    batch = isinstance(event.get('items'), list)
+    items = event['items'] if batch else [event]
+    fields = event.get('fields', FIELDS) if batch else FIELDS
+    started = time.perf_counter()
+    requests, connections = SESSION.requests, SESSION.connections
+    results = process_batch(items, fields=fields)
+    failed = sum(1 for result in results if result['statusCode'] >= 400)
+    summary = {'items': len(items), 'failed': failed, 'ms': round((time.perf_counter() - started) * 1000, 1),
+               'requests': SESSION.requests - requests, 'connections': SESSION.connections - connections}
+    if SESSION.cache is not None:
+        summary.update({'cached': len(SESSION.cache), 'cache_hits': SESSION.cache.hits,
+                        'revalidated': SESSION.cache.revalidated})
+    print(json.dumps(summary))
+    return {'results': results, 'failed': failed}
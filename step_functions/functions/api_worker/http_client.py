@@ -0,0 +1,257 @@
+"""
+HTTP for the worker, kept at module level so warm invocations reuse it: keep-alive connections per host,
+an LRU response cache (Cache-Control max-age / no-store, ETag revalidation), a client side rate limiter,
+a timeout and retries on connection errors. Standard library only (no requests in the Lambda runtime).
+"""
+import http.client
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """ `rate` calls per second, bursts up to `burst`, shared by the worker threads """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = self.burst
+        self.updated = clock()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate
+                self.waited += wait_seconds
+            self.sleep(wait_seconds)
+
+
+class ResponseCache:
+    """
+    url -> (status, headers, body, expires, etag), least recently used first out once over `max_bytes`.
+    Fresh entries (max-age) are served without a request; stale ones with an ETag are revalidated.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def fresh(self, entry):
+        return entry['expires'] > self.clock()
+
+    def count(self, name):
+        """ hits | misses | revalidated, from the worker threads """
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def store(self, url, status, headers, body):
+        """ Keeps 200 responses that are cacheable (not no-store / private) and either fresh or with an ETag """
+        directives = cache_control(headers.get('Cache-Control', ''))
+        if status != 200 or 'no-store' in directives or 'private' in directives or len(body) > self.max_bytes:
+            return
+        max_age = 0 if 'no-cache' in directives else directives.get('max-age', 0)
+        etag = headers.get('ETag')
+        if max_age <= 0 and not etag:
+            return
+        entry = {'status': status, 'headers': headers, 'body': body, 'etag': etag, 'expires': self.clock() + max_age}
+        with self._lock:
+            previous = self._entries.pop(url, None)
+            if previous is not None:
+                self.size -= len(previous['body'])
+            self._entries[url] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted['body'])
+
+    def refresh(self, url, entry, headers):
+        """ 304: the cached body is still valid, for the new max-age """
+        directives = cache_control(headers.get('Cache-Control', '') or entry['headers'].get('Cache-Control', ''))
+        with self._lock:
+            entry['expires'] = self.clock() + (0 if 'no-cache' in directives else directives.get('max-age', 0))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def cache_control(value):
+    """ 'max-age=60, no-cache' -> {'max-age': 60, 'no-cache': True} """
+    directives = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().lower().partition('=')
+        if name == 'max-age' or name == 's-maxage':
+            try:
+                directives['max-age'] = int(argument.strip('"'))
+            except ValueError:
+                directives['max-age'] = 0
+        elif name:
+            directives[name] = True
+    return directives
+
+
+class Response:
+
+    def __init__(self, status, headers, body, source):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.source = source  # network | cache | revalidated
+
+
+class Session:
+    """
+    GET with pooled keep-alive connections (`pool_size` idle per host), an optional ResponseCache and
+    TokenBucket (taken for network requests only), `timeout` seconds per attempt and `retries` on connection
+    errors and timeouts. HTTP statuses are returned as they are: retrying 429 / 5xx is left to the caller.
+    """
+
+    def __init__(self, timeout=5.0, retries=2, base_delay=0.1, pool_size=8, cache=None, limiter=None,
+                 headers=None, sleep=time.sleep):
+        self.timeout = timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.pool_size = pool_size
+        self.cache = cache
+        self.limiter = limiter
+        self.headers = {'Accept': 'application/json', 'Accept-Encoding': 'identity', **(headers or {})}
+        self.sleep = sleep
+        self.requests = 0
+        self.connections = 0
+        self._idle = {}  # (scheme, host, port) -> [connection]
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and self.cache.fresh(entry):
+            self.cache.count('hits')
+            return Response(entry['status'], entry['headers'], entry['body'], 'cache')
+        headers = dict(self.headers)
+        if entry is not None and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        status, response_headers, body = self._request(url, headers)
+        if self.cache is None:
+            return Response(status, response_headers, body, 'network')
+        if status == 304 and entry is not None:
+            self.cache.count('revalidated')
+            self.cache.refresh(url, entry, response_headers)
+            return Response(entry['status'], entry['headers'], entry['body'], 'revalidated')
+        self.cache.count('misses')
+        self.cache.store(url, status, response_headers, body)
+        return Response(status, response_headers, body, 'network')
+
+    def _request(self, url, headers):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"unsupported url: {url}")
+        origin = (parts.scheme, parts.hostname, parts.port)
+        target = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            connection = self._connection(origin)
+            try:
+                connection.request('GET', target, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if attempt == self.retries:
+                    raise
+                self.sleep(random.uniform(0, self.base_delay * 2 ** attempt))
+                continue
+            with self._lock:
+                self.requests += 1
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(origin, connection)
+            return response.status, dict(response.getheaders()), body
+
+    def _connection(self, origin):
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop()
+            self.connections += 1
+        scheme, host, port = origin
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _release(self, origin, connection):
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+def parse_fields(value):
+    """ 'totalItems, items.*.volumeInfo.title' -> ['totalItems', 'items.*.volumeInfo.title'] """
+    return [field.strip() for field in re.split(r'[,\s]+', value or '') if field.strip()]
+
+
+def project(body, fields):
+    """
+    Only `fields` (dotted paths, `*` for every element of a list, digits for one) of a JSON body:
+    {'totalItems': 3, 'items.*.volumeInfo.title': ['a', 'b', 'c']}. Missing paths are left out.
+    """
+    document = json.loads(body) if isinstance(body, (bytes, str)) else body
+    projected = {}
+    for field in fields:
+        found, value = _select(document, field.split('.'))
+        if found:
+            projected[field] = value
+    return projected
+
+
+def _select(value, steps):
+    if not steps:
+        return True, value
+    step, rest = steps[0], steps[1:]
+    if step == '*':
+        if not isinstance(value, list):
+            return False, None
+        selected = [_select(element, rest) for element in value]
+        return True, [element for found, element in selected if found]
+    if isinstance(value, list) and step.isdigit():
+        index = int(step)
+        return _select(value[index], rest) if index < len(value) else (False, None)
+    if isinstance(value, dict) and step in value:
+        return _select(value[step], rest)
+    return False, None
@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+MANIFEST_BUCKET = os.environ.get('ManifestBucket', '')
+MANIFEST_PREFIX = os.environ.get('ManifestPrefix', 'manifests/')
+PART_BYTES = int(os.environ.get('PartBytes', str(8 * 1024 * 1024)))  # multipart part size (S3 minimum: 5 MB)
+
+_s3 = None
+
+
+def s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        _s3 = boto3.client('s3')
+    return _s3
+
+
+def generate_items(count):
+    """ The items the child state machine produced inline (PrepareOutput), for any count """
+    for i in range(1, count + 1):
+        yield {'id': i, 'name': f"item{i}"}
+
+
+def write_manifest(items, bucket, key, client=None, part_bytes=PART_BYTES):
+    """
+    Stream items to s3://bucket/key as one JSON array (the Map ItemReader InputType JSON), with a multipart
+    upload: memory stays at one part whatever the item count. Returns (items written, bytes).
+    """
+    client = client or s3_client()
+    upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType='application/json')['UploadId']
+    parts, buffer, buffered, count, size = [], [b'['], 1, 0, 1
+    try:
+        for item in items:
+            chunk = (b',' if count else b'') + json.dumps(item, separators=(',', ':')).encode('utf-8')
+            buffer.append(chunk)
+            buffered += len(chunk)
+            size += len(chunk)
+            count += 1
+            if buffered >= part_bytes:
+                parts.append(_upload_part(client, bucket, key, upload_id, len(parts) + 1, b''.join(buffer)))
+                buffer, buffered = [], 0
+        buffer.append(b']')
+        size += 1
+        parts.append(_upload_part(client, bucket, key, upload_id, len(parts) + 1, b''.join(buffer)))
+        client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return count, size
+
+
+def _upload_part(client, bucket, key, upload_id, number, body):
+    etag = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body)['ETag']
+    return {'ETag': etag, 'PartNumber': number}
+
+
+def lambda_handler(event, context, client=None):
+    """
+    Child state machine (S3 handoff): writes the items to the manifest bucket and returns only a reference.
+    Input: {"Execution": name, "Payload": {"count": n}} (count defaults to 3, as the inline child).
+    Output: {"Bucket", "Key", "Count", "Bytes"}
+    """
+    started = time.perf_counter()
+    count = int((event.get('Payload') or {}).get('count', 3))
+    bucket = event.get('Bucket') or MANIFEST_BUCKET
+    if not bucket:
+        raise Exception('ManifestBucket is not set')
+    key = f"{MANIFEST_PREFIX}{event.get('Execution', 'manual')}/items.json"
+    written, size = write_manifest(generate_items(count), bucket, key, client)
+    print(json.dumps({'key': key, 'items': written, 'bytes': size, 'ms': round((time.perf_counter() - started) * 1000)}))
+    return {'Bucket': bucket, 'Key': key, 'Count': written, 'Bytes': size}
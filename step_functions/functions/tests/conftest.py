@@ -0,0 +1,32 @@
+# api_worker modules import each other top level (as in the Lambda package), the stub API is a local tool
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT, 'functions', 'api_worker'), os.path.join(ROOT, 'tools')]
+
+from local_s3 import LocalS3  # noqa: E402
+from stub_api import StubApi  # noqa: E402
+
+
+@pytest.fixture
+def api():
+    with StubApi(latency_ms=0, max_age=60) as stub:
+        yield stub
+
+
+@pytest.fixture
+def s3(tmp_path):
+    return LocalS3(str(tmp_path))
+
+
+@pytest.fixture(scope='session')
+def manifest_writer():
+    """ functions/manifest_writer/app.py, by path: its module name clashes with the api_worker app """
+    spec = importlib.util.spec_from_file_location('manifest_writer', os.path.join(ROOT, 'functions', 'manifest_writer', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
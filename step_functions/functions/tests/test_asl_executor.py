@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from asl_executor import ExecutionFailed, StateMachine, get_path, intrinsic, set_path
+
+
+def machine(states, start=None, **kwargs):
+    return StateMachine({'StartAt': start or next(iter(states)), 'States': states}, **kwargs)
+
+
+def test_paths():
+    data = {'a': {'b': [{'c': 1}, {'c': 2}]}, 'dotted.key': 'x'}
+    assert get_path('$', data) is data
+    assert get_path('$.a.b[1].c', data) == 2
+    assert get_path("$['dotted.key']", data) == 'x'
+    assert get_path('$$.Execution.Name', data, {'Execution': {'Name': 'run'}}) == 'run'
+    with pytest.raises(ExecutionFailed) as failure:
+        get_path('$.a.missing', data)
+    assert failure.value.error == 'States.Runtime'
+
+    assert set_path('$', data, 1) == 1
+    updated = set_path('$.a.new.deep', data, 1)
+    assert updated['a']['new'] == {'deep': 1} and 'new' not in data['a']  # a copy, the input is unchanged
+    with pytest.raises(ExecutionFailed) as failure:
+        set_path('$.dotted.key', {'dotted': 'a string'}, 1)
+    assert failure.value.error == 'States.ResultPathMatchFailure'
+
+
+def test_data_flow():
+    sm = machine({
+        'Call': {
+            'Type': 'Task', 'Resource': 'echo', 'InputPath': '$.request',
+            'Parameters': {'id.$': '$.id', 'execution.$': '$$.Execution.Name', 'fixed': 'value'},
+            'ResultSelector': {'echoed.$': '$.id'},
+            'ResultPath': '$.result', 'Next': 'Keep'
+        },
+        'Keep': {'Type': 'Pass', 'Result': 'ignored', 'ResultPath': None, 'Next': 'Select'},
+        'Select': {'Type': 'Pass', 'OutputPath': '$.result', 'End': True}
+    }, handlers={'echo': lambda payload, context: payload})
+    assert sm.execute({'request': {'id': 7, 'other': 1}}, name='run') == {'echoed': 7}
+
+    calls = []
+    sm.handlers['echo'] = lambda payload, context: calls.append(payload) or payload
+    sm.execute({'request': {'id': 7}}, name='run')
+    assert calls == [{'id': 7, 'execution': 'run', 'fixed': 'value'}]
+
+
+def test_intrinsic_functions():
+    data = {'name': 'x', 'text': '{"a": [1, 2]}', 'items': [1, 2, 2, 3]}
+    assert intrinsic("States.Format('hello {} \\'{}\\'', $.name, 3)", data, {}) == "hello x '3'"
+    assert intrinsic('States.StringToJson($.text)', data, {}) == {'a': [1, 2]}
+    assert intrinsic('States.ArrayLength(States.ArrayUnique($.items))', data, {}) == 3  # nested
+    assert intrinsic("States.Array($.name, 1, true, null)", data, {}) == ['x', 1, True, None]
+    assert intrinsic("States.Hash('abc', 'SHA-256')", data, {}).startswith('ba7816bf')
+    for expression in ("States.Format('{} {}', 1)", 'States.Nope(1)', 'States.StringToJson($.name)'):
+        with pytest.raises(ExecutionFailed) as failure:
+            intrinsic(expression, data, {})
+        assert failure.value.error == 'States.IntrinsicFailure'
+
+
+def test_retry_then_succeed():
+    attempts = []
+
+    def flaky(payload, context):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError('unavailable')
+        return 'ok'
+
+    sm = machine({'Call': {
+        'Type': 'Task', 'Resource': 'flaky', 'End': True,
+        'Retry': [{'ErrorEquals': ['States.Timeout']}, {'ErrorEquals': ['States.TaskFailed'], 'MaxAttempts': 2}]
+    }}, handlers={'flaky': flaky})
+    assert sm.execute({}) == 'ok' and len(attempts) == 3
+
+    attempts.clear()
+    sm.definition['States']['Call']['Retry'][1]['MaxAttempts'] = 1
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute({})
+    assert (failure.value.error, len(attempts)) == ('ConnectionError', 2)
+
+
+def test_catch_routes_the_error():
+    def fail(payload, context):
+        raise ValueError('bad input')
+
+    sm = machine({
+        'Call': {'Type': 'Task', 'Resource': 'fail', 'Next': 'Done',
+                 'Catch': [{'ErrorEquals': ['States.Timeout'], 'Next': 'Done'},
+                           {'ErrorEquals': ['States.ALL'], 'ResultPath': '$.error', 'Next': 'Handled'}]},
+        'Handled': {'Type': 'Fail', 'Error': 'Handled', 'Cause': 'caught'},
+        'Done': {'Type': 'Succeed'}
+    }, handlers={'fail': fail})
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute({'keep': 1})
+    assert (failure.value.error, failure.value.cause) == ('Handled', 'caught')
+
+    sm.definition['States']['Handled'] = {'Type': 'Pass', 'End': True}
+    assert sm.execute({'keep': 1}) == {'keep': 1, 'error': {'Error': 'ValueError', 'Cause': 'bad input'}}
+
+
+def test_map_max_concurrency():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def slow(payload, context):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return payload * 2
+
+    sm = machine({'Fan': {
+        'Type': 'Map', 'MaxConcurrency': 3, 'End': True,
+        'Iterator': {'StartAt': 'Double', 'States': {'Double': {'Type': 'Task', 'Resource': 'slow', 'End': True}}}
+    }}, handlers={'slow': slow})
+    assert sm.execute(list(range(12))) == [i * 2 for i in range(12)]  # in item order
+    assert peak[0] == 3
+    assert sm.profile.maps['main/Fan'] == {'runs': 1, 'items': 12, 'max_in_flight': 3, 'limit': 3}
+
+
+def test_inline_map_iteration_failure_fails_the_map():
+    def fail_on_two(payload, context):
+        if payload == 2:
+            raise KeyError('two')
+        return payload
+
+    sm = machine({'Fan': {
+        'Type': 'Map', 'End': True,
+        'Iterator': {'StartAt': 'Call', 'States': {'Call': {'Type': 'Task', 'Resource': 'call', 'End': True}}}
+    }}, handlers={'call': fail_on_two})
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute([1, 2, 3])
+    assert failure.value.error == 'KeyError'
+
+
+def test_data_limit_exceeded():
+    sm = machine({'Big': {'Type': 'Pass', 'Result': 'x' * 2000, 'End': True}}, payload_limit=1024)
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute({})
+    assert failure.value.error == 'States.DataLimitExceeded'
+    assert sm.profile.largest_payload == (2002, 'main/Big')
+
+    sm.definition['States']['Big']['Result'] = 'x' * 1000
+    assert len(sm.execute({})) == 1000
+
+
+def test_start_execution_sync_output():
+    child = machine({'Done': {'Type': 'Pass', 'Result': {'items': [1]}, 'End': True}}, name='child')
+    arn = 'arn:aws:states:local:000000000000:stateMachine:child'
+    task = {'Type': 'Task', 'Resource': 'arn:aws:states:::states:startExecution.sync',
+            'Parameters': {'StateMachineArn': arn, 'Input': {'Payload.$': '$'}}, 'End': True}
+    sm = machine({'Start': task}, machines={arn: child})
+    result = sm.execute({})
+    assert (result['Status'], result['Output']) == ('SUCCEEDED', '{"items":[1]}')  # a JSON string
+
+    task['Resource'] += ':2'
+    assert sm.execute({})['Output'] == {'items': [1]}
@@ -0,0 +1,143 @@
+import json
+import threading
+
+import pytest
+
+import app
+import http_client
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class BrokenConnection:
+    """ An idle keep-alive connection the server has closed meanwhile """
+
+    def __init__(self):
+        self.closed = False
+
+    def request(self, *args, **kwargs):
+        raise ConnectionResetError('connection reset by peer')
+
+    def close(self):
+        self.closed = True
+
+
+def test_keep_alive_connections_are_reused(api):
+    session = http_client.Session()
+    for i in range(5):
+        assert session.get(f"{api.url}/volumes?q=item{i}").status == 200
+    session.close()
+    assert (session.requests, session.connections, api.stats['connections']) == (5, 1, 1)
+
+
+def test_fresh_then_revalidated_then_refetched(api):
+    clock = Clock()
+    session = http_client.Session(cache=http_client.ResponseCache(clock=clock))
+    url = f"{api.url}/volumes?q=cached"
+    assert session.get(url).source == 'network'
+    assert session.get(url).source == 'cache' and api.stats['requests'] == 1  # within max-age: no request
+
+    clock.now += 61  # stale: If-None-Match, 304, cached body kept
+    response = session.get(url)
+    assert (response.source, response.status, api.stats['not_modified']) == ('revalidated', 200, 1)
+    assert json.loads(response.body)['query'] == 'cached'
+    assert session.get(url).source == 'cache'
+
+    api.items += 1  # the body (and etag) changed: full response again
+    clock.now += 61
+    assert session.get(url).source == 'network' and len(json.loads(session.get(url).body)['items']) == api.items
+
+
+def test_cache_store_rules_and_lru_bytes():
+    cache = http_client.ResponseCache(max_bytes=10)
+    cache.store('no-store', 200, {'Cache-Control': 'no-store', 'ETag': '"a"'}, b'1')
+    cache.store('error', 500, {'Cache-Control': 'max-age=60'}, b'1')
+    cache.store('no-validator', 200, {'Cache-Control': 'no-cache'}, b'1')
+    assert len(cache) == 0
+
+    for name in ('a', 'b', 'c'):
+        cache.store(name, 200, {'Cache-Control': 'max-age=60'}, b'1234')
+    assert cache.get('a') is None and cache.get('b') is not None and cache.size == 8
+    assert http_client.cache_control('max-age="30", No-Cache, private') == {'max-age': 30, 'no-cache': True,
+                                                                            'private': True}
+
+
+def test_connection_errors_are_retried_on_a_new_connection(api):
+    sleeps = []
+    session = http_client.Session(retries=2, sleep=sleeps.append)
+    broken = BrokenConnection()
+    session._idle[('http', '127.0.0.1', int(api.url.rsplit(':', 1)[1]))] = [broken]
+    assert session.get(f"{api.url}/volumes?q=retry").status == 200
+    assert broken.closed and len(sleeps) == 1 and session.requests == 1
+
+
+def test_connection_errors_raise_after_retries():
+    sleeps = []
+    session = http_client.Session(timeout=1, retries=2, base_delay=0.01, sleep=sleeps.append)
+    with pytest.raises(OSError):
+        session.get('http://127.0.0.1:9/unreachable')  # discard port: refused
+    assert len(sleeps) == 2 and session.requests == 0
+
+
+def test_token_bucket_spaces_calls():
+    clock = Clock()
+    bucket = http_client.TokenBucket(4, burst=2, clock=clock, sleep=clock.sleep)
+    for _ in range(6):
+        bucket.acquire()
+    assert clock.now == 1.0 and bucket.waited == 1.0  # 2 in the burst, then 4 per second
+
+
+def test_status_retries_and_failures_per_item():
+    statuses = iter([429, 503, 200])
+    sleeps = []
+    result = app.process_item({'id': 1}, fetch=lambda item: (next(statuses), b'{"totalItems": 3}'),
+                              sleep=sleeps.append, fields=['totalItems'])
+    assert (result['statusCode'], result['attempts'], result['fields'], len(sleeps)) == (200, 3, {'totalItems': 3}, 2)
+
+    def unreachable(item):
+        raise ConnectionRefusedError('refused')
+
+    assert app.process_item({'id': 2}, fetch=unreachable)['statusCode'] == 500
+
+
+def test_project_fields():
+    body = json.dumps({'totalItems': 2, 'items': [{'volumeInfo': {'title': 'a'}}, {'volumeInfo': {}}]})
+    fields = http_client.parse_fields('totalItems, items.*.volumeInfo.title items.0.volumeInfo.title missing.path')
+    assert http_client.project(body, fields) == {'totalItems': 2, 'items.*.volumeInfo.title': ['a'],
+                                                 'items.0.volumeInfo.title': 'a'}
+
+
+def test_non_json_body_keeps_the_status():
+    result = app.process_item({'id': 1}, fetch=lambda item: (200, b'<html>maintenance</html>'), fields=['totalItems'])
+    assert result['statusCode'] == 200 and 'fields' not in result
+    assert result['fields_error'].startswith('JSONDecodeError')
+
+
+def test_cache_counters_from_concurrent_workers(api):
+    session = http_client.Session(cache=http_client.ResponseCache(), pool_size=8)
+    url = f"{api.url}/volumes?q=shared"
+    session.get(url)
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        for _ in range(500):
+            session.get(url)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (session.cache.hits, session.cache.misses) == (4000, 1)
+
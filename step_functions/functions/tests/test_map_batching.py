@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+import pytest
+
+import asl_executor
+from asl_executor import ExecutionFailed, StateMachine, intrinsic
+
+STATES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'states')
+
+
+def test_array_partition():
+    data = {'items': list(range(7))}
+    assert intrinsic('States.ArrayPartition($.items, 3)', data, {}) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert intrinsic('States.ArrayPartition($.items, 10)', data, {}) == [list(range(7))]
+    assert intrinsic("States.ArrayPartition($.items, States.StringToJson('1'))", data, {}) == [[i] for i in range(7)]
+    assert intrinsic('States.ArrayPartition(States.Array(), 2)', data, {}) == []
+    with pytest.raises(ExecutionFailed) as failure:
+        intrinsic('States.ArrayPartition($.items, 0)', data, {})
+    assert failure.value.error == 'States.IntrinsicFailure'
+
+
+def test_max_concurrency_path():
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def slow(payload, context):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return payload
+
+    sm = StateMachine({'StartAt': 'Fan', 'States': {'Fan': {
+        'Type': 'Map', 'ItemsPath': '$.items', 'MaxConcurrencyPath': '$.limit', 'End': True,
+        'ItemProcessor': {'StartAt': 'Call', 'States': {'Call': {'Type': 'Task', 'Resource': 'slow', 'End': True}}}
+    }}}, handlers={'slow': slow})
+    assert sm.execute({'items': list(range(8)), 'limit': 2}) == list(range(8))
+    assert peak[0] == 2 and sm.profile.maps['main/Fan']['limit'] == 2
+
+    for limit in ('2', -1):
+        with pytest.raises(ExecutionFailed) as failure:
+            sm.execute({'items': [1], 'limit': limit})
+        assert failure.value.error == 'States.Runtime'
+
+
+def test_parent_definition_batches_the_child_items():
+    batches = []
+
+    def worker(payload, context):
+        batches.append(payload)
+        return {'results': [{'id': item['id'], 'statusCode': 200} for item in payload['items']], 'failed': 0}
+
+    machine = asl_executor.load(
+        os.path.join(STATES, 'statemachine.asl.json'),
+        [f"ChildStepFunction={os.path.join(STATES, 'child_statemachine.asl.json')}"],
+        handlers={'LambdaFunctionArn': worker}, values={'MapBatchSize': 3, 'MapMaxConcurrency': 2})
+    asl_executor.set_items(machine, 7)
+    output = machine.execute({})
+
+    assert sorted(len(batch['items']) for batch in batches) == [1, 3, 3]
+    assert sorted(batch['batch'] for batch in batches) == [0, 1, 2]
+    assert [len(result['results']) for result in output['parallelResults']] == [3, 3, 1]
+    assert 'ParsedChildExecutionResult' not in output and 'ChildExecutionResult' not in output  # dropped by BatchItems
+    stats = machine.profile.maps['statemachine/ParallelIterator']
+    assert (stats['limit'], stats['items']) == (2, 3) and stats['max_in_flight'] <= 2
@@ -0,0 +1,171 @@
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+import asl_executor
+from asl_executor import ExecutionFailed, StateMachine
+
+STATES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'states')
+BUCKET = 'manifest-bucket'
+
+
+def read_json(s3, key, bucket=BUCKET):
+    with s3.get_object(Bucket=bucket, Key=key)['Body'] as body:
+        return json.load(body)
+
+
+def items(count):
+    return [{'id': i} for i in range(1, count + 1)]
+
+
+@pytest.mark.parametrize('count, part_bytes, parts', [
+    (1, 9, 2),  # '[{"id":1}' fills the first part exactly: the last part is only ']'
+    (3, 9, 4),
+    (3, 10, 2),
+    (50, 64, 8),
+    (50, 8 * 1024 * 1024, 1),
+])
+def test_write_manifest_multipart(manifest_writer, s3, count, part_bytes, parts):
+    written, size = manifest_writer.write_manifest(items(count), BUCKET, 'm/items.json', s3, part_bytes=part_bytes)
+    assert read_json(s3, 'm/items.json') == items(count)
+    assert (written, size) == (count, s3.get_object(Bucket=BUCKET, Key='m/items.json')['ContentLength'])
+    assert s3.requests['UploadPart'] == parts and s3.requests['CompleteMultipartUpload'] == 1
+
+
+def test_write_manifest_empty(manifest_writer, s3):
+    assert manifest_writer.write_manifest([], BUCKET, 'm/items.json', s3, part_bytes=1) == (0, 2)
+    assert read_json(s3, 'm/items.json') == []
+    assert s3.requests['UploadPart'] == 1
+
+
+def test_write_manifest_aborts_on_failure(manifest_writer, s3):
+    def failing():
+        yield from items(10)
+        raise RuntimeError('generator failed')
+
+    with pytest.raises(RuntimeError):
+        manifest_writer.write_manifest(failing(), BUCKET, 'm/items.json', s3, part_bytes=16)
+    assert 'CompleteMultipartUpload' not in s3.requests
+    assert s3.list_objects_v2(Bucket=BUCKET)['KeyCount'] == 0 and not s3._uploads
+    assert [name for name in os.listdir(s3.directory) if name.startswith('part-')] == []
+
+
+def distributed_map(reader=None, batcher=None, writer=None, **fields):
+    state = {'Type': 'Map', 'End': True, 'ItemProcessor': {
+        'ProcessorConfig': {'Mode': 'DISTRIBUTED', 'ExecutionType': 'EXPRESS'},
+        'StartAt': 'Call', 'States': {'Call': {'Type': 'Task', 'Resource': 'call', 'End': True}}}}
+    for name, value in (('ItemReader', reader), ('ItemBatcher', batcher), ('ResultWriter', writer)):
+        if value is not None:
+            state[name] = value
+    state.update(fields)
+    return {'StartAt': 'Fan', 'States': {'Fan': state}}
+
+
+def reader(key, input_type='JSON', **config):
+    return {'Resource': 'arn:aws:states:::s3:getObject', 'ReaderConfig': dict(config, InputType=input_type),
+            'Parameters': {'Bucket': BUCKET, 'Key.$': key}}
+
+
+@pytest.mark.parametrize('input_type, body', [
+    ('JSON', json.dumps(items(5))),
+    ('JSONL', '\n'.join(json.dumps(item) for item in items(5)) + '\n'),
+])
+def test_item_reader(s3, input_type, body):
+    s3.put_object(Bucket=BUCKET, Key='in/items', Body=body)
+    sm = StateMachine(distributed_map(reader('$.key', input_type)), handlers={'call': lambda p, c: p['id']}, s3=s3)
+    assert sm.execute({'key': 'in/items'}) == [1, 2, 3, 4, 5]
+
+    sm.definition['States']['Fan']['ItemReader']['ReaderConfig']['MaxItemsPath'] = '$.max'
+    assert sm.execute({'key': 'in/items', 'max': 2}) == [1, 2]
+
+
+def test_item_reader_csv_and_list_objects(s3):
+    s3.put_object(Bucket=BUCKET, Key='in/items.csv', Body='id,name\n1,a\n2,b\n')
+    sm = StateMachine(distributed_map(reader('$.key', 'CSV', CSVHeaderLocation='FIRST_ROW')),
+                      handlers={'call': lambda p, c: p}, s3=s3)
+    assert sm.execute({'key': 'in/items.csv'}) == [{'id': '1', 'name': 'a'}, {'id': '2', 'name': 'b'}]
+
+    listing = {'Resource': 'arn:aws:states:::s3:listObjectsV2', 'Parameters': {'Bucket': BUCKET, 'Prefix': 'in/'}}
+    sm.definition['States']['Fan']['ItemReader'] = listing
+    sm.handlers['call'] = lambda p, c: p['Key']
+    assert sm.execute({}) == ['in/items.csv']
+
+
+def test_item_reader_rejects_a_json_object(s3):
+    s3.put_object(Bucket=BUCKET, Key='in/items', Body='{"items": []}')
+    sm = StateMachine(distributed_map(reader('$.key')), handlers={'call': lambda p, c: p}, s3=s3)
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute({'key': 'in/items'})
+    assert failure.value.error == 'States.ItemReaderFailed'
+
+
+def test_item_batcher(s3):
+    s3.put_object(Bucket=BUCKET, Key='in/items', Body=json.dumps(items(10)))
+    batcher = {'MaxItemsPerBatchPath': '$.size', 'BatchInput': {'run.$': '$.run'}}
+    sm = StateMachine(distributed_map(reader('$.key'), batcher), handlers={'call': lambda p, c: p}, s3=s3)
+    batches = sm.execute({'key': 'in/items', 'size': 4, 'run': 'r1'})
+    assert [len(batch['Items']) for batch in batches] == [4, 4, 2]
+    assert [item for batch in batches for item in batch['Items']] == items(10)
+    assert {batch['BatchInput']['run'] for batch in batches} == {'r1'}
+
+    del batcher['MaxItemsPerBatchPath']
+    batcher['MaxInputBytesPerBatch'] = 40  # '{"id":1}' is 8 bytes, plus a separator: 4 items per batch
+    assert [len(batch['Items']) for batch in sm.execute({'key': 'in/items', 'run': 'r1'})] == [4, 4, 2]
+
+
+def test_result_writer_and_tolerated_failures(s3):
+    def call(payload, context):
+        if payload['id'] % 5 == 0:
+            raise ValueError(f"item {payload['id']}")
+        return payload['id']
+
+    s3.put_object(Bucket=BUCKET, Key='in/items', Body=json.dumps(items(10)))
+    writer = {'Resource': 'arn:aws:states:::s3:putObject', 'Parameters': {'Bucket': BUCKET, 'Prefix': 'results'}}
+    sm = StateMachine(distributed_map(reader('$.key'), writer=writer, ToleratedFailureCount=2),
+                      handlers={'call': call}, s3=s3)
+    result = sm.execute({'key': 'in/items'})
+
+    assert result['ResultWriterDetails']['Bucket'] == BUCKET
+    manifest = read_json(s3, result['ResultWriterDetails']['Key'])
+    assert manifest['MapRunArn'] == result['MapRunArn']
+    succeeded = read_json(s3, manifest['ResultFiles']['SUCCEEDED'][0]['Key'])
+    failed = read_json(s3, manifest['ResultFiles']['FAILED'][0]['Key'])
+    assert [json.loads(r['Output']) for r in succeeded] == [1, 2, 3, 4, 6, 7, 8, 9]
+    assert [json.loads(r['Input'])['id'] for r in failed] == [5, 10]
+    assert json.loads(failed[0]['Error']) == {'Error': 'ValueError', 'Cause': 'item 5'}
+
+    sm.definition['States']['Fan']['ToleratedFailureCount'] = 1
+    with pytest.raises(ExecutionFailed) as failure:
+        sm.execute({'key': 'in/items'})
+    assert failure.value.error == 'States.ExceedToleratedFailureThreshold'
+
+
+def test_s3_handoff_definitions(manifest_writer, s3):
+    batches = []
+
+    def write(payload, context):
+        with contextlib.redirect_stdout(io.StringIO()):  # its log line
+            return manifest_writer.lambda_handler(dict(payload, Bucket=BUCKET), context, client=s3)
+
+    def call_api(payload, context):
+        batches.append(len(payload['items']))
+        return {'results': [{'id': item['id'], 'statusCode': 200} for item in payload['items']], 'failed': 0}
+
+    machine = asl_executor.load(
+        os.path.join(STATES, 'statemachine_s3.asl.json'),
+        [f"ChildStepFunction={os.path.join(STATES, 'child_statemachine_s3.asl.json')}"],
+        handlers={'ManifestWriterArn': write, 'LambdaFunctionArn': call_api}, s3=s3,
+        values={'MapBatchSize': 1000, 'MapMaxConcurrency': 4, 'ManifestBucket': BUCKET})
+    output = machine.execute({'count': 2500}, name='run')
+
+    assert output['ChildExecutionResult']['Manifest']['Count'] == 2500
+    assert read_json(s3, output['ChildExecutionResult']['Manifest']['Key'])[-1] == {'id': 2500, 'name': 'item2500'}
+    assert sorted(batches) == [500, 1000, 1000]
+    manifest = read_json(s3, output['parallelResults']['ResultWriterDetails']['Key'])
+    assert manifest['ResultFiles']['FAILED'] == [] and len(manifest['ResultFiles']['SUCCEEDED']) == 1
+    # the parent state holds references only, whatever the item count
+    assert max(machine.profile.states[f"statemachine_s3/{name}"]['bytes']
+               for name in ('InvokeChildStateMachine', 'ParallelIterator')) < 4096
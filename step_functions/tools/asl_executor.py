@@ -0,0 +1,674 @@
+"""
+Offline Step Functions interpreter for the definitions in states/, to see how they behave without deploying.
+
+States: Pass, Task, Map (inline and distributed: ItemReader, ItemBatcher, ResultWriter, tolerated failures),
+Succeed, Fail, Wait. Data flow: InputPath, Parameters, ResultSelector,
+ResultPath, OutputPath, with JSONPath references ($ and $$ context object) and intrinsic functions
+(States.StringToJson, States.Format, States.ArrayPartition, ...). Retry and Catch on Task and Map.
+
+Tasks run Python handlers registered per resource (the value substituted for ${LambdaFunctionArn}, or
+an ARN). arn:aws:states:::states:startExecution.sync runs the child definition registered under its
+StateMachineArn in process, returning its output as a JSON string like the service (.sync:2: as JSON).
+
+Profile: latency per state, Map fan-out (items, highest concurrency reached) and payload size after
+each state; outputs over the 256 KB limit fail with States.DataLimitExceeded, like the service.
+
+usage (from step_functions/ folder):
+python tools/asl_executor.py states/statemachine.asl.json --machine ChildStepFunction=states/child_statemachine.asl.json
+    --set MapBatchSize=25 --set MapMaxConcurrency=10 [--input '{}'] [--task-latency-ms 100] [--items 1000]
+"""
+import argparse
+import base64
+import collections
+import contextlib
+import copy
+import csv
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PAYLOAD_LIMIT = 256 * 1024  # bytes, state input / output
+MAP_CONCURRENCY = 40  # inline Map iterations in flight when MaxConcurrency is 0 (unset)
+START_EXECUTION = 'arn:aws:states:::states:startExecution'
+LAMBDA_INVOKE = 'arn:aws:states:::lambda:invoke'
+LOCAL_ARN = 'arn:aws:states:local:000000000000:stateMachine:'
+
+
+class ExecutionFailed(Exception):
+    """ A state machine error (States.TaskFailed, States.DataLimitExceeded, a Fail state, ...) """
+
+    def __init__(self, error, cause=''):
+        super().__init__(f"{error}: {cause}" if cause else error)
+        self.error = error
+        self.cause = cause
+
+
+def dumps(data):
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+def payload_size(data):
+    return len(dumps(data).encode('utf-8'))
+
+
+############ PATHS ##############
+
+_PATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(\d+)\]|\['([^']*)'\]|\[\"([^\"]*)\"\]")
+
+
+def _steps(path):
+    if path.startswith('$$'):
+        root, rest = 'context', path[2:]
+    elif path.startswith('$'):
+        root, rest = 'data', path[1:]
+    else:
+        raise ExecutionFailed('States.Runtime', f"invalid path {path}")
+    steps, position = [], 0
+    while position < len(rest):
+        match = _PATH_TOKEN.match(rest, position)
+        if match is None:
+            raise ExecutionFailed('States.Runtime', f"unsupported path {path}")
+        name, index, quoted, double_quoted = match.groups()
+        steps.append(int(index) if index is not None else next(s for s in (name, quoted, double_quoted) if s is not None))
+        position = match.end()
+    return root, steps
+
+
+def get_path(path, data, context=None):
+    root, steps = _steps(path)
+    value = context if root == 'context' else data
+    for step in steps:
+        try:
+            value = value[step]
+        except (KeyError, IndexError, TypeError):
+            raise ExecutionFailed('States.Runtime', f"path {path} not found in the state input")
+    return value
+
+
+def set_path(path, data, value):
+    """ ResultPath: a copy of data with value at path ($: value replaces data) """
+    _, steps = _steps(path)
+    if not steps:
+        return value
+    data = copy.deepcopy(data) if isinstance(data, (dict, list)) else {}
+    target = data
+    for step in steps[:-1]:
+        if not isinstance(target, dict):
+            raise ExecutionFailed('States.ResultPathMatchFailure', f"{path} does not match the state input")
+        target = target.setdefault(step, {})
+    if not isinstance(target, (dict, list)):
+        raise ExecutionFailed('States.ResultPathMatchFailure', f"{path} does not match the state input")
+    target[steps[-1]] = value
+    return data
+
+
+############ INTRINSIC FUNCTIONS ##############
+
+def _split_arguments(text):
+    arguments, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        c = text[i]
+        if quoted:
+            if c == '\\':
+                i += 1
+            elif c == "'":
+                quoted = False
+        elif c == "'":
+            quoted = True
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            arguments.append(text[start:i].strip())
+            start = i + 1
+        i += 1
+    if text.strip():
+        arguments.append(text[start:].strip())
+    return arguments
+
+
+def _argument(text, data, context):
+    if text.startswith("'") and text.endswith("'"):
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    if text.startswith('$'):
+        return get_path(text, data, context)
+    if text.startswith('States.'):
+        return intrinsic(text, data, context)
+    return json.loads(text)  # number, true, false, null
+
+
+def _format(template, *values):
+    parts = re.split(r"(?<!\\)\{\}", template)
+    if len(parts) - 1 != len(values):
+        raise ExecutionFailed('States.IntrinsicFailure', f"States.Format: {len(parts) - 1} placeholders, {len(values)} values")
+    text = parts[0]
+    for value, part in zip(values, parts[1:]):
+        text += (value if isinstance(value, str) else dumps(value)) + part
+    return text.replace('\\{', '{').replace('\\}', '}')
+
+
+def _hash(value, algorithm):
+    algorithms = {'MD5': 'md5', 'SHA-1': 'sha1', 'SHA-256': 'sha256', 'SHA-384': 'sha384', 'SHA-512': 'sha512'}
+    return hashlib.new(algorithms[algorithm], value.encode('utf-8')).hexdigest()
+
+
+INTRINSICS = {
+    'States.Format': _format,
+    'States.StringToJson': lambda value: json.loads(value),
+    'States.JsonToString': lambda value: dumps(value),
+    'States.Array': lambda *values: list(values),
+    'States.ArrayPartition': lambda values, size: [values[i:i + int(size)] for i in range(0, len(values), int(size))],
+    'States.ArrayContains': lambda values, value: value in values,
+    'States.ArrayRange': lambda start, end, step: list(range(int(start), int(end) + (1 if step > 0 else -1), int(step))),
+    'States.ArrayGetItem': lambda values, index: values[int(index)],
+    'States.ArrayLength': lambda values: len(values),
+    'States.ArrayUnique': lambda values: [v for i, v in enumerate(values) if v not in values[:i]],
+    'States.Base64Encode': lambda value: base64.b64encode(value.encode('utf-8')).decode('ascii'),
+    'States.Base64Decode': lambda value: base64.b64decode(value).decode('utf-8'),
+    'States.Hash': _hash,
+    'States.JsonMerge': lambda first, second, deep=False: {**first, **second},  # the service only merges shallow
+    'States.MathRandom': lambda start, end, seed=None: random.Random(seed).randrange(int(start), int(end)),
+    'States.MathAdd': lambda first, second: first + second,
+    'States.StringSplit': lambda value, separators: [part for part in re.split('|'.join(map(re.escape, separators)), value) if part],
+    'States.UUID': lambda: str(uuid.uuid4()),
+}
+
+
+def intrinsic(expression, data, context):
+    match = re.fullmatch(r"\s*(States\.\w+)\((.*)\)\s*", expression, re.S)
+    if match is None or match.group(1) not in INTRINSICS:
+        raise ExecutionFailed('States.IntrinsicFailure', f"unsupported intrinsic {expression}")
+    arguments = [_argument(argument, data, context) for argument in _split_arguments(match.group(2))]
+    try:
+        return INTRINSICS[match.group(1)](*arguments)
+    except ExecutionFailed:
+        raise
+    except Exception as e:
+        raise ExecutionFailed('States.IntrinsicFailure', f"{match.group(1)}: {type(e).__name__}: {e}")
+
+
+def resolve(template, data, context):
+    """ Parameters / ResultSelector / ItemSelector: fields ending in .$ are paths or intrinsic functions """
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith('.$'):
+                resolved[key[:-2]] = intrinsic(value, data, context) if value.startswith('States.') else get_path(value, data, context)
+            else:
+                resolved[key] = resolve(value, data, context)
+        return resolved
+    if isinstance(template, list):
+        return [resolve(value, data, context) for value in template]
+    return template
+
+
+############ PROFILE ##############
+
+class Profile:
+    """ Per state latency and output size, Map fan-out. Shared by a parent and its child executions. Thread safe. """
+
+    def __init__(self):
+        self.states = {}  # name -> {'seconds': [...], 'bytes': max output size}
+        self.maps = {}  # name -> {'runs', 'items', 'max_in_flight', 'limit'}
+        self.largest_payload = (0, None)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, size):
+        with self._lock:
+            state = self.states.setdefault(name, {'seconds': [], 'bytes': 0})
+            state['seconds'].append(seconds)
+            state['bytes'] = max(state['bytes'], size)
+            if size > self.largest_payload[0]:
+                self.largest_payload = (size, name)
+
+    def map_started(self, name, limit):
+        with self._lock:
+            stats = self.maps.setdefault(name, {'runs': 0, 'items': 0, 'max_in_flight': 0, 'limit': limit})
+            stats['runs'] += 1
+
+    def map_items(self, name, items):
+        with self._lock:
+            self.maps[name]['items'] += items
+
+    def iteration(self, name, delta):
+        with self._lock:
+            in_flight = self._in_flight[name] = self._in_flight.get(name, 0) + delta
+            stats = self.maps[name]
+            stats['max_in_flight'] = max(stats['max_in_flight'], in_flight)
+
+    def report(self):
+        lines = [f"{'state':<48} {'runs':>6} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'max out KB':>11}"]
+        for name, state in self.states.items():
+            seconds = sorted(state['seconds'])
+            p95 = seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))]
+            lines.append(f"{name:<48} {len(seconds):>6} {sum(seconds) * 1000:>10,.1f} {statistics.mean(seconds) * 1000:>9,.2f} "
+                         f"{p95 * 1000:>9,.2f} {state['bytes'] / 1024:>11,.1f}")
+        for name, stats in self.maps.items():
+            lines.append(f"map {name}: {stats['runs']} run(s), {stats['items']} iterations, "
+                         f"{stats['max_in_flight']} in flight at most (limit {stats['limit']})")
+        size, name = self.largest_payload
+        lines.append(f"largest payload: {size / 1024:,.1f} KB after {name} ({size / PAYLOAD_LIMIT:.0%} of the 256 KB limit)")
+        return '\n'.join(lines)
+
+
+############ INTERPRETER ##############
+
+class StateMachine:
+    """
+    One state machine definition, executed in process.
+
+    :param handlers: {resource: callable(payload, context) -> result} for Task states
+    :param machines: {state machine arn: StateMachine} started by startExecution.sync tasks
+    :param time_scale: multiplies Wait and Retry intervals (0: no sleeping)
+    :param s3: boto3 s3 client (or local_s3.LocalS3) for Map ItemReader and ResultWriter
+    """
+
+    def __init__(self, definition, name='main', handlers=None, machines=None, profile=None,
+                 map_concurrency=MAP_CONCURRENCY, payload_limit=PAYLOAD_LIMIT, time_scale=0, s3=None):
+        self.definition = definition
+        self.s3 = s3
+        self.name = name
+        self.handlers = handlers if handlers is not None else {}
+        self.machines = machines if machines is not None else {}
+        self.profile = profile or Profile()
+        self.map_concurrency = map_concurrency
+        self.payload_limit = payload_limit
+        self.time_scale = time_scale
+
+    @classmethod
+    def from_file(cls, path, substitutions=None, **kwargs):
+        """ Definition file with ${Name} placeholders (DefinitionSubstitutions), replaced from substitutions """
+        with open(path) as f:
+            text = f.read()
+        for key, value in (substitutions or {}).items():
+            text = text.replace('${' + key + '}', value)
+        kwargs.setdefault('name', os.path.basename(path).split('.')[0])
+        return cls(json.loads(text), **kwargs)
+
+    def execute(self, execution_input, name=None):
+        context = {
+            'Execution': {
+                'Id': f"{LOCAL_ARN.replace(':stateMachine:', ':execution:')}{self.name}:{name or uuid.uuid4()}",
+                'Input': execution_input,
+                'Name': name or str(uuid.uuid4()),
+                'StartTime': datetime.datetime.now(datetime.timezone.utc).isoformat()
+            },
+            'StateMachine': {'Id': LOCAL_ARN + self.name, 'Name': self.name}
+        }
+        return self._run(self.definition, execution_input, context, self.name)
+
+    def _run(self, machine, data, context, scope):
+        state_name = machine['StartAt']
+        while True:
+            state = machine['States'][state_name]
+            context = dict(context, State={'Name': state_name, 'EnteredTime': datetime.datetime.now(datetime.timezone.utc).isoformat()})
+            started = time.perf_counter()
+            label = f"{scope}/{state_name}"
+            try:
+                output, next_state = self._with_retries(state, data, context, label)
+            except ExecutionFailed as failure:
+                catcher = self._catcher(state, failure)
+                if catcher is None:
+                    self.profile.record(label, time.perf_counter() - started, 0)
+                    raise
+                error_output = {'Error': failure.error, 'Cause': failure.cause}
+                output = set_path(catcher.get('ResultPath', '$'), data, error_output)
+                next_state = catcher['Next']
+            size = payload_size(output)
+            self.profile.record(label, time.perf_counter() - started, size)
+            if size > self.payload_limit:
+                raise ExecutionFailed('States.DataLimitExceeded', f"{label} output is {size} bytes, over {self.payload_limit}")
+            if next_state is None:
+                return output
+            data, state_name = output, next_state
+
+    @staticmethod
+    def _matches(error_equals, failure):
+        return 'States.ALL' in error_equals or failure.error in error_equals or (
+            'States.TaskFailed' in error_equals and not failure.error.startswith('States.'))
+
+    def _catcher(self, state, failure):
+        return next((c for c in state.get('Catch', []) if self._matches(c['ErrorEquals'], failure)), None)
+
+    def _with_retries(self, state, data, context, label):
+        attempts = {}
+        while True:
+            try:
+                return self._state(state, data, context, label)
+            except ExecutionFailed as failure:
+                retrier = next((r for r in state.get('Retry', []) if self._matches(r['ErrorEquals'], failure)), None)
+                if retrier is None:
+                    raise
+                key = id(retrier)
+                attempts[key] = attempts.get(key, 0) + 1
+                if attempts[key] > retrier.get('MaxAttempts', 3):
+                    raise
+                interval = retrier.get('IntervalSeconds', 1) * retrier.get('BackoffRate', 2.0) ** (attempts[key] - 1)
+                time.sleep(min(interval, retrier.get('MaxDelaySeconds', interval)) * self.time_scale)
+
+    def _state(self, state, data, context, label):
+        """ (output, next state name or None when the execution ends) """
+        kind = state['Type']
+        next_state = None if state.get('End') or kind in ('Succeed', 'Fail') else state.get('Next')
+        if kind == 'Fail':
+            raise ExecutionFailed(state.get('Error', 'States.Fail'), state.get('Cause', ''))
+        effective = data if state.get('InputPath', '$') is None else get_path(state.get('InputPath', '$'), data, context)
+        if kind in ('Succeed', 'Wait'):
+            if kind == 'Wait':
+                time.sleep(state.get('Seconds', 0) * self.time_scale)
+            return self._output(state, effective, context), next_state
+        if 'Parameters' in state and kind != 'Map':  # Map Parameters select each item (ItemSelector)
+            effective = resolve(state['Parameters'], effective, context)
+
+        if kind == 'Pass':
+            result = state['Result'] if 'Result' in state else effective
+        elif kind == 'Task':
+            result = self._task(state, effective, context)
+        elif kind == 'Map':
+            result = self._map(state, effective, context, label)
+        else:
+            raise ExecutionFailed('States.Runtime', f"{label}: {kind} states are not supported by the local executor")
+
+        if 'ResultSelector' in state:
+            result = resolve(state['ResultSelector'], result, context)
+        result_path = state.get('ResultPath', '$')
+        output = data if result_path is None else set_path(result_path, data, result)
+        return self._output(state, output, context), next_state
+
+    @staticmethod
+    def _output(state, output, context):
+        output_path = state.get('OutputPath', '$')
+        return {} if output_path is None else get_path(output_path, output, context)
+
+    def _task(self, state, payload, context):
+        resource = state['Resource']
+        if resource.startswith(START_EXECUTION):
+            return self._start_execution(resource, payload)
+        if resource.startswith(LAMBDA_INVOKE):
+            function = payload.get('FunctionName')
+            result = self._call(function, payload.get('Payload', payload), context)
+            return {'ExecutedVersion': '$LATEST', 'Payload': result, 'StatusCode': 200}
+        return self._call(resource, payload, context)
+
+    def _call(self, resource, payload, context):
+        handler = self.handlers.get(resource)
+        if handler is None:
+            raise ExecutionFailed('States.Runtime', f"no handler registered for {resource}")
+        try:
+            return handler(copy.deepcopy(payload), context)
+        except ExecutionFailed:
+            raise
+        except Exception as e:
+            raise ExecutionFailed(type(e).__name__, str(e))
+
+    def _start_execution(self, resource, parameters):
+        arn = parameters['StateMachineArn']
+        child = self.machines.get(arn)
+        if child is None:
+            raise ExecutionFailed('States.Runtime', f"no state machine registered for {arn}")
+        child_input = parameters.get('Input', {})
+        if isinstance(child_input, str):
+            child_input = json.loads(child_input)
+        started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        name = parameters.get('Name') or str(uuid.uuid4())
+        output = child.execute(child_input, name)
+        result = {
+            'ExecutionArn': f"{arn.replace(':stateMachine:', ':execution:')}:{name}",
+            'Input': dumps(child_input),
+            'Output': output if resource.endswith('.sync:2') else dumps(output),
+            'StartDate': started,
+            'StopDate': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'StateMachineArn': arn,
+            'Status': 'SUCCEEDED'
+        }
+        if not resource.endswith('.sync') and not resource.endswith('.sync:2'):
+            result = {'ExecutionArn': result['ExecutionArn'], 'StartDate': started}  # fire and forget
+        return result
+
+    def _read_items(self, state, effective, context):
+        """ Items of a Map: ItemsPath, or ItemReader (distributed Map; JSON objects are loaded whole, JSONL and CSV streamed) """
+        reader = state.get('ItemReader')
+        if reader is None:
+            items = get_path(state.get('ItemsPath', '$'), effective, context)
+            if not isinstance(items, list):
+                raise ExecutionFailed('States.Runtime', f"ItemsPath {state.get('ItemsPath', '$')} is not an array")
+            return iter(items)
+        if self.s3 is None:
+            raise ExecutionFailed('States.Runtime', 'ItemReader needs an s3 client (StateMachine s3=)')
+        parameters = resolve(reader.get('Parameters', {}), effective, context)
+        config = reader.get('ReaderConfig', {})
+        max_items = config.get('MaxItems') or (get_path(config['MaxItemsPath'], effective, context)
+                                               if 'MaxItemsPath' in config else None)
+        if reader['Resource'].endswith(':s3:listObjectsV2'):
+            items = self._list_objects(parameters)
+        elif reader['Resource'].endswith(':s3:getObject'):
+            items = self._object_items(parameters, config)
+        else:
+            raise ExecutionFailed('States.Runtime', f"unsupported ItemReader {reader['Resource']}")
+        return itertools.islice(items, max_items) if max_items else items
+
+    def _list_objects(self, parameters):
+        kwargs = {'Bucket': parameters['Bucket'], 'Prefix': parameters.get('Prefix', '')}
+        while True:
+            page = self.s3.list_objects_v2(**kwargs)
+            yield from page.get('Contents', [])
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    def _object_items(self, parameters, config):
+        body = self.s3.get_object(Bucket=parameters['Bucket'], Key=parameters['Key'])['Body']
+        input_type = config.get('InputType', 'JSON')
+        with contextlib.closing(body):
+            if input_type == 'JSON':
+                items = json.load(body)
+                if not isinstance(items, list):
+                    raise ExecutionFailed('States.ItemReaderFailed', f"{parameters['Key']} is not a JSON array")
+                yield from items
+            elif input_type == 'JSONL':
+                for line in body:
+                    if line.strip():
+                        yield json.loads(line)
+            elif input_type == 'CSV':
+                lines = (line.decode('utf-8') for line in body)
+                header = config.get('CSVHeaders') if config.get('CSVHeaderLocation') == 'GIVEN' else None
+                yield from csv.DictReader(lines, fieldnames=header)
+            else:
+                raise ExecutionFailed('States.Runtime', f"unsupported ReaderConfig InputType {input_type}")
+
+    def _iteration_inputs(self, state, items, effective, context):
+        """ Iteration inputs: each item through ItemSelector, then grouped by ItemBatcher if any """
+        selector = state.get('ItemSelector', state.get('Parameters'))
+        selected = (
+            resolve(selector, effective, dict(context, Map={'Item': {'Index': index, 'Value': item}}))
+            if selector is not None else item
+            for index, item in enumerate(items)
+        )
+        batcher = state.get('ItemBatcher')
+        if batcher is None:
+            yield from selected
+            return
+        max_items = batcher.get('MaxItemsPerBatch') or (get_path(batcher['MaxItemsPerBatchPath'], effective, context)
+                                                        if 'MaxItemsPerBatchPath' in batcher else None)
+        max_bytes = batcher.get('MaxInputBytesPerBatch') or (get_path(batcher['MaxInputBytesPerBatchPath'], effective, context)
+                                                             if 'MaxInputBytesPerBatchPath' in batcher else PAYLOAD_LIMIT)
+        batch_input = resolve(batcher['BatchInput'], effective, context) if 'BatchInput' in batcher else None
+        batch, size = [], 0
+        for item in selected:
+            item_size = payload_size(item) + 1
+            if batch and ((max_items and len(batch) >= max_items) or size + item_size > max_bytes):
+                yield {'Items': batch, 'BatchInput': batch_input} if batch_input is not None else {'Items': batch}
+                batch, size = [], 0
+            batch.append(item)
+            size += item_size
+        if batch:
+            yield {'Items': batch, 'BatchInput': batch_input} if batch_input is not None else {'Items': batch}
+
+    def _map(self, state, effective, context, label):
+        processor = state.get('ItemProcessor', state.get('Iterator'))
+        distributed = processor.get('ProcessorConfig', {}).get('Mode') == 'DISTRIBUTED'
+        limit = state.get('MaxConcurrency', 0)
+        if 'MaxConcurrencyPath' in state:
+            limit = get_path(state['MaxConcurrencyPath'], effective, context)
+            if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+                raise ExecutionFailed('States.Runtime', f"MaxConcurrencyPath {state['MaxConcurrencyPath']}: {limit!r} is not a non-negative integer")
+        limit = limit or self.map_concurrency
+        self.profile.map_started(label, limit)
+        inputs = self._iteration_inputs(state, self._read_items(state, effective, context), effective, context)
+        keep_inputs = 'ResultWriter' in state
+
+        def iterate(iteration_input):
+            self.profile.iteration(label, 1)
+            try:
+                return 'SUCCEEDED', self._run(processor, iteration_input, context, label)
+            except ExecutionFailed as failure:
+                if not distributed:
+                    raise
+                return 'FAILED', {'Error': failure.error, 'Cause': failure.cause}
+            finally:
+                self.profile.iteration(label, -1)
+
+        # bounded window of iterations in flight: items are read as they are started, results kept in order
+        outcomes, window, count = [], collections.deque(), 0
+        with ThreadPoolExecutor(max_workers=limit) as pool:
+            for iteration_input in inputs:
+                count += 1
+                window.append((iteration_input if keep_inputs else None, pool.submit(iterate, iteration_input)))
+                if len(window) >= limit * 2:
+                    iteration_input, future = window.popleft()
+                    outcomes.append((iteration_input,) + future.result())
+            while window:
+                iteration_input, future = window.popleft()
+                outcomes.append((iteration_input,) + future.result())
+        self.profile.map_items(label, count)
+
+        failed = sum(1 for _, status, _ in outcomes if status == 'FAILED')
+        if failed:
+            tolerated = failed <= state.get('ToleratedFailureCount', 0) or (
+                count and failed * 100 / count <= state.get('ToleratedFailurePercentage', 0))
+            if not tolerated:
+                raise ExecutionFailed('States.ExceedToleratedFailureThreshold',
+                                      f"{failed} of {count} iterations failed in {label}")
+        if keep_inputs:
+            return self._write_results(state, outcomes, effective, context, label)
+        return [output for _, _, output in outcomes]
+
+    def _write_results(self, state, outcomes, effective, context, label):
+        """ ResultWriter: iteration results to S3, the Map result is a reference to their manifest """
+        if self.s3 is None:
+            raise ExecutionFailed('States.Runtime', 'ResultWriter needs an s3 client (StateMachine s3=)')
+        parameters = resolve(state['ResultWriter'].get('Parameters', {}), effective, context)
+        run_id = str(uuid.uuid4())
+        prefix = f"{parameters.get('Prefix', '').rstrip('/')}/{run_id}/".lstrip('/')
+        map_run_arn = f"{context['StateMachine']['Id'].replace(':stateMachine:', ':mapRun:')}/{label.rsplit('/', 1)[-1]}:{run_id}"
+        files = {'SUCCEEDED': [], 'FAILED': [], 'PENDING': []}
+        for status in ('SUCCEEDED', 'FAILED'):
+            results = [
+                {'Input': dumps(iteration_input), 'Status': status,
+                 ('Output' if status == 'SUCCEEDED' else 'Error'): dumps(output)}
+                for iteration_input, outcome_status, output in outcomes if outcome_status == status
+            ]
+            if results:
+                key = f"{prefix}{status}_0.json"
+                body = dumps(results).encode('utf-8')
+                self.s3.put_object(Bucket=parameters['Bucket'], Key=key, Body=body)
+                files[status].append({'Key': key, 'Size': len(body)})
+        manifest = {'DestinationBucket': parameters['Bucket'], 'MapRunArn': map_run_arn, 'ResultFiles': files}
+        self.s3.put_object(Bucket=parameters['Bucket'], Key=f"{prefix}manifest.json", Body=dumps(manifest).encode('utf-8'))
+        return {'MapRunArn': map_run_arn, 'ResultWriterDetails': {'Bucket': parameters['Bucket'], 'Key': f"{prefix}manifest.json"}}
+
+
+############ COMMAND LINE ##############
+
+def echo_handler(latency_ms=0):
+    """ Default task handler: returns its input after latency_ms """
+    def handler(payload, context):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return payload
+    return handler
+
+
+def load(path, machines_args, task_latency_ms=0, profile=None, map_concurrency=MAP_CONCURRENCY, handlers=None,
+         values=None, s3=None):
+    """
+    Parent definition and the child definitions it starts (NAME=path: ${NAME} is replaced by a local
+    state machine arn). ${...} placeholders in values are replaced by their value (stack parameters),
+    the others become task resources served by handlers, or by an echo handler with task_latency_ms.
+    """
+    profile = profile or Profile()
+    handlers = dict(handlers or {})
+    machines = {}
+    substitutions = {key: str(value) for key, value in (values or {}).items()}
+    children = [machine.split('=', 1) for machine in machines_args]
+    for key, _ in children:
+        substitutions[key] = LOCAL_ARN + key
+    for definition_path in [path] + [machine_path for _, machine_path in children]:
+        with open(definition_path) as f:
+            for placeholder in re.findall(r"\$\{(\w+)\}", f.read()):
+                if placeholder not in substitutions:
+                    substitutions[placeholder] = placeholder
+                    handlers.setdefault(placeholder, echo_handler(task_latency_ms))
+    for key, machine_path in children:
+        machines[substitutions[key]] = StateMachine.from_file(
+            machine_path, substitutions, name=key, handlers=handlers, machines=machines, profile=profile,
+            map_concurrency=map_concurrency, s3=s3)
+    return StateMachine.from_file(path, substitutions, handlers=handlers, machines=machines, profile=profile,
+                                  map_concurrency=map_concurrency, s3=s3)
+
+
+def set_items(machine, count):
+    """ Replace the Payload.items of Pass state Results (child_statemachine PrepareOutput) with count items """
+    for definition in [machine.definition] + [child.definition for child in machine.machines.values()]:
+        for state in definition['States'].values():
+            result = state.get('Result')
+            if isinstance(result, dict) and isinstance(result.get('Payload'), dict) and 'items' in result['Payload']:
+                result['Payload']['items'] = [{'id': i, 'name': f"item{i}"} for i in range(1, count + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('definition')
+    parser.add_argument('--machine', action='append', default=[], help='NAME=path of a child definition (${NAME})')
+    parser.add_argument('--input', default='{}', help='execution input, JSON')
+    parser.add_argument('--set', action='append', default=[], help='NAME=value for a ${NAME} placeholder')
+    parser.add_argument('--task-latency-ms', type=float, default=0, help='latency of the default (echo) task handler')
+    parser.add_argument('--items', type=int, default=0,
+                        help='replace the items of Pass state Results (Payload.items) with this many generated items')
+    parser.add_argument('--max-concurrency', type=int, default=MAP_CONCURRENCY, help='Map concurrency when unset')
+    parser.add_argument('--local-s3', default=None, help='directory standing in for S3 (ItemReader, ResultWriter)')
+    args = parser.parse_args()
+
+    values = dict(value.split('=', 1) for value in args.set)
+    s3 = None
+    if args.local_s3:
+        from local_s3 import LocalS3
+        s3 = LocalS3(args.local_s3)
+    machine = load(args.definition, args.machine, args.task_latency_ms, map_concurrency=args.max_concurrency,
+                   values=values, s3=s3)
+    if args.items:
+        set_items(machine, args.items)
+    started = time.perf_counter()
+    try:
+        output = machine.execute(json.loads(args.input))
+        status = f"SUCCEEDED, output {payload_size(output) / 1024:,.1f} KB"
+    except ExecutionFailed as failure:
+        status = f"FAILED {failure.error}: {failure.cause}"
+    print(machine.profile.report())
+    print(f"{status} in {(time.perf_counter() - started) * 1000:,.0f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
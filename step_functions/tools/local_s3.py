@@ -0,0 +1,95 @@
+"""
+Local stand-in for the S3 client calls used by the state machines and functions (get_object, put_object,
+list_objects_v2, multipart uploads): s3://bucket/key is the file directory/bucket/key.
+Pass it where a boto3 s3 client is expected (asl_executor ItemReader / ResultWriter, manifest_writer).
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+class LocalS3:
+
+    def __init__(self, directory=None):
+        self.directory = directory or tempfile.mkdtemp(prefix='local-s3-')
+        self.requests = {}  # operation -> count
+        self._uploads = {}  # upload id -> (bucket, key, {part number: path})
+
+    def _path(self, bucket, key):
+        return os.path.join(self.directory, bucket, *key.split('/'))
+
+    def _count(self, operation):
+        self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        self._count('PutObject')
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(Body.encode('utf-8') if isinstance(Body, str) else Body)
+        return {'ETag': self._etag(path)}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self._count('GetObject')
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"s3://{Bucket}/{Key}")
+        return {'Body': open(path, 'rb'), 'ContentLength': os.path.getsize(path), 'ETag': self._etag(path)}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=1000, **kwargs):
+        self._count('ListObjectsV2')
+        root = os.path.join(self.directory, Bucket)
+        keys = []
+        for directory, _, files in os.walk(root):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + MaxKeys]
+        response = {
+            'Contents': [{'Key': key, 'Size': os.path.getsize(self._path(Bucket, key)), 'StorageClass': 'STANDARD'}
+                         for key in page],
+            'KeyCount': len(page),
+            'IsTruncated': start + MaxKeys < len(keys)
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = str(start + MaxKeys)
+        return response
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._count('CreateMultipartUpload')
+        upload_id = f"upload-{len(self._uploads) + 1}"
+        self._uploads[upload_id] = (Bucket, Key, {})
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._count('UploadPart')
+        handle, path = tempfile.mkstemp(prefix='part-', dir=self.directory)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(Body)
+        self._uploads[UploadId][2][PartNumber] = path
+        return {'ETag': self._etag(path)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload=None, **kwargs):
+        self._count('CompleteMultipartUpload')
+        _, _, parts = self._uploads.pop(UploadId)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            for number in sorted(parts):
+                with open(parts[number], 'rb') as part:
+                    shutil.copyfileobj(part, target)
+                os.remove(parts[number])
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': self._etag(path)}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        for path in self._uploads.pop(UploadId, (None, None, {}))[2].values():
+            os.remove(path)
+        return {}
+
+    @staticmethod
+    def _etag(path):
+        return '"' + hashlib.md5(str(os.path.getmtime(path)).encode() + path.encode()).hexdigest() + '"'
@@ -0,0 +1,136 @@
+"""
+Local HTTP stand-in for the API called by ApiLambda (functions/api_worker), to run the worker against:
+a JSON body per query (books API shaped: totalItems, items[].volumeInfo), with an ETag and Cache-Control
+max-age, 304 on If-None-Match, a fixed latency, a rate limit answered with 429 + Retry-After, keep-alive.
+It counts the requests, 304s, 429s and TCP connections it got.
+
+usage (from step_functions/ folder):
+python tools/stub_api.py [--port 8080] [--latency-ms 50] [--max-age 60] [--rate 200] [--items 10]
+then ApiUrl=http://127.0.0.1:8080/volumes?q={name}
+in process: with StubApi(latency_ms=50) as api: ... api.url ... api.stats
+"""
+import argparse
+import hashlib
+import json
+import socket
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubApi:
+
+    def __init__(self, port=0, latency_ms=50, max_age=60, rate=0, items=10, host='127.0.0.1'):
+        self.latency_ms = latency_ms
+        self.max_age = max_age
+        self.rate = rate
+        self.items = items
+        self.stats = {'requests': 0, 'not_modified': 0, 'throttled': 0, 'connections': 0, 'bytes': 0}
+        self._window = (0, 0)  # (second, requests)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def body(self, path, query):
+        """ Deterministic per (path, query), so the ETag is stable """
+        q = (urllib.parse.parse_qs(query).get('q') or [''])[0]
+        return json.dumps({
+            'kind': 'books#volumes', 'query': q, 'totalItems': self.items,
+            'items': [{'id': f"{q}-{i}", 'volumeInfo': {
+                'title': f"{q} volume {i}", 'authors': [f"author {i}"], 'pageCount': 100 + i,
+                'description': 'lorem ipsum ' * 40}} for i in range(self.items)]
+        }).encode('utf-8')
+
+    def _throttled(self):
+        if not self.rate:
+            return False
+        with self._lock:
+            second = int(time.monotonic())
+            count = self._window[1] + 1 if self._window[0] == second else 1
+            self._window = (second, count)
+            return count > self.rate
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # headers, body: 2 writes
+                api._count('connections')
+
+            def do_GET(self):
+                api._count('requests')
+                if api._throttled():
+                    api._count('throttled')
+                    self._send(429, b'{"error": "rate exceeded"}', {'Retry-After': '1'})
+                    return
+                time.sleep(api.latency_ms / 1000)
+                parts = urllib.parse.urlsplit(self.path)
+                body = api.body(parts.path, parts.query)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                headers = {'ETag': etag, 'Cache-Control': f"max-age={api.max_age}"}
+                if self.headers.get('If-None-Match') == etag:
+                    api._count('not_modified')
+                    self._send(304, b'', headers)
+                    return
+                self._send(200, body, headers)
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                api._count('bytes', len(body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--max-age', type=int, default=60, help='Cache-Control max-age (0: revalidate every time)')
+    parser.add_argument('--rate', type=int, default=0, help='requests per second before 429s (0: no limit)')
+    parser.add_argument('--items', type=int, default=10, help='items per response body')
+    args = parser.parse_args()
+    api = StubApi(args.port, args.latency_ms, args.max_age, args.rate, args.items)
+    print(f"{api.url}/volumes?q={{name}}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(api.stats))
+
+
+if __name__ == '__main__':
+    main()